@@ -4,18 +4,37 @@ Script de auditoría automatizada de proyectos GuanacoLabs
 Procesa todos los repositorios y genera informe completo
 """
 
+import argparse
 import json
 import subprocess
 import os
 import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dir_index import CACHE_DIR, DirectoryIndex
+from landing_detector import LandingDetector
+from nginx_index import NGINX_INDEX_CACHE, NginxIndex
 
 # Configuración
 BASE_PATH = Path("/home/luis")
 NGINX_SITES = Path("/etc/nginx/sites-enabled")
 REPORT_PATH = BASE_PATH / "mi-wiki" / f"proyectos-auditoria-{datetime.now().strftime('%Y-%m-%d')}.md"
+DIR_INDEX_CACHE = CACHE_DIR / "audit-dir-index.json"
+AUDIT_CACHE = CACHE_DIR / "audit-results.json"
+
+# Ubicaciones comunes de proyectos (en orden de prioridad)
+SEARCH_PATHS = [
+    BASE_PATH,
+    BASE_PATH / "projects" / "active",
+    BASE_PATH / "projects" / "company",
+    BASE_PATH / "projects" / "experiments",
+]
 
 # Repos a ignorar (archivados)
 ARCHIVED_PATTERNS = [
@@ -29,12 +48,114 @@ ARCHIVED_PATTERNS = [
     "wellness-tracker-app"
 ]
 
+# Etapas de audit_project (en orden) para el reporte de tiempos
+AUDIT_STAGES = ["find_local_folder", "find_landing_files", "extract_name",
+                "marketable_name", "check_nginx_config"]
+
+
+@contextmanager
+def stage_timer(timings: Dict[str, float], stage: str):
+    """Acumula en timings[stage] los segundos que tarda el bloque"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+_worker_auditor: Optional["ProjectAuditor"] = None
+
+
+def _init_worker(state: Dict):
+    """
+    Inicializa el auditor del worker (una vez por proceso del pool) con los
+    índices ya armados. Sólo viaja lo que necesita audit_project, no el
+    auditor completo (que tiene abiertos los archivos del informe y no se
+    puede picklear con spawn/forkserver).
+    """
+    global _worker_auditor
+    _worker_auditor = ProjectAuditor.from_worker_state(state)
+
+
+def _audit_worker(repo: Dict) -> Tuple[Optional[Dict], List[str], Dict[str, float], Optional[str]]:
+    """
+    Audita un repo dentro del pool de workers.
+    Devuelve (resultado, líneas de log, tiempos por etapa, error) para que el
+    proceso principal imprima y agregue todo en orden determinístico.
+    """
+    lines: List[str] = []
+    timings: Dict[str, float] = {}
+    try:
+        result = _worker_auditor.audit_project(repo, log=lines.append, timings=timings)
+        return result, lines, timings, None
+    except Exception as e:
+        return None, lines, timings, f"Error auditando {repo['name']}: {str(e)}"
+
+
+def local_state(local_path: Optional[Path]) -> Optional[str]:
+    """
+    Huella del estado local de un proyecto: el commit de HEAD si es un repo
+    git (leído directo de .git, sin lanzar git), si no el mtime de la carpeta
+    """
+    if local_path is None:
+        return None
+
+    git_dir = local_path / ".git"
+    try:
+        head = (git_dir / "HEAD").read_text().strip()
+        if not head.startswith("ref: "):
+            return f"git:{head}"
+        ref = head[5:]
+        ref_file = git_dir / ref
+        if ref_file.exists():
+            return f"git:{ref_file.read_text().strip()}"
+        packed = git_dir / "packed-refs"
+        if packed.exists():
+            for line in packed.read_text().splitlines():
+                if line.endswith(" " + ref):
+                    return f"git:{line.split(' ', 1)[0]}"
+        return f"git:{ref}"
+    except OSError:
+        pass
+
+    try:
+        return f"mtime:{local_path.stat().st_mtime_ns}"
+    except OSError:
+        return None
+
+
 class ProjectAuditor:
-    def __init__(self):
+    def __init__(self, dir_index_cache: Optional[Path] = None,
+                 results_cache: Optional[Path] = None):
+        self.dir_index_cache = dir_index_cache
+        self.results_cache = results_cache
+        self.cached_results: Dict[str, Dict] = {}
+        self.fingerprints: Dict[str, Dict] = {}
+        self.dir_index: Optional[DirectoryIndex] = None
+        self.landing_detector = LandingDetector()
+        self.nginx_index: Optional[NginxIndex] = None
         self.repos = []
         self.audit_results = []
         self.missing_landings = []
         self.errors = []
+        self.stage_timings: Dict[str, float] = {}
+        self.report_writer = StreamingReportWriter(REPORT_PATH)
+
+    def worker_state(self) -> Dict:
+        """Índices que necesita audit_project en un worker"""
+        return {
+            "dir_index": self.dir_index,
+            "nginx_index": self.nginx_index,
+            "landing_detector": self.landing_detector,
+        }
+
+    @classmethod
+    def from_worker_state(cls, state: Dict) -> "ProjectAuditor":
+        auditor = cls()
+        auditor.dir_index = state["dir_index"]
+        auditor.nginx_index = state["nginx_index"]
+        auditor.landing_detector = state["landing_detector"]
+        return auditor
 
     def load_repos(self):
         """Carga lista de repositorios desde GitHub"""
@@ -62,83 +183,31 @@ class ProjectAuditor:
         print(f"✅ {len(self.repos)} repositorios activos encontrados")
         print(f"🗑️  {len(all_repos) - len(self.repos)} repositorios archivados ignorados")
 
-    def find_local_folder(self, repo_name: str) -> Optional[Path]:
-        """Busca la carpeta local del proyecto"""
-        # Buscar con varios patrones
-        patterns = [
-            repo_name,
-            repo_name.replace("-", "_"),
-            repo_name.replace("_", "-"),
-        ]
-
-        # Buscar en ubicaciones comunes
-        search_paths = [
-            BASE_PATH,
-            BASE_PATH / "projects" / "active",
-            BASE_PATH / "projects" / "company",
-            BASE_PATH / "projects" / "experiments",
-        ]
-
-        for search_path in search_paths:
-            if not search_path.exists():
-                continue
-
-            # Buscar directo
-            for pattern in patterns:
-                potential_path = search_path / pattern
-                if potential_path.exists() and potential_path.is_dir():
-                    return potential_path
+    def load_dir_index(self) -> DirectoryIndex:
+        """Construye (o carga del cache) el índice de carpetas de proyectos"""
+        if self.dir_index is None:
+            start = time.perf_counter()
+            self.dir_index = DirectoryIndex.open(SEARCH_PATHS, self.dir_index_cache)
+            self.stage_timings["dir_index"] = time.perf_counter() - start
+            print(f"🗂️  Índice de carpetas: {len(self.dir_index)} directorios "
+                  f"({self.stage_timings['dir_index']:.2f}s)")
+        return self.dir_index
 
-            # Buscar recursivamente (hasta 3 niveles)
-            try:
-                result = subprocess.run(
-                    ["find", str(search_path), "-maxdepth", "3", "-type", "d",
-                     "-name", f"*{repo_name}*"],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
-
-                if result.stdout.strip():
-                    paths = result.stdout.strip().split('\n')
-                    # Filtrar node_modules, .git, etc
-                    clean_paths = [
-                        p for p in paths
-                        if 'node_modules' not in p and '.git' not in p
-                    ]
-                    if clean_paths:
-                        return Path(clean_paths[0])
-            except Exception as e:
-                continue
-
-        return None
+    def find_local_folder(self, repo_name: str) -> Optional[Path]:
+        """
+        Busca la carpeta local del proyecto
+        Por cada ubicación común: primero el nombre exacto o sus variantes
+        con -/_, después cualquier carpeta (hasta 3 niveles) que lo contenga
+        """
+        return self.load_dir_index().find_project(repo_name)
 
     def find_landing_files(self, project_path: Path) -> List[Path]:
-        """Busca archivos de landing en el proyecto"""
-        landing_patterns = [
-            "**/index.html",
-            "**/landing.html",
-            "**/landing/index.html",
-            "**/public/index.html",
-            "**/dist/index.html",
-            "**/build/index.html",
-            "**/app/page.tsx",
-            "**/app/page.js",
-            "**/pages/index.tsx",
-            "**/pages/index.js",
-        ]
-
-        landing_files = []
-        for pattern in landing_patterns:
-            try:
-                found = list(project_path.glob(pattern))
-                # Filtrar node_modules
-                found = [f for f in found if 'node_modules' not in str(f)]
-                landing_files.extend(found)
-            except Exception:
-                continue
-
-        return landing_files
+        """
+        Busca archivos de landing en el proyecto
+        Un solo recorrido del árbol para todos los patrones (LANDING_PATTERNS),
+        sin entrar en node_modules ni en otros directorios de dependencias
+        """
+        return self.landing_detector.find(project_path)
 
     def extract_project_name_from_landing(self, landing_file: Path) -> Optional[str]:
         """Extrae el nombre del proyecto desde la landing"""
@@ -217,25 +286,25 @@ class ProjectAuditor:
 
         return name
 
+    def load_nginx_index(self) -> NginxIndex:
+        """Parsea los sitios Nginx (sólo los que cambiaron desde el último cache)"""
+        if self.nginx_index is None:
+            self.nginx_index = NginxIndex(NGINX_SITES, NGINX_INDEX_CACHE).refresh()
+            print(f"🧭 Índice Nginx: {len(self.nginx_index.sites)} sitios "
+                  f"({self.nginx_index.parsed_files} re-parseados)")
+        return self.nginx_index
+
     def check_nginx_config(self, repo_name: str) -> Optional[str]:
         """Verifica si existe config nginx para el proyecto"""
-        try:
-            nginx_files = list(NGINX_SITES.glob("*"))
-            for nginx_file in nginx_files:
-                if repo_name.lower() in nginx_file.name.lower():
-                    # Extraer server_name
-                    content = nginx_file.read_text()
-                    server_match = re.search(r'server_name\s+([^;]+);', content)
-                    if server_match:
-                        return server_match.group(1).strip()
-        except Exception:
-            pass
-        return None
+        return self.load_nginx_index().server_name_for(repo_name)
 
-    def audit_project(self, repo: Dict) -> Dict:
+    def audit_project(self, repo: Dict, log: Callable[[str], None] = print,
+                      timings: Optional[Dict[str, float]] = None) -> Dict:
         """Audita un proyecto completo"""
+        if timings is None:
+            timings = {}
         repo_name = repo['name']
-        print(f"\n🔍 Auditando: {repo_name}")
+        log(f"\n🔍 Auditando: {repo_name}")
 
         result = {
             "repo_name": repo_name,
@@ -255,173 +324,421 @@ class ProjectAuditor:
         }
 
         # 1. Buscar carpeta local
-        local_path = self.find_local_folder(repo_name)
+        with stage_timer(timings, "find_local_folder"):
+            local_path = self.find_local_folder(repo_name)
         if local_path:
             result["local_path"] = str(local_path)
-            print(f"  📁 Carpeta encontrada: {local_path}")
+            log(f"  📁 Carpeta encontrada: {local_path}")
 
             # 2. Buscar landing
-            landing_files = self.find_landing_files(local_path)
+            with stage_timer(timings, "find_landing_files"):
+                landing_files = self.find_landing_files(local_path)
             if landing_files:
                 result["has_landing"] = True
                 result["landing_files"] = [str(f) for f in landing_files]
-                print(f"  🎨 Landing encontrada: {len(landing_files)} archivos")
+                log(f"  🎨 Landing encontrada: {len(landing_files)} archivos")
 
                 # 3. Extraer nombre
-                for landing in landing_files[:3]:  # Revisar primeros 3
-                    extracted = self.extract_project_name_from_landing(landing)
-                    if extracted:
-                        result["extracted_name"] = extracted
-                        print(f"  📝 Nombre extraído: {extracted}")
-                        break
+                with stage_timer(timings, "extract_name"):
+                    for landing in landing_files[:3]:  # Revisar primeros 3
+                        extracted = self.extract_project_name_from_landing(landing)
+                        if extracted:
+                            result["extracted_name"] = extracted
+                            log(f"  📝 Nombre extraído: {extracted}")
+                            break
             else:
                 result["needs_landing"] = True
-                self.missing_landings.append(repo_name)
-                print(f"  ❌ No tiene landing")
+                log(f"  ❌ No tiene landing")
         else:
-            print(f"  ⚠️  Carpeta local no encontrada")
+            log(f"  ⚠️  Carpeta local no encontrada")
 
         # 4. Generar nombre vendible
-        marketable = self.generate_marketable_name(repo_name, result["description"])
+        with stage_timer(timings, "marketable_name"):
+            marketable = self.generate_marketable_name(repo_name, result["description"])
         result["marketable_name"] = marketable
         result["suggested_subdomain"] = marketable.lower().replace(" ", "-") + ".guanacolabs.com"
-        print(f"  💡 Nombre sugerido: {marketable}")
-        print(f"  🌐 Subdominio sugerido: {result['suggested_subdomain']}")
+        log(f"  💡 Nombre sugerido: {marketable}")
+        log(f"  🌐 Subdominio sugerido: {result['suggested_subdomain']}")
 
         # 5. Verificar config nginx existente
-        nginx_domain = self.check_nginx_config(repo_name)
+        with stage_timer(timings, "check_nginx_config"):
+            nginx_domain = self.check_nginx_config(repo_name)
         if nginx_domain:
             result["current_nginx_config"] = nginx_domain
-            print(f"  ✅ Nginx configurado: {nginx_domain}")
+            log(f"  ✅ Nginx configurado: {nginx_domain}")
 
         return result
 
-    def run_full_audit(self):
-        """Ejecuta auditoría completa"""
+    def run_full_audit(self, workers: int = 1, executor: str = "thread"):
+        """
+        Ejecuta auditoría completa
+
+        Con workers > 1 reparte audit_project en un pool de threads o procesos.
+        Los resultados (y el log de cada repo) se procesan siempre en el orden
+        de self.repos, así el informe es el mismo que en modo secuencial.
+        """
         print("\n" + "="*80)
         print("🚀 INICIANDO AUDITORÍA COMPLETA DE PROYECTOS GUANACOLABS")
         print("="*80)
 
         self.load_repos()
 
-        print(f"\n📊 Procesando {len(self.repos)} repositorios...\n")
+        mode = f"{workers} workers ({executor})" if workers > 1 else "secuencial"
+        print(f"\n📊 Procesando {len(self.repos)} repositorios [{mode}]...\n")
+
+        # Los índices se arman una sola vez antes de repartir el trabajo
+        self.load_dir_index()
+        self.load_nginx_index()
+
+        if self.results_cache is not None:
+            self.load_results_cache()
+
+        self.report_writer.open()
+        start = time.perf_counter()
+        if workers > 1 and executor == "process":
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.worker_state(),)) as pool:
+                # map() devuelve en el orden de entrada aunque terminen desordenados
+                self._collect_results(self._iter_outcomes(pool.map))
+        elif workers > 1:
+            _init_worker(self.worker_state())
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                self._collect_results(self._iter_outcomes(pool.map))
+        else:
+            _init_worker(self.worker_state())
+            self._collect_results(self._iter_outcomes(map))
 
-        for i, repo in enumerate(self.repos, 1):
-            print(f"\n[{i}/{len(self.repos)}] ", end="")
-            try:
-                audit_result = self.audit_project(repo)
-                self.audit_results.append(audit_result)
-            except Exception as e:
-                error_msg = f"Error auditando {repo['name']}: {str(e)}"
-                print(f"  ❌ {error_msg}")
-                self.errors.append(error_msg)
+        self.stage_timings["total"] = time.perf_counter() - start
+
+        if self.results_cache is not None:
+            self.save_results_cache()
 
         print("\n" + "="*80)
         print("✅ AUDITORÍA COMPLETADA")
         print("="*80)
+        self.print_stage_timings()
+
+    def _iter_outcomes(self, mapper):
+        """
+        Resultados en el orden de self.repos: los repos sin cambios salen del
+        cache y el resto se audita con mapper (map o pool.map)
+        """
+        pending = [r for r in self.repos if r['name'] not in self.cached_results]
+        fresh = mapper(_audit_worker, pending)
+
+        for repo in self.repos:
+            cached = self.cached_results.get(repo['name'])
+            if cached is None:
+                yield next(fresh)
+                continue
 
-    def generate_report(self):
-        """Genera informe markdown completo"""
-        print("\n📝 Generando informe...")
+            result = dict(cached)
+            # Nginx no forma parte de la huella del repo y el índice ya está en memoria
+            result["current_nginx_config"] = self.check_nginx_config(repo['name'])
+            yield result, [f"\n♻️  Sin cambios (cache): {repo['name']}"], {}, None
 
-        # Crear directorio si no existe
-        REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-        report = []
-        report.append(f"# Auditoría de Proyectos GuanacoLabs")
-        report.append(f"\n**Fecha:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        report.append(f"\n## Resumen Ejecutivo\n")
-        report.append(f"- **Total de repositorios procesados:** {len(self.repos)}")
-        report.append(f"- **Proyectos con carpeta local:** {sum(1 for r in self.audit_results if r['local_path'])}")
-        report.append(f"- **Proyectos con landing:** {sum(1 for r in self.audit_results if r['has_landing'])}")
-        report.append(f"- **Proyectos SIN landing:** {len(self.missing_landings)}")
-        report.append(f"- **Proyectos con Nginx configurado:** {sum(1 for r in self.audit_results if r['current_nginx_config'])}")
-        report.append(f"- **Errores encontrados:** {len(self.errors)}")
-
-        report.append(f"\n## Detalle de Proyectos\n")
-
-        for result in self.audit_results:
-            report.append(f"\n### {result['repo_name']}")
-            report.append(f"\n**Información básica:**")
-            report.append(f"- URL: {result['repo_url']}")
-            report.append(f"- Descripción: {result['description'] or 'Sin descripción'}")
-
-            if result['local_path']:
-                report.append(f"\n**Ubicación local:**")
-                report.append(f"- Ruta: `{result['local_path']}`")
-
-                if result['has_landing']:
-                    report.append(f"- Landing: ✅ Encontrada ({len(result['landing_files'])} archivos)")
-                    if result['extracted_name']:
-                        report.append(f"- Nombre actual: **{result['extracted_name']}**")
-                else:
-                    report.append(f"- Landing: ❌ **NO ENCONTRADA - NECESITA CREACIÓN**")
-            else:
-                report.append(f"\n**Ubicación local:** ⚠️ No encontrada (repo sin código desplegable o no clonado)")
+    def load_results_cache(self):
+        """
+        Carga del cache los resultados de repos cuyo updatedAt de GitHub y
+        estado local (HEAD o mtime) no cambiaron desde la última auditoría
+        """
+        try:
+            with open(self.results_cache) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+
+        for repo in self.repos:
+            local_path = self.find_local_folder(repo['name'])
+            fingerprint = {
+                "updatedAt": repo.get('updatedAt'),
+                "local_path": str(local_path) if local_path else None,
+                "local_state": local_state(local_path),
+            }
+            self.fingerprints[repo['name']] = fingerprint
+
+            entry = cache.get(repo['name'])
+            if entry and entry.get("fingerprint") == fingerprint:
+                self.cached_results[repo['name']] = entry["result"]
+
+        print(f"♻️  Incremental: {len(self.cached_results)} repos sin cambios, "
+              f"{len(self.repos) - len(self.cached_results)} a auditar")
+
+    def save_results_cache(self):
+        """Guarda el resultado de cada repo auditado junto con su huella"""
+        cache = {
+            result["repo_name"]: {
+                "fingerprint": self.fingerprints[result["repo_name"]],
+                "result": result,
+            }
+            for result in self.audit_results
+            if result["repo_name"] in self.fingerprints
+        }
+        self.results_cache.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.results_cache.with_suffix(self.results_cache.suffix + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(tmp_path, self.results_cache)
+
+    def _collect_results(self, outcomes):
+        """Imprime y acumula los resultados de _audit_worker en orden"""
+        for i, (repo, outcome) in enumerate(zip(self.repos, outcomes), 1):
+            audit_result, lines, timings, error = outcome
+            print(f"\n[{i}/{len(self.repos)}] ", end="")
+            for line in lines:
+                print(line)
 
-            report.append(f"\n**Branding propuesto:**")
-            report.append(f"- Nombre vendible: **{result['marketable_name']}**")
-            report.append(f"- Subdominio sugerido: `{result['suggested_subdomain']}`")
+            for stage, seconds in timings.items():
+                self.stage_timings[stage] = self.stage_timings.get(stage, 0.0) + seconds
+
+            if error:
+                print(f"  ❌ {error}")
+                self.errors.append(error)
+                continue
 
-            if result['current_nginx_config']:
-                report.append(f"- Nginx actual: `{result['current_nginx_config']}`")
+            self.audit_results.append(audit_result)
+            self.report_writer.add(audit_result)
+            if audit_result["needs_landing"]:
+                self.missing_landings.append(repo['name'])
+
+    def print_stage_timings(self):
+        """Muestra el tiempo acumulado por etapa de audit_project"""
+        total = self.stage_timings.get("total", 0.0)
+        stages_total = sum(self.stage_timings.get(s, 0.0) for s in AUDIT_STAGES)
+
+        print(f"\n⏱️  Tiempos por etapa (suma sobre todos los repos, wall total {total:.2f}s):")
+        for stage in sorted(AUDIT_STAGES, key=lambda s: self.stage_timings.get(s, 0.0), reverse=True):
+            seconds = self.stage_timings.get(stage, 0.0)
+            pct = (seconds / stages_total * 100) if stages_total else 0.0
+            print(f"  - {stage:<20} {seconds:8.2f}s  ({pct:5.1f}%)")
+        if "dir_index" in self.stage_timings:
+            print(f"  (índice de carpetas, una vez: {self.stage_timings['dir_index']:.2f}s)")
+
+    def generate_report(self) -> str:
+        """
+        Cierra el informe markdown y el JSONL escritos durante la auditoría.
+        Devuelve la ruta del informe (no su contenido: se fue escribiendo a
+        disco proyecto por proyecto y puede ser grande).
+        """
+        print("\n📝 Generando informe...")
+
+        report_path = self.report_writer.finalize(len(self.repos), self.missing_landings, self.errors)
+
+        print(f"✅ Informe generado en: {report_path}")
+        print(f"✅ Resultados JSONL en: {self.report_writer.jsonl_path}")
+
+        return str(report_path)
+
+
+class StreamingReportWriter:
+    """
+    Escribe el informe a medida que termina cada proyecto.
+
+    El detalle de cada proyecto se agrega a <informe>.partial, los comandos
+    de Cloudflare a <informe>.cloudflare.partial y una línea JSON por
+    proyecto a <informe>.jsonl.partial (todo con flush, así se puede seguir
+    el avance con tail). finalize() arma el informe final con el resumen
+    arriba y lo publica con un rename atómico.
+
+    Usado como context manager, si la auditoría falla antes de finalize()
+    se cierran y borran los parciales (abort()).
+    """
+
+    def __init__(self, report_path: Path):
+        self.report_path = report_path
+        self.jsonl_path = report_path.with_suffix(".jsonl")
+        self.details_path = report_path.with_name(report_path.name + ".partial")
+        self.commands_path = report_path.with_name(report_path.name + ".cloudflare.partial")
+        self.jsonl_partial_path = self.jsonl_path.with_name(self.jsonl_path.name + ".partial")
+        self._details = None
+        self._commands = None
+        self._jsonl = None
+        self.counts = {"results": 0, "local_path": 0, "has_landing": 0, "nginx": 0}
+
+    def open(self):
+        """Crea los archivos parciales (pisando los de una corrida anterior)"""
+        self.report_path.parent.mkdir(parents=True, exist_ok=True)
+        self._details = open(self.details_path, 'w', encoding='utf-8')
+        self._commands = open(self.commands_path, 'w', encoding='utf-8')
+        self._jsonl = open(self.jsonl_partial_path, 'w', encoding='utf-8')
+
+    def __enter__(self) -> "StreamingReportWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        return False
+
+    def _close(self):
+        for f in (self._details, self._commands, self._jsonl):
+            if f is not None:
+                f.close()
+        self._details = self._commands = self._jsonl = None
+
+    def abort(self):
+        """Cierra y borra los archivos parciales (el informe anterior queda intacto)"""
+        self._close()
+        tmp_path = self.report_path.with_name(self.report_path.name + ".tmp")
+        for path in (self.details_path, self.commands_path, self.jsonl_partial_path, tmp_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def add(self, result: Dict):
+        """Escribe la sección de un proyecto y su línea JSONL"""
+        self.counts["results"] += 1
+        self.counts["local_path"] += bool(result['local_path'])
+        self.counts["has_landing"] += bool(result['has_landing'])
+        self.counts["nginx"] += bool(result['current_nginx_config'])
+
+        self._write_lines(self._details, self.project_section(result))
+        if result['local_path'] and not result['current_nginx_config']:
+            self._write_lines(self._commands, self.cloudflare_command(result))
+
+        self._jsonl.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._jsonl.flush()
+
+    @staticmethod
+    def _write_lines(f, lines: List[str]):
+        f.write("\n".join(lines) + "\n")
+        f.flush()
+
+    @staticmethod
+    def project_section(result: Dict) -> List[str]:
+        """Sección markdown de un proyecto"""
+        section = []
+        section.append(f"\n### {result['repo_name']}")
+        section.append(f"\n**Información básica:**")
+        section.append(f"- URL: {result['repo_url']}")
+        section.append(f"- Descripción: {result['description'] or 'Sin descripción'}")
+
+        if result['local_path']:
+            section.append(f"\n**Ubicación local:**")
+            section.append(f"- Ruta: `{result['local_path']}`")
+
+            if result['has_landing']:
+                section.append(f"- Landing: ✅ Encontrada ({len(result['landing_files'])} archivos)")
+                if result['extracted_name']:
+                    section.append(f"- Nombre actual: **{result['extracted_name']}**")
             else:
-                report.append(f"- Nginx: ⚠️ No configurado")
+                section.append(f"- Landing: ❌ **NO ENCONTRADA - NECESITA CREACIÓN**")
+        else:
+            section.append(f"\n**Ubicación local:** ⚠️ No encontrada (repo sin código desplegable o no clonado)")
 
-            report.append(f"\n**Acciones recomendadas:**")
-            if result['needs_landing']:
-                report.append(f"- [ ] Crear landing profesional")
-            if not result['current_nginx_config'] and result['local_path']:
-                report.append(f"- [ ] Configurar Nginx")
-                report.append(f"- [ ] Crear entrada DNS en Cloudflare")
-            if result['marketable_name'] != result['extracted_name']:
-                report.append(f"- [ ] Considerar renombrar proyecto a: {result['marketable_name']}")
+        section.append(f"\n**Branding propuesto:**")
+        section.append(f"- Nombre vendible: **{result['marketable_name']}**")
+        section.append(f"- Subdominio sugerido: `{result['suggested_subdomain']}`")
 
-            report.append(f"\n---")
+        if result['current_nginx_config']:
+            section.append(f"- Nginx actual: `{result['current_nginx_config']}`")
+        else:
+            section.append(f"- Nginx: ⚠️ No configurado")
+
+        section.append(f"\n**Acciones recomendadas:**")
+        if result['needs_landing']:
+            section.append(f"- [ ] Crear landing profesional")
+        if not result['current_nginx_config'] and result['local_path']:
+            section.append(f"- [ ] Configurar Nginx")
+            section.append(f"- [ ] Crear entrada DNS en Cloudflare")
+        if result['marketable_name'] != result['extracted_name']:
+            section.append(f"- [ ] Considerar renombrar proyecto a: {result['marketable_name']}")
+
+        section.append(f"\n---")
+        return section
+
+    @staticmethod
+    def cloudflare_command(result: Dict) -> List[str]:
+        """Comando curl para crear el registro DNS de un proyecto"""
+        subdomain = result['suggested_subdomain'].replace('.guanacolabs.com', '')
+        return [
+            f"# {result['marketable_name']}",
+            f"curl -X POST 'https://api.cloudflare.com/client/v4/zones/$CLOUDFLARE_ZONE_ID/dns_records' \\",
+            f"  -H 'Authorization: Bearer $CLOUDFLARE_API_TOKEN' \\",
+            f"  -H 'Content-Type: application/json' \\",
+            f"  --data '{{\"type\":\"A\",\"name\":\"{subdomain}\",\"content\":\"<SERVER_IP>\",\"proxied\":true}}'",
+            f"",
+        ]
 
+    def finalize(self, total_repos: int, missing_landings: List[str], errors: List[str]) -> Path:
+        """Arma el informe final (resumen + secciones ya escritas) y lo publica"""
+        if self._details is None:
+            self.open()
+        self._close()
+
+        header = [
+            f"# Auditoría de Proyectos GuanacoLabs",
+            f"\n**Fecha:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            f"\n## Resumen Ejecutivo\n",
+            f"- **Total de repositorios procesados:** {total_repos}",
+            f"- **Proyectos con carpeta local:** {self.counts['local_path']}",
+            f"- **Proyectos con landing:** {self.counts['has_landing']}",
+            f"- **Proyectos SIN landing:** {len(missing_landings)}",
+            f"- **Proyectos con Nginx configurado:** {self.counts['nginx']}",
+            f"- **Errores encontrados:** {len(errors)}",
+            f"\n## Detalle de Proyectos\n",
+        ]
+
+        footer = []
         # Sección de proyectos sin landing
-        if self.missing_landings:
-            report.append(f"\n## Proyectos que Necesitan Landing\n")
-            for project in self.missing_landings:
-                report.append(f"- {project}")
+        if missing_landings:
+            footer.append(f"\n## Proyectos que Necesitan Landing\n")
+            for project in missing_landings:
+                footer.append(f"- {project}")
 
         # Errores
-        if self.errors:
-            report.append(f"\n## Errores Encontrados\n")
-            for error in self.errors:
-                report.append(f"- {error}")
+        if errors:
+            footer.append(f"\n## Errores Encontrados\n")
+            for error in errors:
+                footer.append(f"- {error}")
 
         # Comandos Cloudflare
-        report.append(f"\n## Comandos Cloudflare para Ejecutar Manualmente\n")
-        report.append(f"\n```bash")
-        report.append(f"# Requiere: CLOUDFLARE_API_TOKEN y CLOUDFLARE_ZONE_ID configurados\n")
-
-        for result in self.audit_results:
-            if result['local_path'] and not result['current_nginx_config']:
-                subdomain = result['suggested_subdomain'].replace('.guanacolabs.com', '')
-                report.append(f"# {result['marketable_name']}")
-                report.append(f"curl -X POST 'https://api.cloudflare.com/client/v4/zones/$CLOUDFLARE_ZONE_ID/dns_records' \\")
-                report.append(f"  -H 'Authorization: Bearer $CLOUDFLARE_API_TOKEN' \\")
-                report.append(f"  -H 'Content-Type: application/json' \\")
-                report.append(f"  --data '{{\"type\":\"A\",\"name\":\"{subdomain}\",\"content\":\"<SERVER_IP>\",\"proxied\":true}}'")
-                report.append(f"")
-
-        report.append(f"```")
-
-        # Escribir informe
-        report_content = "\n".join(report)
-        REPORT_PATH.write_text(report_content, encoding='utf-8')
-
-        print(f"✅ Informe generado en: {REPORT_PATH}")
-
-        return report_content
+        footer.append(f"\n## Comandos Cloudflare para Ejecutar Manualmente\n")
+        footer.append(f"\n```bash")
+        footer.append(f"# Requiere: CLOUDFLARE_API_TOKEN y CLOUDFLARE_ZONE_ID configurados\n")
+
+        tmp_path = self.report_path.with_name(self.report_path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            self._write_lines(out, header)
+            with open(self.details_path, encoding='utf-8') as details:
+                shutil.copyfileobj(details, out)
+            self._write_lines(out, footer)
+            with open(self.commands_path, encoding='utf-8') as commands:
+                shutil.copyfileobj(commands, out)
+            out.write("```")
+            out.flush()
+            os.fsync(out.fileno())
+
+        os.replace(tmp_path, self.report_path)
+        os.replace(self.jsonl_partial_path, self.jsonl_path)
+        self.details_path.unlink()
+        self.commands_path.unlink()
+
+        return self.report_path
 
 def main():
-    auditor = ProjectAuditor()
+    parser = argparse.ArgumentParser(description='Auditoría de proyectos GuanacoLabs')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Repos a auditar en paralelo (default: 1, secuencial)')
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                        help='Tipo de pool para --workers > 1 (default: thread)')
+    parser.add_argument('--dir-cache', action='store_true',
+                        help=f'Reusar el índice de carpetas guardado en {DIR_INDEX_CACHE} '
+                             'si ningún directorio cambió')
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'Re-auditar sólo los repos con cambios (cache en {AUDIT_CACHE})')
+    args = parser.parse_args()
+
+    auditor = ProjectAuditor(
+        dir_index_cache=DIR_INDEX_CACHE if args.dir_cache else None,
+        results_cache=AUDIT_CACHE if args.incremental else None
+    )
 
     try:
-        auditor.run_full_audit()
-        report = auditor.generate_report()
+        with auditor.report_writer:
+            auditor.run_full_audit(workers=args.workers, executor=args.executor)
+            auditor.generate_report()
 
         print("\n" + "="*80)
         print("🎉 PROCESO COMPLETADO EXITOSAMENTE")
@@ -4,13 +4,460 @@ Memory Workspace System
 Permite crear, editar y combinar contextos de conversaciones antes de usarlos
 """
 
+import glob
+import hashlib
+import io
 import json
 import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from collections.abc import MutableSet
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, TextIO
 from datetime import datetime
-import chromadb
-from sentence_transformers import SentenceTransformer
+
+DEFAULT_DB_PATH = "/opt/apps/cli-memory-system/chroma_db"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Sesiones por query `$in` y mensajes por página al leer de ChromaDB
+FETCH_CHUNK_SIZE = 200
+FETCH_PAGE_SIZE = 5000
+
+# Export con presupuesto: peso de cada señal en el score de un mensaje
+BUDGET_WEIGHTS = {"recency": 0.3, "keywords": 0.3, "similarity": 0.4}
+CHARS_PER_TOKEN = 4
+# Exports con presupuesto cacheados por workspace (se conservan los más recientes)
+CONTEXT_CACHE_ENTRIES = 20
+
+# Búsqueda semántica (add_by_query): hits por query y queries por llamada a ChromaDB
+QUERY_TOP_K = 50
+QUERY_BATCH_SIZE = 64
+
+# Índice invertido de keywords, al lado de la base ChromaDB
+KEYWORD_INDEX_FILE = "keyword_index.sqlite3"
+# Filtros que el índice resuelve antes de traer documentos de ChromaDB
+INDEXED_FILTERS = ("has_keywords", "exclude_keywords", "date_after", "date_before", "source")
+
+# Cache por proceso: todos los workspaces comparten cliente, colección y modelo
+_clients: Dict[str, Any] = {}
+_collections: Dict[tuple, Any] = {}
+_models: Dict[str, Any] = {}
+_keyword_indexes: Dict[str, Any] = {}
+
+# Segundos por etapa de inicialización (se muestran con --timings)
+TIMINGS: Dict[str, float] = {}
+
+
+@contextmanager
+def timed(label: str):
+    """Acumula en TIMINGS[label] la duración del bloque"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        TIMINGS[label] = TIMINGS.get(label, 0.0) + time.perf_counter() - start
+
+
+def get_collection(db_path: str = DEFAULT_DB_PATH, name: str = "cli_conversations"):
+    """Cliente ChromaDB y colección, abiertos una sola vez por proceso"""
+    key = (db_path, name)
+    if key not in _collections:
+        if db_path not in _clients:
+            with timed("import chromadb"):
+                import chromadb
+            with timed("chroma client"):
+                _clients[db_path] = chromadb.PersistentClient(path=db_path)
+        with timed("chroma collection"):
+            _collections[key] = _clients[db_path].get_collection(name=name)
+    return _clients[db_path], _collections[key]
+
+
+def chroma_db_version(db_path: str) -> Optional[int]:
+    """
+    Último seq_id escrito en la base de ChromaDB (tabla max_seq_id de
+    chroma.sqlite3): sube en uno por cada registro agregado, modificado o
+    borrado y, a diferencia del mtime del archivo, no cambia al abrir un
+    cliente. Se lee con sqlite3 en modo sólo lectura, sin importar chromadb.
+    None si no se puede leer (ej. otra versión de ChromaDB): quien lo usa
+    vuelve a consultar la colección.
+    """
+    path = Path(db_path) / "chroma.sqlite3"
+    if not path.exists():
+        return None
+    try:
+        conn = sqlite3.connect(path.as_uri() + "?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT max(seq_id) FROM max_seq_id").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return row[0]
+
+
+def get_embedding_model(name: str = EMBEDDING_MODEL):
+    """
+    SentenceTransformer cargado recién cuando una operación necesita
+    embeddings (summary/export no lo usan) y compartido en el proceso
+    """
+    if name not in _models:
+        with timed("import sentence_transformers"):
+            from sentence_transformers import SentenceTransformer
+        with timed(f"load {name}"):
+            _models[name] = SentenceTransformer(name)
+    return _models[name]
+
+
+def compile_keywords(keywords: List[str]):
+    """
+    Une todas las keywords en una sola regex (alternancia de literales,
+    las más largas primero) para buscarlas con una pasada sobre el texto
+    """
+    if not keywords:
+        return re.compile(r'(?!)')  # Nunca matchea
+    literals = sorted({kw.lower() for kw in keywords}, key=len, reverse=True)
+    return re.compile("|".join(re.escape(kw) for kw in literals))
+
+
+class MessageFilter:
+    """
+    Filtros de un workspace compilados una sola vez.
+
+    Cada mensaje se evalúa en una pasada: primero los predicados baratos
+    (fecha, source) y sólo si pasan se pasa el texto a minúsculas (una vez)
+    para las keywords. min_messages/max_messages se evalúan por conversación.
+    """
+
+    def __init__(self, filters: Dict[str, Any]):
+        self.date_after = filters.get('date_after')
+        self.date_before = filters.get('date_before')
+        self.min_messages = filters.get('min_messages')
+        self.max_messages = filters.get('max_messages')
+
+        source = filters.get('source')
+        if isinstance(source, str):
+            source = [source]
+        self.sources = {s.lower() for s in source} if source else None
+
+        self.has_keywords = (compile_keywords(filters['has_keywords'])
+                             if 'has_keywords' in filters else None)
+        self.exclude_keywords = (compile_keywords(filters['exclude_keywords'])
+                                 if filters.get('exclude_keywords') else None)
+
+        self.needs_text = self.has_keywords is not None or self.exclude_keywords is not None
+
+    def accepts_conversation(self, message_count: int) -> bool:
+        """min_messages / max_messages sobre el total de la conversación"""
+        if self.min_messages is not None and message_count < self.min_messages:
+            return False
+        if self.max_messages is not None and message_count > self.max_messages:
+            return False
+        return True
+
+    def matches(self, message: Dict) -> bool:
+        metadata = message['metadata']
+
+        if self.date_after is not None or self.date_before is not None:
+            date = metadata.get('date', '')
+            if self.date_after is not None and date < self.date_after:
+                return False
+            if self.date_before is not None and date > self.date_before:
+                return False
+
+        if self.sources is not None and metadata.get('source', '').lower() not in self.sources:
+            return False
+
+        if self.needs_text:
+            text = message['text'].lower()
+            if self.has_keywords is not None and not self.has_keywords.search(text):
+                return False
+            if self.exclude_keywords is not None and self.exclude_keywords.search(text):
+                return False
+
+        return True
+
+    def filter(self, messages: List[Dict], total: Optional[int] = None) -> List[Dict]:
+        """
+        Mensajes de una conversación que pasan todos los filtros.
+        total es el largo real de la conversación cuando messages ya viene
+        pre-filtrado (por el índice de keywords)
+        """
+        if not self.accepts_conversation(len(messages) if total is None else total):
+            return []
+        return [m for m in messages if self.matches(m)]
+
+
+def _fts_phrase_query(keywords: List[str]) -> Optional[str]:
+    """
+    Query FTS5 "kw1" OR "kw2" ... para el tokenizer trigram.
+    None si alguna keyword tiene menos de 3 caracteres (el trigram no la
+    puede buscar y el índice no sirve para ese filtro)
+    """
+    if not keywords or any(len(kw) < 3 for kw in keywords):
+        return None
+    return " OR ".join('"' + kw.replace('"', '""') + '"' for kw in keywords)
+
+
+class KeywordIndex:
+    """
+    Índice invertido de cli_conversations en SQLite FTS5 (tokenizer trigram,
+    que permite buscar substrings sin distinguir mayúsculas como hace
+    MessageFilter).
+
+    Resuelve los filtros de keywords, fecha y source sobre los ids de los
+    mensajes, así sólo se traen de ChromaDB los documentos candidatos. El
+    resultado es un superconjunto: MessageFilter vuelve a verificar cada
+    mensaje en Python.
+
+    Se sincroniza con la colección cuando cambia chroma_db_version (o
+    siempre, si no se puede leer) comparando los conjuntos de ids. Si la
+    versión avanzó más que los ids agregados y borrados hubo documentos
+    modificados en el lugar: se reindexa todo.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            rowid INTEGER PRIMARY KEY,
+            id TEXT UNIQUE NOT NULL,
+            session_id TEXT,
+            date TEXT,
+            source TEXT
+        );
+        CREATE INDEX IF NOT EXISTS messages_session ON messages(session_id);
+        CREATE INDEX IF NOT EXISTS messages_date ON messages(date);
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(text, tokenize='trigram');
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.executescript(self.SCHEMA)
+
+    @classmethod
+    def open(cls, db_path: str, collection) -> Optional["KeywordIndex"]:
+        """Índice de la base (uno por proceso), sincronizado; None si no hay FTS5"""
+        if db_path not in _keyword_indexes:
+            try:
+                index = cls(Path(db_path).parent / KEYWORD_INDEX_FILE)
+                with timed("keyword index sync"):
+                    index.sync(collection, version=chroma_db_version(db_path))
+            except sqlite3.Error:
+                index = None
+            _keyword_indexes[db_path] = index
+        return _keyword_indexes[db_path]
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT count(*) FROM messages").fetchone()[0]
+
+    def _get_meta(self, key: str):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def sync(self, collection, force: bool = False, page_size: int = FETCH_PAGE_SIZE,
+             version: Optional[int] = None) -> int:
+        """
+        Agrega los mensajes nuevos de la colección y borra los que ya no
+        están. Devuelve la cantidad de cambios. Con force reindexa todo.
+        version es chroma_db_version de la base (None: comparar siempre).
+        """
+        previous = self._get_meta("db_version")
+        if force:
+            with self.conn:
+                self.conn.execute("DELETE FROM messages")
+                self.conn.execute("DELETE FROM messages_fts")
+        elif version is not None and version == previous:
+            return 0
+
+        chroma_ids = set()
+        offset = 0
+        while True:
+            results = collection.get(include=[], limit=page_size, offset=offset)
+            chroma_ids.update(results['ids'])
+            if len(results['ids']) < page_size:
+                break
+            offset += page_size
+
+        indexed = {row[0] for row in self.conn.execute("SELECT id FROM messages")}
+        removed = list(indexed - chroma_ids)
+        added = sorted(chroma_ids - indexed)
+
+        # Cada registro agregado, modificado o borrado sube la versión en uno
+        if (not force and version is not None and previous is not None
+                and version - previous > len(added) + len(removed)):
+            return self.sync(collection, force=True, page_size=page_size, version=version)
+
+        with self.conn:
+            for start in range(0, len(removed), 500):
+                chunk = removed[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                self.conn.execute(
+                    f"DELETE FROM messages_fts WHERE rowid IN "
+                    f"(SELECT rowid FROM messages WHERE id IN ({marks}))", chunk)
+                self.conn.execute(f"DELETE FROM messages WHERE id IN ({marks})", chunk)
+
+            for start in range(0, len(added), page_size):
+                results = collection.get(ids=added[start:start + page_size],
+                                         include=["documents", "metadatas"])
+                for i, doc_id in enumerate(results['ids']):
+                    metadata = results['metadatas'][i] or {}
+                    cursor = self.conn.execute(
+                        "INSERT INTO messages (id, session_id, date, source) VALUES (?, ?, ?, ?)",
+                        (doc_id, metadata.get('session_id'), metadata.get('date', ''),
+                         metadata.get('source', '').lower()))
+                    self.conn.execute("INSERT INTO messages_fts (rowid, text) VALUES (?, ?)",
+                                      (cursor.lastrowid, results['documents'][i] or ''))
+
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('db_version', ?)",
+                              (version,))
+
+        return len(added) + len(removed)
+
+    def match(self, session_ids: List[str], filters: Dict[str, Any]) -> tuple:
+        """
+        Ids de los mensajes candidatos por sesión y total de mensajes por
+        sesión (para min_messages/max_messages)
+        """
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS ws_sessions (session_id TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM ws_sessions")
+        self.conn.executemany("INSERT OR IGNORE INTO ws_sessions VALUES (?)",
+                              ((sid,) for sid in session_ids))
+
+        conditions, params = [], []
+        if 'date_after' in filters:
+            conditions.append("m.date >= ?")
+            params.append(filters['date_after'])
+        if 'date_before' in filters:
+            conditions.append("m.date <= ?")
+            params.append(filters['date_before'])
+        if filters.get('source'):
+            sources = filters['source']
+            sources = [sources] if isinstance(sources, str) else sources
+            conditions.append(f"m.source IN ({','.join('?' * len(sources))})")
+            params.extend(s.lower() for s in sources)
+
+        if 'has_keywords' in filters:
+            if not filters['has_keywords']:
+                conditions.append("0")
+            else:
+                query = _fts_phrase_query(filters['has_keywords'])
+                if query:
+                    conditions.append("m.rowid IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)")
+                    params.append(query)
+
+        # Sólo las keywords de 3+ caracteres; el resto las descarta MessageFilter
+        exclude = [kw for kw in filters.get('exclude_keywords') or [] if len(kw) >= 3]
+        if exclude:
+            conditions.append("m.rowid NOT IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)")
+            params.append(_fts_phrase_query(exclude))
+
+        where = " AND ".join(conditions) or "1"
+        ids_by_session: Dict[str, List[str]] = {}
+        for doc_id, session_id in self.conn.execute(
+                f"SELECT m.id, m.session_id FROM messages m "
+                f"JOIN ws_sessions w ON w.session_id = m.session_id WHERE {where}", params):
+            ids_by_session.setdefault(session_id, []).append(doc_id)
+
+        totals = dict(self.conn.execute(
+            "SELECT m.session_id, count(*) FROM messages m "
+            "JOIN ws_sessions w ON w.session_id = m.session_id GROUP BY m.session_id"))
+
+        return ids_by_session, totals
+
+
+def _digest(value) -> str:
+    """Hash corto y estable de un valor JSON (para nombres de cache)"""
+    key = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación rápida de tokens (~4 caracteres por token)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class _LineWriter:
+    """Escribe líneas a un stream con el mismo resultado que un '\\n'.join()"""
+
+    def __init__(self, out: TextIO):
+        self.out = out
+        self.started = False
+
+    def line(self, text: str):
+        if self.started:
+            self.out.write("\n")
+        self.out.write(text)
+        self.started = True
+
+    def lines(self, texts: List[str]):
+        for text in texts:
+            self.line(text)
+
+
+class ConversationSet(MutableSet):
+    """
+    Conjunto de session_ids que conserva el orden de inserción (respaldado
+    por un dict): pertenencia, alta y baja en O(1) y álgebra de conjuntos
+    sin recorrer elemento por elemento contra una lista.
+    """
+
+    def __init__(self, session_ids=()):
+        self._ids: Dict[str, None] = dict.fromkeys(session_ids)
+
+    def __contains__(self, sid) -> bool:
+        return sid in self._ids
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __repr__(self) -> str:
+        return f"ConversationSet({list(self._ids)!r})"
+
+    def add(self, sid: str):
+        self._ids[sid] = None
+
+    def discard(self, sid: str):
+        self._ids.pop(sid, None)
+
+    def update(self, session_ids):
+        self._ids.update(dict.fromkeys(session_ids))
+
+    def union(self, *others) -> "ConversationSet":
+        result = ConversationSet(self)
+        for other in others:
+            result.update(other)
+        return result
+
+    def intersection(self, *others) -> "ConversationSet":
+        keep = set(self._ids)
+        for other in others:
+            keep.intersection_update(other)
+        return ConversationSet(sid for sid in self._ids if sid in keep)
+
+    def difference(self, *others) -> "ConversationSet":
+        drop = set().union(*others)
+        return ConversationSet(sid for sid in self._ids if sid not in drop)
+
+    def to_list(self) -> List[str]:
+        """Lista en orden de inserción (formato del JSON del workspace)"""
+        return list(self._ids)
+
+
+# Operaciones de `merge` entre workspaces
+MERGE_OPERATIONS = {
+    "union": ConversationSet.union,
+    "intersect": ConversationSet.intersection,
+    "difference": ConversationSet.difference,
+}
 
 
 class MemoryWorkspace:
@@ -21,7 +468,7 @@ class MemoryWorkspace:
 
     def __init__(self, name: str, workspace_dir: str = None):
         self.name = name
-        self.conversations: List[str] = []  # session_ids
+        self._conversations = ConversationSet()  # session_ids
         self.filters: Dict[str, Any] = {}
         self.metadata: Dict[str, Any] = {
             "created_at": datetime.now().isoformat(),
@@ -41,33 +488,172 @@ class MemoryWorkspace:
         # ChromaDB connection
         self.client = None
         self.collection = None
-        self.model = None
 
-    def _init_db(self, db_path: str = "/opt/apps/cli-memory-system/chroma_db"):
-        """Lazy initialization de ChromaDB"""
+        # Estadísticas por conversación para generate_summary (lazy)
+        self._summary_cache: Optional[Dict[str, Any]] = None
+
+    def _init_db(self, db_path: str = DEFAULT_DB_PATH):
+        """Lazy initialization de ChromaDB (sin cargar el modelo de embeddings)"""
         if self.client is None:
-            self.client = chromadb.PersistentClient(path=db_path)
-            self.collection = self.client.get_collection(name="cli_conversations")
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.client, self.collection = get_collection(db_path)
+
+    @property
+    def model(self):
+        """Modelo de embeddings, cargado en el primer uso"""
+        return get_embedding_model()
+
+    @property
+    def conversations(self) -> ConversationSet:
+        return self._conversations
+
+    @conversations.setter
+    def conversations(self, session_ids):
+        self._conversations = ConversationSet(session_ids)
 
     def add_conversations(self, session_ids: List[str]):
-        """Agregar conversaciones al workspace"""
-        for sid in session_ids:
-            if sid not in self.conversations:
-                self.conversations.append(sid)
+        """
+        Agregar conversaciones al workspace (sus estadísticas para el
+        resumen las calcula generate_summary cuando se pide)
+        """
+        self.conversations.update(session_ids)
 
         self.metadata["modified_at"] = datetime.now().isoformat()
         return len(session_ids)
 
     def remove_conversations(self, session_ids: List[str]):
         """Remover conversaciones del workspace"""
+        stats = self._load_summary_cache()["sessions"]
         for sid in session_ids:
-            if sid in self.conversations:
-                self.conversations.remove(sid)
+            self.conversations.discard(sid)
+            stats.pop(sid, None)
 
         self.metadata["modified_at"] = datetime.now().isoformat()
         return len(session_ids)
 
+    def merge(self, others: List['MemoryWorkspace'], operation: str = "union") -> int:
+        """
+        Combina las conversaciones de este workspace con las de otros:
+        union, intersect o difference (en ese orden, de izquierda a derecha).
+        Devuelve la cantidad de conversaciones resultante.
+        """
+        if operation not in MERGE_OPERATIONS:
+            raise ValueError(f"Unknown merge operation: {operation}")
+
+        merged = MERGE_OPERATIONS[operation](self.conversations,
+                                             *(ws.conversations for ws in others))
+        removed = [sid for sid in self.conversations if sid not in merged]
+        if removed:
+            stats = self._load_summary_cache()["sessions"]
+            for sid in removed:
+                stats.pop(sid, None)
+        self.conversations = merged
+
+        for ws in others:
+            for tag in ws.metadata.get("tags", []):
+                if tag not in self.metadata.setdefault("tags", []):
+                    self.metadata["tags"].append(tag)
+
+        self.metadata["modified_at"] = datetime.now().isoformat()
+        return len(merged)
+
+    def add_by_query(self, text: str, k: int = QUERY_TOP_K, threshold: float = 0.0,
+                     max_sessions: Optional[int] = None, db_path: str = DEFAULT_DB_PATH,
+                     use_cache: bool = True) -> List[Dict[str, Any]]:
+        """
+        Agrega las conversaciones más parecidas a text: top-k mensajes por
+        similitud coseno en ChromaDB, agrupados por session_id (score de la
+        sesión = su mejor mensaje). Ver add_by_queries.
+        """
+        return self.add_by_queries([text], k, threshold, max_sessions, db_path, use_cache)
+
+    def add_by_queries(self, texts: List[str], k: int = QUERY_TOP_K, threshold: float = 0.0,
+                       max_sessions: Optional[int] = None, db_path: str = DEFAULT_DB_PATH,
+                       use_cache: bool = True) -> List[Dict[str, Any]]:
+        """
+        Versión batch de add_by_query: las queries se embeben juntas y se
+        consultan de a QUERY_BATCH_SIZE por llamada a ChromaDB. Cada resultado
+        por query queda cacheado en disco (se invalida si cambia la colección).
+
+        threshold es la similitud mínima de una sesión y max_sessions el
+        máximo de sesiones agregadas por query. Devuelve las sesiones
+        agregadas: [{'session_id', 'score', 'hits', 'query'}, ...] en orden de score.
+        """
+        self._init_db(db_path)
+        texts = list(dict.fromkeys(texts))
+        results = {}
+        pending = []
+        cache_dir = self.workspace_dir / ".cache"
+        collection_count = self.collection.count()
+
+        def cache_path(text: str) -> Path:
+            key = json.dumps([db_path, EMBEDDING_MODEL, collection_count, text, k])
+            digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+            return cache_dir / f"query-{digest}.json"
+
+        for text in texts:
+            if use_cache:
+                try:
+                    with open(cache_path(text)) as f:
+                        results[text] = json.load(f)
+                    continue
+                except (OSError, ValueError):
+                    pass  # Sin cache o ilegible (ej. un archivo cortado): se consulta
+            pending.append(text)
+
+        for start in range(0, len(pending), QUERY_BATCH_SIZE):
+            batch = pending[start:start + QUERY_BATCH_SIZE]
+            for text, sessions in zip(batch, self._query_sessions(batch, k)):
+                results[text] = sessions
+                if use_cache:
+                    cache_dir.mkdir(parents=True, exist_ok=True)
+                    path = cache_path(text)
+                    tmp_path = path.with_suffix(".tmp")
+                    with open(tmp_path, 'w') as f:
+                        json.dump(sessions, f)
+                    os.replace(tmp_path, path)
+
+        added = []
+        for text in texts:
+            sessions = [s for s in results[text] if s['score'] >= threshold]
+            for session in sessions[:max_sessions]:
+                if session['session_id'] not in self.conversations:
+                    self.conversations.add(session['session_id'])
+                    added.append(dict(session, query=text))
+
+        if added:
+            self.metadata["modified_at"] = datetime.now().isoformat()
+        return sorted(added, key=lambda s: s['score'], reverse=True)
+
+    def _query_sessions(self, texts: List[str], k: int) -> List[List[Dict[str, Any]]]:
+        """Top-k de ChromaDB para varias queries, agrupado por session_id"""
+        import numpy as np
+        query_vecs = np.asarray(self.model.encode(texts), dtype=float)
+        query_norms = np.linalg.norm(query_vecs, axis=1)
+        query_norms[query_norms == 0] = 1.0
+        query_vecs /= query_norms[:, None]
+
+        response = self.collection.query(query_embeddings=query_vecs.tolist(), n_results=k,
+                                         include=["metadatas", "embeddings"])
+
+        # Similitud coseno calculada acá: no depende del espacio de la colección
+        grouped = []
+        for i in range(len(texts)):
+            vectors = np.asarray(response['embeddings'][i], dtype=float)
+            sessions: Dict[str, Dict[str, Any]] = {}
+            if len(vectors):
+                norms = np.linalg.norm(vectors, axis=1)
+                norms[norms == 0] = 1.0
+                scores = (vectors @ query_vecs[i] / norms).tolist()
+                for meta, score in zip(response['metadatas'][i], scores):
+                    sid = meta.get('session_id')
+                    if not sid:
+                        continue
+                    session = sessions.setdefault(sid, {'session_id': sid, 'score': score, 'hits': 0})
+                    session['score'] = max(session['score'], score)
+                    session['hits'] += 1
+            grouped.append(sorted(sessions.values(), key=lambda s: (-s['score'], -s['hits'])))
+        return grouped
+
     def apply_filters(self, filters: Dict[str, Any]):
         """
         Aplicar filtros a las conversaciones
@@ -75,91 +661,213 @@ class MemoryWorkspace:
         Filtros soportados:
         - date_after: str (ISO date)
         - date_before: str (ISO date)
-        - min_messages: int
-        - max_messages: int
-        - source: str (claude, codex, gemini)
+        - min_messages: int (mensajes de la conversación)
+        - max_messages: int (mensajes de la conversación)
+        - source: str o List[str] (claude, codex, gemini)
         - has_keywords: List[str]
         - exclude_keywords: List[str]
         """
         self.filters.update(filters)
         self.metadata["modified_at"] = datetime.now().isoformat()
 
-    def get_messages(self, db_path: str = "/opt/apps/cli-memory-system/chroma_db") -> List[Dict[str, Any]]:
+    def get_messages(self, db_path: str = DEFAULT_DB_PATH,
+                     chunk_size: int = FETCH_CHUNK_SIZE,
+                     page_size: int = FETCH_PAGE_SIZE,
+                     use_index: bool = True) -> List[Dict[str, Any]]:
         """
         Obtiene todos los mensajes de las conversaciones en el workspace
         aplicando los filtros configurados
         """
-        self._init_db(db_path)
+        return [
+            msg
+            for _, messages in self.iter_sessions(db_path, chunk_size, page_size, use_index)
+            for msg in messages
+        ]
 
-        all_messages = []
+    def iter_sessions(self, db_path: str = DEFAULT_DB_PATH,
+                      chunk_size: int = FETCH_CHUNK_SIZE,
+                      page_size: int = FETCH_PAGE_SIZE,
+                      use_index: bool = True,
+                      session_ids: Optional[List[str]] = None):
+        """
+        Genera (session_id, mensajes filtrados) en el orden del workspace
+        (o de session_ids, si se pasa un subconjunto), trayendo de ChromaDB
+        de a chunk_size sesiones: en memoria sólo queda el chunk actual.
 
-        for session_id in self.conversations:
-            # Obtener mensajes de la conversación
-            results = self.collection.get(
-                where={"session_id": session_id},
-                limit=1000
-            )
+        Si hay filtros de keywords, fecha o source se resuelven primero en
+        el KeywordIndex y sólo se traen de ChromaDB los mensajes candidatos.
+        """
+        self._init_db(db_path)
 
-            if not results['ids']:
-                continue
+        index = None
+        if use_index and any(key in self.filters for key in INDEXED_FILTERS):
+            index = KeywordIndex.open(db_path, self.collection)
 
-            # Ordenar por orden del mensaje
-            messages = []
-            for i, doc_id in enumerate(results['ids']):
-                msg = {
-                    'id': doc_id,
-                    'text': results['documents'][i],
-                    'metadata': results['metadatas'][i],
-                    'order': int(doc_id.split('_')[-1]) if '_' in doc_id else i,
-                    'session_id': session_id
-                }
-                messages.append(msg)
+        session_ids = list(dict.fromkeys(self.conversations if session_ids is None else session_ids))
 
-            messages.sort(key=lambda x: x['order'])
+        ids_by_session, totals = None, None
+        if index is not None:
+            ids_by_session, totals = index.match(session_ids, self.filters)
+        message_filter = MessageFilter(self.filters) if self.filters else None
 
-            # Aplicar filtros
-            if self.filters:
-                messages = self._filter_messages(messages)
+        for start in range(0, len(session_ids), chunk_size):
+            chunk = session_ids[start:start + chunk_size]
+            if index is not None:
+                by_session = self._fetch_candidates(chunk, ids_by_session, totals,
+                                                    message_filter, page_size)
+            else:
+                by_session = self._fetch_sessions(chunk, chunk_size, page_size)
 
-            all_messages.extend(messages)
+            for session_id in chunk:
+                messages = by_session.get(session_id)
+                if not messages:
+                    continue
 
-        return all_messages
+                # Aplicar filtros
+                if message_filter is not None:
+                    messages = message_filter.filter(
+                        messages, totals.get(session_id) if totals is not None else None)
 
-    def _filter_messages(self, messages: List[Dict]) -> List[Dict]:
-        """Aplicar filtros a una lista de mensajes"""
-        filtered = messages
+                if messages:
+                    yield session_id, messages
 
-        # Filtro por fecha
-        if 'date_after' in self.filters:
-            date_after = self.filters['date_after']
-            filtered = [m for m in filtered
-                       if m['metadata'].get('date', '') >= date_after]
+    def _fetch_sessions(self, session_ids: List[str],
+                        chunk_size: int = FETCH_CHUNK_SIZE,
+                        page_size: int = FETCH_PAGE_SIZE) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Trae los mensajes de varias sesiones con pocas queries:
+        una query `$in` por cada chunk_size sesiones, paginada de a page_size
+        mensajes (sin el tope de 1000 mensajes por sesión).
+        Devuelve session_id -> mensajes ordenados por orden del mensaje.
+        """
+        by_session: Dict[str, List[Dict[str, Any]]] = {}
+
+        unique_ids = list(dict.fromkeys(session_ids))
+        for start in range(0, len(unique_ids), chunk_size):
+            chunk = unique_ids[start:start + chunk_size]
+            where = {"session_id": chunk[0]} if len(chunk) == 1 else {"session_id": {"$in": chunk}}
+
+            offset = 0
+            while True:
+                results = self.collection.get(
+                    where=where,
+                    limit=page_size,
+                    offset=offset,
+                    include=["documents", "metadatas"]
+                )
+
+                self._group_results(results, by_session)
+
+                if len(results['ids']) < page_size:
+                    break
+                offset += page_size
+
+        # Ordenar por orden del mensaje
+        for messages in by_session.values():
+            messages.sort(key=lambda x: x['order'])
 
-        if 'date_before' in self.filters:
-            date_before = self.filters['date_before']
-            filtered = [m for m in filtered
-                       if m['metadata'].get('date', '') <= date_before]
+        return by_session
 
-        # Filtro por keywords
-        if 'has_keywords' in self.filters:
-            keywords = self.filters['has_keywords']
-            filtered = [m for m in filtered
-                       if any(kw.lower() in m['text'].lower() for kw in keywords)]
+    def _fetch_candidates(self, session_ids: List[str],
+                          ids_by_session: Dict[str, List[str]],
+                          totals: Dict[str, int],
+                          message_filter: MessageFilter,
+                          page_size: int = FETCH_PAGE_SIZE) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Trae por id sólo los mensajes que el KeywordIndex marcó como
+        candidatos para estas sesiones
+        """
+        ids = []
+        for session_id in session_ids:
+            if session_id in ids_by_session and message_filter.accepts_conversation(totals[session_id]):
+                ids.extend(ids_by_session[session_id])
+
+        by_session: Dict[str, List[Dict[str, Any]]] = {}
+        for start in range(0, len(ids), page_size):
+            results = self.collection.get(ids=ids[start:start + page_size],
+                                          include=["documents", "metadatas"])
+            self._group_results(results, by_session)
+
+        for messages in by_session.values():
+            messages.sort(key=lambda x: x['order'])
 
-        if 'exclude_keywords' in self.filters:
-            keywords = self.filters['exclude_keywords']
-            filtered = [m for m in filtered
-                       if not any(kw.lower() in m['text'].lower() for kw in keywords)]
+        return by_session
+
+    @staticmethod
+    def _group_results(results: Dict[str, Any], by_session: Dict[str, List[Dict[str, Any]]]):
+        """Agrega el resultado de un collection.get a by_session"""
+        for i, doc_id in enumerate(results['ids']):
+            metadata = results['metadatas'][i]
+            session_id = metadata.get('session_id')
+            messages = by_session.setdefault(session_id, [])
+            messages.append({
+                'id': doc_id,
+                'text': results['documents'][i],
+                'metadata': metadata,
+                'order': int(doc_id.split('_')[-1]) if '_' in doc_id else len(messages),
+                'session_id': session_id
+            })
 
-        return filtered
+    def _filter_messages(self, messages: List[Dict]) -> List[Dict]:
+        """Aplicar filtros a una lista de mensajes (de una conversación)"""
+        return MessageFilter(self.filters).filter(messages)
 
-    def generate_summary(self, db_path: str = "/opt/apps/cli-memory-system/chroma_db") -> Dict[str, Any]:
+    def generate_summary(self, db_path: str = DEFAULT_DB_PATH) -> Dict[str, Any]:
         """
         Genera un resumen ejecutivo del workspace
-        """
-        messages = self.get_messages(db_path)
 
-        if not messages:
+        Usa estadísticas por conversación guardadas en <name>.summary.json
+        junto con el estado de la base cuando se calcularon (chroma_db_version
+        y collection.count()):
+        - base sin escrituras y ninguna conversación nueva: sólo se lee el
+          archivo (no se abre ChromaDB)
+        - misma cantidad de mensajes: se leen sólo las conversaciones nuevas
+        - si no, se cuentan los mensajes de cada conversación (sólo metadata)
+          y se recalculan las que no coinciden
+        Cambiar los filtros recalcula todo.
+        """
+        cache = self._session_stats_cache()
+        stats = cache["sessions"]
+        session_ids = self.conversations.to_list()
+        for sid in set(stats) - set(session_ids):
+            del stats[sid]
+
+        version = chroma_db_version(db_path)
+        missing = [sid for sid in session_ids if sid not in stats]
+        if version is None or version != cache.get("db_version") or missing:
+            self._init_db(db_path)
+            collection_count = self.collection.count()
+            if cache.get("collection_count") == collection_count:
+                check = missing
+            else:
+                check = session_ids
+            counts = self._session_counts(check) if check else {}
+            stale = [sid for sid in check
+                     if sid not in stats or stats[sid]["raw_count"] != counts.get(sid, 0)]
+            if stale:
+                self._compute_session_stats(stale, db_path, counts)
+            if (stale or cache.get("collection_count") != collection_count
+                    or cache.get("db_version") != version):
+                cache["collection_count"] = collection_count
+                cache["db_version"] = version
+                self._save_summary_cache()
+
+        # Agregado de todas las conversaciones
+        total_messages = 0
+        sources: Dict[str, int] = {}
+        word_freq: Counter = Counter()
+        starts, ends = [], []
+        for sid in session_ids:
+            session = stats[sid]
+            total_messages += session["messages"]
+            for source, count in session["sources"].items():
+                sources[source] = sources.get(source, 0) + count
+            word_freq.update(session["words"])
+            if session["date_start"]:
+                starts.append(session["date_start"])
+                ends.append(session["date_end"])
+
+        if not total_messages:
             return {
                 "total_conversations": 0,
                 "total_messages": 0,
@@ -168,43 +876,121 @@ class MemoryWorkspace:
                 "topics": []
             }
 
-        # Estadísticas básicas
-        sources = {}
-        for msg in messages:
-            source = msg['metadata'].get('source', 'unknown')
-            sources[source] = sources.get(source, 0) + 1
-
         # Rango de fechas
-        dates = [m['metadata'].get('date', '') for m in messages if m['metadata'].get('date')]
         date_range = {}
-        if dates:
+        if starts:
             date_range = {
-                "start": min(dates),
-                "end": max(dates)
+                "start": min(starts),
+                "end": max(ends)
             }
 
-        # Topics (primeras palabras más frecuentes)
-        all_text = ' '.join([m['text'][:200] for m in messages[:50]])
-        words = all_text.lower().split()
-        word_freq = {}
-        for word in words:
-            if len(word) > 5:  # Solo palabras significativas
-                word_freq[word] = word_freq.get(word, 0) + 1
-
-        top_topics = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:10]
-
         return {
             "name": self.name,
             "total_conversations": len(self.conversations),
-            "total_messages": len(messages),
+            "total_messages": total_messages,
             "date_range": date_range,
             "sources": sources,
-            "topics": [t[0] for t in top_topics],
+            "topics": [word for word, _ in word_freq.most_common(10)],
             "filters_applied": self.filters,
             "metadata": self.metadata
         }
 
-    def export(self, format: str = "markdown", db_path: str = "/opt/apps/cli-memory-system/chroma_db") -> str:
+    def _session_stats_cache(self) -> Dict[str, Any]:
+        """Cache de estadísticas, vaciado si cambiaron los filtros"""
+        cache = self._load_summary_cache()
+        if cache["filters"] != self.filters:
+            cache["sessions"] = {}
+            cache["filters"] = dict(self.filters)
+        return cache
+
+    def _session_counts(self, session_ids: List[str],
+                        chunk_size: int = FETCH_CHUNK_SIZE,
+                        page_size: int = FETCH_PAGE_SIZE) -> Dict[str, int]:
+        """Mensajes por conversación en ChromaDB (trae sólo metadata, sin documentos)"""
+        counts: Dict[str, int] = {}
+        for start in range(0, len(session_ids), chunk_size):
+            chunk = session_ids[start:start + chunk_size]
+            where = {"session_id": chunk[0]} if len(chunk) == 1 else {"session_id": {"$in": chunk}}
+            offset = 0
+            while True:
+                results = self.collection.get(where=where, limit=page_size, offset=offset,
+                                              include=["metadatas"])
+                for metadata in results['metadatas']:
+                    sid = metadata.get('session_id')
+                    counts[sid] = counts.get(sid, 0) + 1
+                if len(results['ids']) < page_size:
+                    break
+                offset += page_size
+        return counts
+
+    def _compute_session_stats(self, session_ids: List[str], db_path: str = DEFAULT_DB_PATH,
+                               counts: Optional[Dict[str, int]] = None):
+        """
+        Calcula (o recalcula) las estadísticas de estas conversaciones.
+        Se leen directo de ChromaDB, sin pasar por el KeywordIndex.
+        """
+        self._init_db(db_path)
+        stats = self._session_stats_cache()["sessions"]
+        if counts is None:
+            counts = self._session_counts(session_ids)
+        for sid in session_ids:
+            stats[sid] = self._empty_session_stats(counts.get(sid, 0))
+        for sid, messages in self.iter_sessions(db_path, use_index=False, session_ids=session_ids):
+            self._add_session_stats(stats[sid], messages)
+
+    @staticmethod
+    def _empty_session_stats(raw_count: int) -> Dict[str, Any]:
+        return {"raw_count": raw_count, "messages": 0, "sources": {},
+                "date_start": None, "date_end": None, "words": {}}
+
+    @staticmethod
+    def _add_session_stats(session: Dict[str, Any], messages: List[Dict]):
+        """
+        Estadísticas de una conversación (mensajes ya filtrados). Se guardan
+        todas las palabras con su cuenta, así los topics del workspace salen
+        del texto completo de cada conversación.
+        """
+        words: Counter = Counter(session["words"])
+        for msg in messages:
+            source = msg['metadata'].get('source', 'unknown')
+            session["sources"][source] = session["sources"].get(source, 0) + 1
+
+            date = msg['metadata'].get('date')
+            if date:
+                if session["date_start"] is None or date < session["date_start"]:
+                    session["date_start"] = date
+                if session["date_end"] is None or date > session["date_end"]:
+                    session["date_end"] = date
+
+            # Topics: palabras significativas de todo el texto
+            words.update(w for w in msg['text'].lower().split() if len(w) > 5)
+
+        session["messages"] += len(messages)
+        session["words"] = dict(words)
+
+    @property
+    def summary_path(self) -> Path:
+        return self.workspace_dir / f"{self.name}.summary.json"
+
+    def _load_summary_cache(self) -> Dict[str, Any]:
+        """Cache de estadísticas por conversación (se lee una vez)"""
+        if self._summary_cache is None:
+            try:
+                with open(self.summary_path) as f:
+                    self._summary_cache = json.load(f)
+            except (OSError, ValueError):
+                self._summary_cache = {"filters": dict(self.filters), "sessions": {}}
+        return self._summary_cache
+
+    def _save_summary_cache(self):
+        if self._summary_cache is None:
+            return
+        tmp_path = self.summary_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self._summary_cache, f, ensure_ascii=False)
+        os.replace(tmp_path, self.summary_path)
+
+    def export(self, format: str = "markdown", db_path: str = DEFAULT_DB_PATH) -> str:
         """
         Exporta el workspace en diferentes formatos
 
@@ -212,48 +998,90 @@ class MemoryWorkspace:
         - markdown: Para lectura humana
         - claude-context: Optimizado para Claude
         - json: Estructura completa
+
+        Arma todo el texto en memoria; para workspaces grandes usar
+        export_to() con un archivo o sys.stdout.
         """
-        messages = self.get_messages(db_path)
+        out = io.StringIO()
+        self.export_to(out, format, db_path)
+        return out.getvalue()
 
-        if format == "json":
-            return json.dumps({
-                "workspace": self.name,
-                "metadata": self.metadata,
-                "conversations": self.conversations,
-                "filters": self.filters,
-                "messages": [{"text": m['text'], "metadata": m['metadata']} for m in messages]
-            }, indent=2, ensure_ascii=False)
+    def export_to(self, out: TextIO, format: str = "markdown", db_path: str = DEFAULT_DB_PATH):
+        """
+        Escribe el export en un file-like a medida que se traen las sesiones.
 
-        elif format == "markdown":
-            return self._export_markdown(messages)
+        JSON se escribe directo. Markdown y claude-context necesitan el total
+        de mensajes en el encabezado: el cuerpo se escribe primero a un
+        archivo temporal (en disco a partir de 1 MB) y después se copia.
+        La memoria no depende del tamaño del workspace.
+        """
+        if format not in ("json", "markdown", "claude-context"):
+            raise ValueError(f"Unknown format: {format}")
 
-        elif format == "claude-context":
-            return self._export_claude_context(messages)
+        sessions = self.iter_sessions(db_path)
 
-        else:
-            raise ValueError(f"Unknown format: {format}")
+        if format == "json":
+            self._write_json(out, sessions)
+            return
 
-    def _export_markdown(self, messages: List[Dict]) -> str:
-        """Export a Markdown legible"""
-        lines = [
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode='w+', encoding='utf-8') as body:
+            body_writer = _LineWriter(body)
+            if format == "markdown":
+                total = self._write_markdown_messages(body_writer, sessions)
+            else:
+                total = self._write_claude_context_conversations(body_writer, sessions)
+
+            writer = _LineWriter(out)
+            if format == "markdown":
+                self._write_markdown_header(writer, total)
+            else:
+                self._write_claude_context_header(writer, total)
+
+            if body_writer.started:
+                out.write("\n")
+                body.seek(0)
+                shutil.copyfileobj(body, out)
+
+    def _write_json(self, out: TextIO, sessions):
+        """JSON con indent=2, mensaje por mensaje (sin json.dumps del total)"""
+        def dumps(value, indent: str) -> str:
+            text = json.dumps(value, indent=2, ensure_ascii=False)
+            return text.replace("\n", "\n" + indent)
+
+        out.write("{\n")
+        for key, value in (("workspace", self.name), ("metadata", self.metadata),
+                           ("conversations", self.conversations.to_list()), ("filters", self.filters)):
+            out.write(f'  {json.dumps(key)}: {dumps(value, "  ")},\n')
+
+        out.write('  "messages": [')
+        first = True
+        for _, messages in sessions:
+            for m in messages:
+                out.write("\n    " if first else ",\n    ")
+                out.write(dumps({"text": m['text'], "metadata": m['metadata']}, "    "))
+                first = False
+        out.write("]\n}" if first else "\n  ]\n}")
+
+    def _write_markdown_header(self, writer: "_LineWriter", total_messages: int):
+        writer.lines([
             f"# Memory Workspace: {self.name}",
             "",
             f"**Created**: {self.metadata['created_at']}",
             f"**Modified**: {self.metadata['modified_at']}",
             f"**Conversations**: {len(self.conversations)}",
-            f"**Messages**: {len(messages)}",
+            f"**Messages**: {total_messages}",
             ""
-        ]
+        ])
 
         if self.metadata.get('description'):
-            lines.extend([
+            writer.lines([
                 "## Description",
                 self.metadata['description'],
                 ""
             ])
 
         if self.filters:
-            lines.extend([
+            writer.lines([
                 "## Filters Applied",
                 "```json",
                 json.dumps(self.filters, indent=2),
@@ -261,61 +1089,57 @@ class MemoryWorkspace:
                 ""
             ])
 
-        lines.append("## Messages")
-        lines.append("")
-
-        current_session = None
-        for msg in messages:
-            session_id = msg['session_id']
+        writer.line("## Messages")
+        writer.line("")
 
+    def _write_markdown_messages(self, writer: "_LineWriter", sessions) -> int:
+        """Export a Markdown legible (cuerpo); devuelve la cantidad de mensajes"""
+        total = 0
+        for session_id, messages in sessions:
             # Nueva conversación
-            if session_id != current_session:
-                current_session = session_id
-                lines.extend([
-                    "",
-                    f"### Conversation: {session_id[:8]}",
-                    f"**Source**: {msg['metadata'].get('source', 'unknown')}",
-                    f"**Date**: {msg['metadata'].get('date', 'unknown')}",
-                    ""
-                ])
-
-            # Mensaje
-            lines.append(f"**Message {msg['order']}**:")
-            lines.append(msg['text'])
-            lines.append("")
-
-        return '\n'.join(lines)
-
-    def _export_claude_context(self, messages: List[Dict]) -> str:
-        """Export optimizado para cargar en Claude"""
-        lines = [
+            msg = messages[0]
+            writer.lines([
+                "",
+                f"### Conversation: {session_id[:8]}",
+                f"**Source**: {msg['metadata'].get('source', 'unknown')}",
+                f"**Date**: {msg['metadata'].get('date', 'unknown')}",
+                ""
+            ])
+
+            # Mensajes
+            for msg in messages:
+                writer.line(f"**Message {msg['order']}**:")
+                writer.line(msg['text'])
+                writer.line("")
+            total += len(messages)
+
+        return total
+
+    def _write_claude_context_header(self, writer: "_LineWriter", total_messages: int):
+        """Export optimizado para cargar en Claude (encabezado)"""
+        writer.lines([
             f"# Context from Memory Workspace: {self.name}",
             "",
-            f"This workspace contains {len(messages)} messages from {len(self.conversations)} previous conversations.",
+            f"This workspace contains {total_messages} messages from {len(self.conversations)} previous conversations.",
             ""
-        ]
+        ])
 
         if self.metadata.get('description'):
-            lines.extend([
+            writer.lines([
                 "## Purpose",
                 self.metadata['description'],
                 ""
             ])
 
-        # Agrupar por conversación
-        conversations = {}
-        for msg in messages:
-            sid = msg['session_id']
-            if sid not in conversations:
-                conversations[sid] = []
-            conversations[sid].append(msg)
-
-        lines.append("## Previous Conversations")
-        lines.append("")
+        writer.line("## Previous Conversations")
+        writer.line("")
 
-        for sid, msgs in conversations.items():
+    def _write_claude_context_conversations(self, writer: "_LineWriter", sessions) -> int:
+        """Cuerpo del export claude-context; devuelve la cantidad de mensajes"""
+        total = 0
+        for sid, msgs in sessions:
             first_msg = msgs[0]
-            lines.extend([
+            writer.lines([
                 f"### [{first_msg['metadata'].get('source', 'unknown').upper()}] {first_msg['metadata'].get('date', 'unknown')[:10]}",
                 ""
             ])
@@ -323,21 +1147,221 @@ class MemoryWorkspace:
             # Solo primeros y últimos 3 mensajes para contexto
             if len(msgs) <= 6:
                 for msg in msgs:
-                    lines.append(msg['text'])
-                    lines.append("")
+                    writer.line(msg['text'])
+                    writer.line("")
             else:
                 for msg in msgs[:3]:
-                    lines.append(msg['text'])
-                    lines.append("")
+                    writer.line(msg['text'])
+                    writer.line("")
 
-                lines.append(f"... [{len(msgs) - 6} messages omitted] ...")
-                lines.append("")
+                writer.line(f"... [{len(msgs) - 6} messages omitted] ...")
+                writer.line("")
 
                 for msg in msgs[-3:]:
-                    lines.append(msg['text'])
-                    lines.append("")
+                    writer.line(msg['text'])
+                    writer.line("")
+            total += len(msgs)
+
+        return total
 
-        return '\n'.join(lines)
+    def export_budgeted(self, budget: int, unit: str = "tokens", query: Optional[str] = None,
+                        keywords: Optional[List[str]] = None,
+                        db_path: str = DEFAULT_DB_PATH, use_cache: bool = True) -> str:
+        """
+        Export claude-context que entra en un presupuesto de tokens o caracteres.
+
+        Cada mensaje recibe un score (BUDGET_WEIGHTS) por recencia, hits de
+        keywords (las pasadas o has_keywords de los filtros) y similitud
+        coseno entre su embedding en ChromaDB y el de query. Se eligen los
+        mensajes con mejor score por unidad de costo (knapsack greedy) y se
+        escriben en orden original. Los textos se leen dos veces (scoring y
+        armado) pero nunca se guardan todos en memoria.
+
+        El resultado queda cacheado por (workspace, presupuesto, query) en
+        .cache/<name>/; los exports de estados anteriores del workspace o de
+        la base se borran (ver _prune_context_cache).
+        """
+        if unit not in ("tokens", "chars"):
+            raise ValueError(f"Unknown budget unit: {unit}")
+        self._init_db(db_path)
+
+        if keywords is None:
+            keywords = self.filters.get('has_keywords') or []
+
+        cache_path = None
+        if use_cache:
+            db_state = _digest([self.collection.count(), chroma_db_version(db_path)])
+            cache_prefix = f"context-{self._context_state()}-{db_state}-"
+            request = _digest([budget, unit, query, keywords])
+            cache_path = self.context_cache_dir / f"{cache_prefix}{request}.md"
+            try:
+                return cache_path.read_text(encoding='utf-8')
+            except OSError:
+                pass
+
+        cost = estimate_tokens if unit == "tokens" else len
+        keyword_re = compile_keywords(keywords) if keywords else None
+
+        # 1. Candidatos (sin texto): costo, hits de keywords y datos para ordenar
+        candidates = []
+        for session_id, messages in self.iter_sessions(db_path):
+            for msg in messages:
+                hits = len(keyword_re.findall(msg['text'].lower())) if keyword_re else 0
+                candidates.append({
+                    'id': msg['id'],
+                    'session_id': session_id,
+                    'order': msg['order'],
+                    'date': msg['metadata'].get('date', ''),
+                    'source': msg['metadata'].get('source', 'unknown'),
+                    'cost': cost(msg['text']) + cost("\n\n"),
+                    'hits': hits,
+                })
+
+        # 2. Score
+        self._score_candidates(candidates, query, bool(keyword_re))
+
+        # 3. Selección greedy por score/costo. Cada mensaje elegido puede
+        # sumar un marcador de omitidos y cada conversación abierta su título
+        # y un marcador final
+        header = self._budgeted_header(len(candidates), len(candidates), budget, unit)
+        remaining = budget - cost("\n".join(header))
+        marker_cost = cost(f"... [{len(candidates)} messages omitted] ...\n\n")
+        for cand in candidates:
+            cand['cost'] += marker_cost
+        selected = set()
+        opened_sessions = set()
+        for cand in sorted(candidates, key=lambda c: c['score'] / max(c['cost'], 1), reverse=True):
+            extra = 0
+            if cand['session_id'] not in opened_sessions:
+                extra = cost(f"### [{cand['source'].upper()}] {cand['date'][:10]}\n\n") + marker_cost
+            if cand['cost'] + extra > remaining:
+                continue
+            remaining -= cand['cost'] + extra
+            selected.add(cand['id'])
+            opened_sessions.add(cand['session_id'])
+
+        # 4. Armado en orden original, trayendo sólo los textos elegidos
+        texts = {}
+        selected_ids = [c['id'] for c in candidates if c['id'] in selected]
+        for start in range(0, len(selected_ids), FETCH_PAGE_SIZE):
+            results = self.collection.get(ids=selected_ids[start:start + FETCH_PAGE_SIZE],
+                                          include=["documents"])
+            texts.update(zip(results['ids'], results['documents']))
+
+        out = io.StringIO()
+        writer = _LineWriter(out)
+        writer.lines(self._budgeted_header(len(selected), len(candidates), budget, unit))
+
+        session_id, omitted = None, 0
+        for cand in candidates:
+            if cand['session_id'] != session_id:
+                if omitted and session_id in opened_sessions:
+                    writer.lines([f"... [{omitted} messages omitted] ...", ""])
+                session_id, omitted = cand['session_id'], 0
+                if session_id in opened_sessions:
+                    writer.lines([f"### [{cand['source'].upper()}] {cand['date'][:10]}", ""])
+
+            if cand['id'] not in selected:
+                omitted += 1
+                continue
+            if omitted:
+                writer.lines([f"... [{omitted} messages omitted] ...", ""])
+                omitted = 0
+            writer.lines([texts[cand['id']], ""])
+
+        if omitted and session_id in opened_sessions:
+            writer.lines([f"... [{omitted} messages omitted] ...", ""])
+
+        content = out.getvalue()
+        if cache_path is not None:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(".tmp")
+            tmp_path.write_text(content, encoding='utf-8')
+            os.replace(tmp_path, cache_path)
+            self._prune_context_cache(cache_prefix)
+        return content
+
+    @property
+    def context_cache_dir(self) -> Path:
+        return self.workspace_dir / ".cache" / self.name
+
+    def _context_state(self) -> str:
+        """Digest de lo que del workspace cambia el resultado de export_budgeted"""
+        return _digest([self.filters, self.conversations.to_list(), self.metadata.get('modified_at')])
+
+    def _prune_context_cache(self, prefix: str, keep: int = CONTEXT_CACHE_ENTRIES):
+        """
+        Borra los exports cacheados cuyo nombre no empieza con prefix (de un
+        estado anterior) y deja sólo los keep más recientes. También borra
+        los del formato anterior (.cache/<name>-context-<digest>.md).
+        """
+        stale = list(self.workspace_dir.glob(f".cache/{glob.escape(self.name)}-context-*.md"))
+        current = []
+        try:
+            with os.scandir(self.context_cache_dir) as it:
+                for entry in it:
+                    if entry.name.startswith(prefix):
+                        current.append((entry.stat().st_mtime_ns, entry.path))
+                    else:
+                        stale.append(entry.path)
+        except OSError:
+            pass
+        current.sort(reverse=True)
+        stale.extend(path for _, path in current[keep:])
+        for path in stale:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def _budgeted_header(self, selected: int, total: int, budget: int, unit: str) -> List[str]:
+        lines = [
+            f"# Context from Memory Workspace: {self.name}",
+            "",
+            f"This workspace contains {selected} of {total} messages from {len(self.conversations)} "
+            f"previous conversations (budget: {budget} {unit}).",
+            ""
+        ]
+        if self.metadata.get('description'):
+            lines.extend(["## Purpose", self.metadata['description'], ""])
+        lines.extend(["## Previous Conversations", ""])
+        return lines
+
+    def _score_candidates(self, candidates: List[Dict], query: Optional[str], use_keywords: bool):
+        """Agrega 'score' (0..1) a cada candidato según BUDGET_WEIGHTS"""
+        if not candidates:
+            return
+
+        signals = {"recency": [0.0] * len(candidates)}
+        ranked = sorted(range(len(candidates)),
+                        key=lambda i: (candidates[i]['date'], candidates[i]['order']))
+        for rank, i in enumerate(ranked):
+            signals["recency"][i] = rank / max(len(candidates) - 1, 1)
+
+        if use_keywords:
+            max_hits = max(c['hits'] for c in candidates) or 1
+            signals["keywords"] = [c['hits'] / max_hits for c in candidates]
+
+        if query:
+            import numpy as np
+            query_vec = np.asarray(self.model.encode(query), dtype=float)
+            query_vec /= np.linalg.norm(query_vec) or 1.0
+            similarity = {}
+            ids = [c['id'] for c in candidates]
+            for start in range(0, len(ids), FETCH_PAGE_SIZE):
+                results = self.collection.get(ids=ids[start:start + FETCH_PAGE_SIZE],
+                                              include=["embeddings"])
+                vectors = np.asarray(results['embeddings'], dtype=float)
+                norms = np.linalg.norm(vectors, axis=1)
+                norms[norms == 0] = 1.0
+                scores = vectors @ query_vec / norms
+                similarity.update(zip(results['ids'], scores.tolist()))
+            signals["similarity"] = [max(similarity.get(c['id'], 0.0), 0.0) for c in candidates]
+
+        total_weight = sum(BUDGET_WEIGHTS[name] for name in signals)
+        for i, cand in enumerate(candidates):
+            cand['score'] = sum(BUDGET_WEIGHTS[name] * values[i]
+                                for name, values in signals.items()) / total_weight
 
     def save(self):
         """Guarda el workspace a disco"""
@@ -345,7 +1369,7 @@ class MemoryWorkspace:
 
         data = {
             "name": self.name,
-            "conversations": self.conversations,
+            "conversations": self.conversations.to_list(),
             "filters": self.filters,
             "metadata": self.metadata
         }
@@ -353,6 +1377,10 @@ class MemoryWorkspace:
         with open(filepath, 'w') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
 
+        self._save_summary_cache()
+        # Si el workspace cambió, los exports cacheados ya no sirven
+        self._prune_context_cache(f"context-{self._context_state()}-")
+
         return str(filepath)
 
     @classmethod
@@ -391,21 +1419,85 @@ class MemoryWorkspace:
 
         workspaces = []
         for filepath in workspace_dir.glob("*.json"):
+            if filepath.name.endswith(".summary.json"):
+                continue
             workspaces.append(filepath.stem)
 
         return sorted(workspaces)
 
 
+def run_fetch_benchmark(session_counts: List[int], messages_per_session: int = 40):
+    """
+    Compara una query por sesión (implementación anterior) contra
+    _fetch_sessions sobre una base ChromaDB persistente temporal
+    """
+    import random
+    import chromadb
+
+    db_dir = tempfile.mkdtemp(prefix="workspace-bench-")
+    try:
+        client = chromadb.PersistentClient(path=db_dir)
+        collection = client.create_collection(name="cli_conversations")
+
+        total_sessions = max(session_counts)
+        print(f"🏗️  Cargando {total_sessions} sesiones x {messages_per_session} mensajes en {db_dir}...")
+        rng = random.Random(42)
+        ids, docs, metas, embeddings = [], [], [], []
+        for n in range(total_sessions):
+            session_id = f"session-{n:05d}"
+            for m in range(messages_per_session):
+                ids.append(f"{session_id}_{m}")
+                docs.append(f"message {m} of {session_id}")
+                metas.append({"session_id": session_id, "source": "claude",
+                              "date": f"2025-01-{(n % 28) + 1:02d}"})
+                embeddings.append([rng.random() for _ in range(8)])
+        for start in range(0, len(ids), 5000):
+            collection.add(ids=ids[start:start + 5000], documents=docs[start:start + 5000],
+                           metadatas=metas[start:start + 5000],
+                           embeddings=embeddings[start:start + 5000])
+
+        ws = MemoryWorkspace("benchmark", workspace_dir=db_dir)
+        ws.client, ws.collection = client, collection
+
+        print(f"\n{'sesiones':>9} {'por sesión':>12} {'batched':>10} {'speedup':>8}")
+        for count in sorted(session_counts):
+            session_ids = [f"session-{n:05d}" for n in range(count)]
+
+            start = time.perf_counter()
+            for session_id in session_ids:
+                collection.get(where={"session_id": session_id}, limit=1000)
+            one_by_one = time.perf_counter() - start
+
+            start = time.perf_counter()
+            fetched = ws._fetch_sessions(session_ids)
+            batched = time.perf_counter() - start
+
+            assert sum(len(m) for m in fetched.values()) == count * messages_per_session
+            print(f"{count:>9} {one_by_one:>11.3f}s {batched:>9.3f}s {one_by_one / batched:>7.1f}x")
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
 if __name__ == "__main__":
     # Demo
-    import sys
+    show_timings = "--timings" in sys.argv
+    if show_timings:
+        sys.argv.remove("--timings")
+    cli_start = time.perf_counter()
 
     if len(sys.argv) < 2:
         print("Usage:")
         print("  python workspace.py create <name> [description]")
         print("  python workspace.py list")
         print("  python workspace.py summary <name>")
-        print("  python workspace.py export <name> [format]")
+        print("  python workspace.py export <name> [format] [output_file]")
+        print("  python workspace.py context <name> <budget> [--chars] [--query TEXT]")
+        print("  python workspace.py query <name> <text> [--k N] [--threshold X] [--max-sessions N] [--file queries.txt]")
+        print("  python workspace.py merge <target> <name> [name ...] [--intersect|--difference]")
+        print("  python workspace.py reindex")
+        print("  python workspace.py benchmark [sesiones,...]")
+        print("\nOpciones:")
+        print("  --timings   Mostrar tiempos de inicialización (stderr)")
         sys.exit(1)
 
     command = sys.argv[1]
@@ -435,4 +1527,96 @@ if __name__ == "__main__":
         name = sys.argv[2]
         format = sys.argv[3] if len(sys.argv) > 3 else "markdown"
         ws = MemoryWorkspace.load(name)
-        print(ws.export(format))
+        if len(sys.argv) > 4:
+            with open(sys.argv[4], 'w', encoding='utf-8') as f:
+                ws.export_to(f, format)
+            print(f"✓ Exported workspace: {name} -> {sys.argv[4]}")
+        else:
+            ws.export_to(sys.stdout, format)
+            print()
+
+    elif command == "context":
+        name = sys.argv[2]
+        budget = int(sys.argv[3])
+        unit = "chars" if "--chars" in sys.argv else "tokens"
+        query = None
+        if "--query" in sys.argv:
+            query = sys.argv[sys.argv.index("--query") + 1]
+        ws = MemoryWorkspace.load(name)
+        print(ws.export_budgeted(budget, unit=unit, query=query))
+
+    elif command == "query":
+        def pop_option(flag, cast, default):
+            if flag not in sys.argv:
+                return default
+            pos = sys.argv.index(flag)
+            value = cast(sys.argv[pos + 1])
+            del sys.argv[pos:pos + 2]
+            return value
+
+        k = pop_option("--k", int, QUERY_TOP_K)
+        threshold = pop_option("--threshold", float, 0.0)
+        max_sessions = pop_option("--max-sessions", int, None)
+        queries_file = pop_option("--file", str, None)
+
+        name = sys.argv[2]
+        texts = sys.argv[3:]
+        if queries_file:
+            with open(queries_file, encoding='utf-8') as f:
+                texts += [line.strip() for line in f if line.strip()]
+        if not texts:
+            print("❌ query requiere un texto o --file")
+            sys.exit(1)
+
+        if name in MemoryWorkspace.list_workspaces():
+            ws = MemoryWorkspace.load(name)
+        else:
+            ws = MemoryWorkspace(name)
+        added = ws.add_by_queries(texts, k=k, threshold=threshold, max_sessions=max_sessions)
+        ws.save()
+        for session in added:
+            print(f"  + {session['session_id']}  {session['score']:.3f}  ({session['hits']} hits)  {session['query']}")
+        print(f"✓ Added {len(added)} conversations to {name} ({len(ws.conversations)} total)")
+
+    elif command == "merge":
+        operation = "union"
+        for flag in ("--intersect", "--difference"):
+            if flag in sys.argv:
+                sys.argv.remove(flag)
+                operation = flag[2:]
+        target, sources = sys.argv[2], sys.argv[3:]
+        if not sources:
+            print("❌ merge requiere al menos un workspace de origen")
+            sys.exit(1)
+
+        # Si target ya existe es el operando izquierdo (merge A B = A op B,
+        # sin perder lo que tenía A); si no, se crea a partir del primer
+        # origen. En los dos casos quedan los filtros del operando izquierdo.
+        if target in MemoryWorkspace.list_workspaces():
+            ws = MemoryWorkspace.load(target)
+            others = [MemoryWorkspace.load(name) for name in sources if name != target]
+        else:
+            first = MemoryWorkspace.load(sources[0])
+            ws = MemoryWorkspace(target)
+            ws.conversations = first.conversations
+            ws.filters = dict(first.filters)
+            others = [MemoryWorkspace.load(name) for name in sources[1:]]
+        total = ws.merge(others, operation)
+        ws.save()
+        print(f"✓ Merged {len(sources)} workspaces ({operation}) -> {target}: {total} conversations")
+
+    elif command == "reindex":
+        _, collection = get_collection()
+        index = KeywordIndex(Path(DEFAULT_DB_PATH).parent / KEYWORD_INDEX_FILE)
+        changes = index.sync(collection, force=True, version=chroma_db_version(DEFAULT_DB_PATH))
+        print(f"✓ Keyword index rebuilt: {changes} messages ({index.path})")
+
+    elif command == "benchmark":
+        counts = sys.argv[2] if len(sys.argv) > 2 else "10,50,200,500"
+        run_fetch_benchmark([int(c) for c in counts.split(",")])
+
+    if show_timings:
+        TIMINGS["total"] = time.perf_counter() - cli_start
+        print("\n⏱️  Timings:", file=sys.stderr)
+        for label, seconds in TIMINGS.items():
+            print(f"  - {label:<30} {seconds:8.3f}s", file=sys.stderr)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Índice de directorios para localizar carpetas de proyectos
+Recorre una sola vez las raíces de búsqueda (podando node_modules y .git)
+y responde búsquedas por nombre exacto, variantes con -/_ y substring
+sin volver a tocar el disco.
+
+Uso:
+  python3 dir_index.py <nombre> <raiz> [raiz ...]
+"""
+
+import bisect
+import heapq
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+CACHE_DIR = Path.home() / ".cache" / "ops-scripts"
+
+# Directorios que nunca contienen proyectos
+PRUNE_DIRS = {"node_modules", ".git"}
+
+CACHE_VERSION = 1
+
+
+class DirectoryIndex:
+    """
+    Índice en memoria de los directorios bajo varias raíces.
+
+    Cada raíz se recorre hasta max_depth niveles (igual que
+    `find <raiz> -maxdepth 3 -type d`), pero los directorios compartidos
+    entre raíces se leen una sola vez. Los symlinks a directorios se siguen
+    sólo en los hijos directos de una raíz (proyectos enlazados desde otro
+    lado); uno que apunta a un directorio ya listado (ej. un ancestro) se
+    indexa pero no se recorre.
+    """
+
+    def __init__(self, roots: Sequence[Path], max_depth: int = 3):
+        self.roots = [Path(r) for r in roots]
+        self.max_depth = max_depth
+        # entries[i] = (path, nombre, set de índices de raíz que lo alcanzan)
+        self.entries: List[tuple] = []
+        self.by_name: Dict[str, List[int]] = {}
+        self.children: Dict[tuple, int] = {}  # (raiz, nombre) -> entry
+        self._suffixes: List[tuple] = []      # (sufijo, entry) ordenados
+        # mtime_ns de cada directorio listado, para validar el cache
+        self.dir_mtimes: Dict[str, int] = {}
+
+    # ------------------------------------------------------------------
+    # Construcción
+
+    def build(self) -> "DirectoryIndex":
+        """Recorre todas las raíces en una sola pasada"""
+        # Profundidad restante por raíz para cada directorio pendiente
+        budgets: Dict[str, Dict[int, int]] = {}
+        for i, root in enumerate(self.roots):
+            if root.is_dir():
+                budgets.setdefault(str(root), {})[i] = self.max_depth
+
+        # Se procesa por profundidad creciente: cuando un directorio sale de la
+        # cola ya recibió el presupuesto de su padre y de la raíz que sea
+        queue = [(p.count(os.sep), p) for p in budgets]
+        heapq.heapify(queue)
+        root_paths = set(budgets)
+        found: Dict[str, set] = {}
+        order: List[str] = []
+        # (st_dev, st_ino) de los directorios listados: corta los ciclos de symlinks
+        visited = set()
+
+        while queue:
+            _, dir_path = heapq.heappop(queue)
+            budget = budgets.pop(dir_path)
+            follow = dir_path in root_paths
+            try:
+                st = os.stat(dir_path)
+                self.dir_mtimes[dir_path] = st.st_mtime_ns
+                visited.add((st.st_dev, st.st_ino))
+                subdirs = []
+                with os.scandir(dir_path) as it:
+                    for e in it:
+                        if e.name in PRUNE_DIRS or not e.is_dir(follow_symlinks=follow):
+                            continue
+                        seen = False
+                        if e.is_symlink():
+                            target = e.stat()
+                            seen = (target.st_dev, target.st_ino) in visited
+                        subdirs.append((e.name, seen))
+                subdirs.sort()
+            except OSError:
+                continue
+
+            for name, seen in subdirs:
+                child = os.path.join(dir_path, name)
+                if child not in found:
+                    found[child] = set()
+                    order.append(child)
+                found[child].update(budget)
+
+                child_budget = {r: d - 1 for r, d in budget.items() if d > 1}
+                if not child_budget or seen:
+                    continue
+                if child not in budgets:
+                    budgets[child] = {}
+                    heapq.heappush(queue, (child.count(os.sep), child))
+                merged = budgets[child]
+                for r, d in child_budget.items():
+                    merged[r] = max(merged.get(r, 0), d)
+
+        self._load_entries([(p, sorted(found[p])) for p in order])
+        return self
+
+    def _load_entries(self, entries: List[tuple]):
+        self.entries = []
+        self.by_name = {}
+        self.children = {}
+        suffixes = []
+        root_strs = {str(r): i for i, r in enumerate(self.roots)}
+
+        for idx, (path, roots) in enumerate(entries):
+            name = os.path.basename(path)
+            self.entries.append((path, name, frozenset(roots)))
+            self.by_name.setdefault(name, []).append(idx)
+
+            parent = os.path.dirname(path)
+            if parent in root_strs:
+                self.children[(root_strs[parent], name)] = idx
+
+            for start in range(len(name)):
+                suffixes.append((name[start:], idx))
+
+        suffixes.sort()
+        self._suffixes = suffixes
+
+    # ------------------------------------------------------------------
+    # Cache en disco
+
+    def save(self, cache_path: Path):
+        """Guarda el índice junto con los mtimes de cada directorio listado"""
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": CACHE_VERSION,
+            "roots": [str(r) for r in self.roots],
+            "max_depth": self.max_depth,
+            "dir_mtimes": self.dir_mtimes,
+            "entries": [[path, sorted(roots)] for path, _, roots in self.entries],
+        }
+        tmp_path = cache_path.with_suffix(cache_path.suffix + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, cache_path)
+
+    @classmethod
+    def load_cached(cls, roots: Sequence[Path], cache_path: Path,
+                    max_depth: int = 3) -> Optional["DirectoryIndex"]:
+        """
+        Carga el índice desde disco si sigue vigente.
+        Alcanza con un stat por directorio listado: si se creó o borró una
+        carpeta, el mtime de su padre cambió y el cache se descarta.
+        """
+        try:
+            with open(cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (data.get("version") != CACHE_VERSION or
+                data.get("roots") != [str(r) for r in roots] or
+                data.get("max_depth") != max_depth):
+            return None
+
+        for dir_path, mtime_ns in data["dir_mtimes"].items():
+            try:
+                if os.stat(dir_path).st_mtime_ns != mtime_ns:
+                    return None
+            except OSError:
+                return None
+
+        # Una raíz que antes no existía y ahora sí invalida el cache
+        for root in roots:
+            if str(root) not in data["dir_mtimes"] and Path(root).is_dir():
+                return None
+
+        index = cls(roots, max_depth)
+        index.dir_mtimes = data["dir_mtimes"]
+        index._load_entries([(p, r) for p, r in data["entries"]])
+        return index
+
+    @classmethod
+    def open(cls, roots: Sequence[Path], cache_path: Optional[Path] = None,
+             max_depth: int = 3) -> "DirectoryIndex":
+        """Usa el cache si está vigente; si no, recorre y lo regenera"""
+        if cache_path is not None:
+            index = cls.load_cached(roots, cache_path, max_depth)
+            if index is not None:
+                return index
+
+        index = cls(roots, max_depth).build()
+        if cache_path is not None:
+            try:
+                index.save(cache_path)
+            except OSError:
+                pass
+        return index
+
+    # ------------------------------------------------------------------
+    # Búsquedas
+
+    def find_by_name(self, name: str) -> List[Path]:
+        """Directorios con nombre exacto, en orden de recorrido"""
+        return [Path(self.entries[i][0]) for i in self.by_name.get(name, [])]
+
+    def find_containing(self, text: str) -> List[int]:
+        """Entradas cuyo nombre contiene text (búsqueda binaria sobre sufijos)"""
+        matches = set()
+        pos = bisect.bisect_left(self._suffixes, (text,))
+        while pos < len(self._suffixes) and self._suffixes[pos][0].startswith(text):
+            matches.add(self._suffixes[pos][1])
+            pos += 1
+        return sorted(matches)
+
+    def find_project(self, repo_name: str) -> Optional[Path]:
+        """
+        Equivalente a ProjectAuditor.find_local_folder: por cada raíz (en orden)
+        primero el hijo directo con el nombre o sus variantes -/_ y después
+        el primer directorio hasta 3 niveles cuyo nombre contenga repo_name.
+        """
+        patterns = [
+            repo_name,
+            repo_name.replace("-", "_"),
+            repo_name.replace("_", "-"),
+        ]
+        containing = self.find_containing(repo_name)
+
+        for root_idx in range(len(self.roots)):
+            for pattern in patterns:
+                idx = self.children.get((root_idx, pattern))
+                if idx is not None:
+                    return Path(self.entries[idx][0])
+
+            for idx in containing:
+                if root_idx in self.entries[idx][2]:
+                    return Path(self.entries[idx][0])
+
+        return None
+
+    def __len__(self):
+        return len(self.entries)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Uso: dir_index.py <nombre> <raiz> [raiz ...]")
+        sys.exit(1)
+
+    index = DirectoryIndex.open([Path(r) for r in sys.argv[2:]])
+    found = index.find_project(sys.argv[1])
+    if found is None:
+        sys.exit(1)
+    print(found)
@@ -4,138 +4,379 @@ Export Claude Code Conversation to Markdown
 Genera un resumen markdown de una conversación específica
 """
 
-import json
+import argparse
+import io
 import sys
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
-def find_conversation_file(session_id: str) -> Path:
-    """Encuentra el archivo de conversación por session_id"""
-    claude_dir = Path.home() / '.claude' / 'projects'
+from session_index import SessionIndex, count_messages, json_loads
 
-    # Buscar en todos los subdirectorios de proyectos
-    for project_dir in claude_dir.iterdir():
-        if project_dir.is_dir():
-            conv_file = project_dir / f"{session_id}.jsonl"
-            if conv_file.exists():
-                return conv_file
+def find_conversation_file(session_id: str, index: SessionIndex = None) -> Path:
+    """
+    Encuentra el archivo de conversación por session_id o por un prefijo
+    único del mismo (usa el índice persistente de sesiones)
+    """
+    if index is None:
+        index = SessionIndex.open()
+    matches = index.resolve(session_id)
+    index.save()
+    if len(matches) > 1:
+        print(f"⚠️  Prefijo ambiguo '{session_id}': {', '.join(matches[:10])}", file=sys.stderr)
+        return None
+    entry = index.entry(matches[0]) if matches else None
+    return Path(entry["path"]) if entry else None
 
-    return None
-
-def extract_messages(jsonl_file: Path) -> list:
-    """Extrae los mensajes de usuario y asistente del archivo JSONL"""
-    messages = []
-
-    with open(jsonl_file, 'r') as f:
+def iter_messages(jsonl_file: Path):
+    """
+    Genera los mensajes de usuario y asistente del archivo JSONL de a uno
+    (línea por línea, sin cargar la sesión completa en memoria)
+    """
+    with open(jsonl_file, 'rb') as f:
         for line in f:
             try:
-                entry = json.loads(line.strip())
-
-                # Mensajes de usuario
-                if entry.get('type') == 'user' and 'message' in entry:
-                    msg = entry['message']
-                    content = msg.get('content', '')
-                    messages.append({
-                        'role': 'user',
-                        'content': [content] if isinstance(content, str) else content,
-                        'timestamp': entry.get('timestamp')
-                    })
-
-                # Mensajes del asistente
-                elif entry.get('type') == 'assistant' and 'message' in entry:
-                    msg = entry['message']
-                    content = msg.get('content', [])
-                    messages.append({
-                        'role': 'assistant',
-                        'content': content if isinstance(content, list) else [content],
-                        'timestamp': entry.get('timestamp')
-                    })
-
-            except json.JSONDecodeError:
+                entry = json_loads(line)
+            except ValueError:
+                continue
+            if not isinstance(entry, dict):
                 continue
 
-    return messages
+            # Mensajes de usuario
+            if entry.get('type') == 'user' and 'message' in entry:
+                msg = entry['message']
+                content = msg.get('content', '')
+                yield {
+                    'role': 'user',
+                    'content': [content] if isinstance(content, str) else content,
+                    'timestamp': entry.get('timestamp')
+                }
 
-def content_to_text(content: list) -> str:
-    """Convierte el contenido de un mensaje a texto plano"""
-    text_parts = []
+            # Mensajes del asistente
+            elif entry.get('type') == 'assistant' and 'message' in entry:
+                msg = entry['message']
+                content = msg.get('content', [])
+                yield {
+                    'role': 'assistant',
+                    'content': content if isinstance(content, list) else [content],
+                    'timestamp': entry.get('timestamp')
+                }
 
+def extract_messages(jsonl_file: Path) -> list:
+    """Extrae los mensajes de usuario y asistente del archivo JSONL"""
+    return list(iter_messages(jsonl_file))
+
+def iter_content_text(content: list):
+    """Partes de texto plano del contenido de un mensaje"""
     for item in content:
         if isinstance(item, dict):
             if item.get('type') == 'text':
-                text_parts.append(item.get('text', ''))
+                yield item.get('text', '')
             elif item.get('type') == 'tool_use':
                 tool_name = item.get('name', 'unknown')
-                text_parts.append(f"[Usó herramienta: {tool_name}]")
+                yield f"[Usó herramienta: {tool_name}]"
             elif item.get('type') == 'tool_result':
-                text_parts.append("[Resultado de herramienta]")
+                yield "[Resultado de herramienta]"
         elif isinstance(item, str):
-            text_parts.append(item)
+            yield item
+
+def content_to_text(content: list) -> str:
+    """Convierte el contenido de un mensaje a texto plano"""
+    return '\n\n'.join(iter_content_text(content))
 
-    return '\n\n'.join(text_parts)
+class CappedWriter:
+    """Stream de salida que corta después de max_chars caracteres"""
 
-def export_to_markdown(session_id: str, output_file: str = None, max_length: int = None) -> str:
-    """Exporta una conversación a Markdown"""
-    conv_file = find_conversation_file(session_id)
+    def __init__(self, out, max_chars: int = None):
+        self.out = out
+        self.remaining = max_chars
 
-    if not conv_file:
-        return f"❌ No se encontró conversación con session_id: {session_id}"
+    @property
+    def full(self) -> bool:
+        return self.remaining is not None and self.remaining <= 0
 
-    messages = extract_messages(conv_file)
+    def write(self, text: str):
+        if self.remaining is not None:
+            text = text[:max(self.remaining, 0)]
+            self.remaining -= len(text)
+        self.out.write(text)
 
-    if not messages:
-        return f"❌ No se pudieron extraer mensajes de la conversación"
+def write_message(out, msg: dict, max_length: int = None):
+    """
+    Escribe un mensaje en Markdown. El contenido se escribe parte por parte
+    y se trunca a max_length caracteres mientras se escribe.
+    """
+    role = "👤 **Usuario**" if msg['role'] == 'user' else "🤖 **Claude**"
+    out.write(f"\n### {role}\n\n")
+
+    written = 0
+    for i, part in enumerate(iter_content_text(msg['content'])):
+        if i:
+            part = '\n\n' + part
+        if max_length and written + len(part) > max_length:
+            out.write(part[:max_length - written])
+            out.write("\n\n[... contenido truncado ...]")
+            break
+        out.write(part)
+        written += len(part)
 
-    # Generar Markdown
-    md_lines = [
+    out.write("\n\n---\n")
+
+def write_markdown(out, conv_file: Path, total_messages: int, max_length: int = None) -> int:
+    """Escribe la conversación completa en Markdown; devuelve los mensajes escritos"""
+    session_id = conv_file.stem
+    out.write('\n'.join([
         f"# Conversación: {session_id[:8]}",
         f"",
         f"**Session ID**: `{session_id}`  ",
-        f"**Total mensajes**: {len(messages)}  ",
+        f"**Total mensajes**: {total_messages}  ",
         f"",
         "---",
         ""
-    ]
+    ]))
 
-    for i, msg in enumerate(messages):
-        role = "👤 **Usuario**" if msg['role'] == 'user' else "🤖 **Claude**"
-        content = content_to_text(msg['content'])
+    written = 0
+    for msg in iter_messages(conv_file):
+        if getattr(out, 'full', False):
+            break
+        write_message(out, msg, max_length)
+        written += 1
+    return written
 
-        # Limitar longitud si se especifica
-        if max_length and len(content) > max_length:
-            content = content[:max_length] + "\n\n[... contenido truncado ...]"
+def export_to_markdown(session_id: str, output_file: str = None, max_length: int = None,
+                       out=None) -> str:
+    """
+    Exporta una conversación a Markdown en streaming: a output_file, al
+    stream out o, si no se pasa ninguno, devuelve el texto
+    """
+    index = SessionIndex.open()
+    conv_file = find_conversation_file(session_id, index)
 
-        md_lines.append(f"### {role}")
-        md_lines.append("")
-        md_lines.append(content)
-        md_lines.append("")
-        md_lines.append("---")
-        md_lines.append("")
+    if not conv_file:
+        return f"❌ No se encontró conversación con session_id: {session_id}"
 
-    markdown = '\n'.join(md_lines)
+    # La cantidad de mensajes del header sale del índice (cacheada por mtime)
+    entry = index.entry(conv_file.stem)
+    total_messages = entry["messages"] if entry else 0
+    index.save()
+
+    if not total_messages:
+        return f"❌ No se pudieron extraer mensajes de la conversación"
 
     # Guardar si se especificó archivo de salida
     if output_file:
         with open(output_file, 'w') as f:
-            f.write(markdown)
+            write_markdown(f, conv_file, total_messages, max_length)
         return f"✅ Conversación exportada a: {output_file}"
 
-    return markdown
+    if out is not None:
+        write_markdown(out, conv_file, total_messages, max_length)
+        return ""
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Uso: export-conversation.py <session_id> [output_file.md]")
-        print("\nEjemplo:")
-        print("  export-conversation.py cd7b656e-51e3-40bb-84cc-c660ebfeb855")
-        print("  export-conversation.py cd7b656e-51e3-40bb-84cc-c660ebfeb855 conversation.md")
-        sys.exit(1)
+    buffer = io.StringIO()
+    write_markdown(buffer, conv_file, total_messages, max_length)
+    return buffer.getvalue()
+
+def _bulk_export_worker(job: tuple) -> tuple:
+    """
+    Exporta una sesión en un proceso del pool.
+    Devuelve (session_id, archivo, mensajes, (mtime_ns, size) si contó, error)
+    """
+    session_id, conv_path, total_messages, output_path, max_length = job
+    conv_file = Path(conv_path)
+    counted = None
+    try:
+        if total_messages is None:
+            st = os.stat(conv_file)
+            total_messages = count_messages(conv_file)
+            counted = (st.st_mtime_ns, st.st_size)
+        if not total_messages:
+            return session_id, None, 0, counted, "sin mensajes"
+        with open(output_path, 'w') as f:
+            write_markdown(f, conv_file, total_messages, max_length)
+        return session_id, output_path, total_messages, counted, None
+    except (OSError, ValueError) as e:
+        return session_id, None, 0, counted, str(e)
+
+def select_sessions(index: SessionIndex, session_ids: list = None,
+                    since: str = None, until: str = None) -> tuple:
+    """
+    Resuelve ids/prefijos y filtra por fecha de modificación (YYYY-MM-DD,
+    inclusive). Sin ids toma todas las sesiones del índice.
+    Devuelve (session_ids, errores).
+    """
+    errors = []
+    if session_ids is None:
+        index.refresh()
+        selected = index.session_ids()
+    else:
+        selected = []
+        for requested in session_ids:
+            matches = index.resolve(requested)
+            if len(matches) == 1:
+                selected.append(matches[0])
+            else:
+                errors.append((requested, "prefijo ambiguo" if matches else "no encontrada"))
+        selected = list(dict.fromkeys(selected))
+
+    if since or until:
+        dated = []
+        for session_id in selected:
+            entry = index.cached_entry(session_id)
+            if entry is None:
+                continue
+            day = datetime.fromtimestamp(entry["mtime_ns"] / 1e9).strftime("%Y-%m-%d")
+            if (not since or day >= since) and (not until or day <= until):
+                dated.append(session_id)
+        selected = dated
+
+    return selected, errors
+
+def bulk_export(session_ids: list, out_dir: Path, workers: int = None, max_length: int = None,
+                index: SessionIndex = None, errors: list = None) -> dict:
+    """
+    Exporta varias sesiones en paralelo (un proceso por CPU): un .md por
+    sesión en out_dir más un index.md con la lista
+    """
+    if index is None:
+        index = SessionIndex.open()
+    errors = list(errors or [])
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    jobs = []
+    entries = {}
+    for session_id in session_ids:
+        entry = index.cached_entry(session_id)
+        if entry is None:
+            errors.append((session_id, "no encontrada"))
+            continue
+        entries[session_id] = entry
+        jobs.append((session_id, entry["path"], entry["messages"],
+                     str(out_dir / f"{session_id}.md"), max_length))
+
+    start = time.perf_counter()
+    exported = []
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        for session_id, output_path, messages, counted, error in executor.map(
+                _bulk_export_worker, jobs, chunksize=chunksize):
+            if counted is not None:
+                index.set_messages(session_id, messages, *counted)
+            if error:
+                errors.append((session_id, error))
+            else:
+                exported.append((session_id, output_path, messages))
+    elapsed = time.perf_counter() - start
+    index.save()
+
+    index_path = out_dir / "index.md"
+    write_bulk_index(index_path, exported, entries, errors)
+
+    return {
+        "exported": len(exported),
+        "errors": errors,
+        "elapsed": elapsed,
+        "sessions_per_second": len(exported) / elapsed if elapsed > 0 else 0.0,
+        "index": str(index_path),
+    }
 
-    session_id = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
+def write_bulk_index(index_path: Path, exported: list, entries: dict, errors: list):
+    """index.md: una fila por sesión exportada, de la más reciente a la más vieja"""
+    exported = sorted(exported, key=lambda e: entries[e[0]]["mtime_ns"], reverse=True)
+    with open(index_path, 'w') as f:
+        f.write('\n'.join([
+            "# Conversaciones exportadas",
+            "",
+            f"**Generado**: {datetime.now().isoformat(timespec='seconds')}  ",
+            f"**Sesiones**: {len(exported)}  ",
+            "",
+            "| Sesión | Modificada | Mensajes | Archivo |",
+            "|--------|------------|----------|---------|",
+            ""
+        ]))
+        for session_id, output_path, messages in exported:
+            modified = datetime.fromtimestamp(entries[session_id]["mtime_ns"] / 1e9)
+            f.write(f"| `{session_id[:8]}` | {modified.isoformat(timespec='minutes')} "
+                    f"| {messages} | [{Path(output_path).name}]({Path(output_path).name}) |\n")
 
-    # Si no hay archivo de salida, mostrar solo primeras 50000 caracteres
-    max_len = None if output_file else 50000
+        if errors:
+            f.write("\n## Errores\n\n")
+            for session_id, error in errors:
+                f.write(f"- `{session_id}`: {error}\n")
 
-    result = export_to_markdown(session_id, output_file, max_len)
-    print(result[:100000])  # Limitar output en terminal
+def read_session_ids(source: str) -> list:
+    """session_ids (o prefijos) de un archivo o de stdin ('-'), uno por línea"""
+    handle = sys.stdin if source == '-' else open(source)
+    try:
+        return [line.strip() for line in handle if line.strip() and not line.startswith('#')]
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Exporta conversaciones de Claude Code a Markdown',
+        usage='%(prog)s <session_id|prefijo> [output_file.md]\n'
+              '       %(prog)s --bulk [archivo|-] [--since YYYY-MM-DD] [--until YYYY-MM-DD] [--out-dir DIR]')
+    parser.add_argument('session_id', nargs='?')
+    parser.add_argument('output_file', nargs='?')
+    parser.add_argument('--bulk', nargs='?', const='-', metavar='ARCHIVO',
+                        help='Exportar varias sesiones: ids/prefijos de ARCHIVO o stdin (-)')
+    parser.add_argument('--since', help='Sesiones modificadas desde esta fecha (YYYY-MM-DD)')
+    parser.add_argument('--until', help='Sesiones modificadas hasta esta fecha (YYYY-MM-DD)')
+    parser.add_argument('--out-dir', default='conversation-exports',
+                        help='Directorio de salida del modo bulk (default: conversation-exports)')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos (default: CPUs)')
+    parser.add_argument('--max-length', type=int, default=None,
+                        help='Truncar cada mensaje a N caracteres')
+    args = parser.parse_args()
+
+    if args.bulk is None and not (args.since or args.until):
+        if not args.session_id:
+            print("Uso: export-conversation.py <session_id|prefijo> [output_file.md]")
+            print("     export-conversation.py --bulk [archivo|-] [--since YYYY-MM-DD] [--until YYYY-MM-DD] [--out-dir DIR]")
+            print("\nEjemplo:")
+            print("  export-conversation.py cd7b656e-51e3-40bb-84cc-c660ebfeb855")
+            print("  export-conversation.py cd7b656e-51e3-40bb-84cc-c660ebfeb855 conversation.md")
+            print("  export-conversation.py cd7b656e")
+            print("  export-conversation.py --bulk ids.txt --out-dir exports/")
+            print("  export-conversation.py --since 2025-01-01 --until 2025-01-31")
+            return 1
+
+        session_id = args.session_id
+        output_file = args.output_file
+
+        # Si no hay archivo de salida, mostrar solo primeras 50000 caracteres
+        max_len = args.max_length if args.max_length or output_file else 50000
+
+        if output_file:
+            print(export_to_markdown(session_id, output_file, max_len))
+        else:
+            # Limitar output en terminal (se deja de leer la sesión al llegar al límite)
+            out = CappedWriter(sys.stdout, 100000)
+            result = export_to_markdown(session_id, max_length=max_len, out=out)
+            print(result)
+        return 0
+
+    index = SessionIndex.open()
+    requested = read_session_ids(args.bulk) if args.bulk else None
+    session_ids, errors = select_sessions(index, requested, args.since, args.until)
+    if not session_ids:
+        print("❌ No hay sesiones para exportar")
+        return 1
+
+    print(f"📦 Exportando {len(session_ids)} sesiones a {args.out_dir}/...")
+    stats = bulk_export(session_ids, Path(args.out_dir), args.workers, args.max_length, index, errors)
+
+    print(f"✅ {stats['exported']} sesiones exportadas en {stats['elapsed']:.2f}s "
+          f"({stats['sessions_per_second']:.1f} sesiones/s)")
+    print(f"📄 Índice: {stats['index']}")
+    if stats['errors']:
+        print(f"⚠️  {len(stats['errors'])} sesiones con errores (ver índice)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Detector de landings en una sola pasada
+Recorre el árbol del proyecto una vez, sin entrar en node_modules ni en
+directorios de dependencias/caché, y evalúa todos los patrones de landing
+sobre cada archivo.
+
+Uso:
+  python3 landing_detector.py <proyecto>
+  python3 landing_detector.py --benchmark [--files 50000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+# Mismo orden que usaba ProjectAuditor.find_landing_files
+LANDING_PATTERNS = [
+    "**/index.html",
+    "**/landing.html",
+    "**/landing/index.html",
+    "**/public/index.html",
+    "**/dist/index.html",
+    "**/build/index.html",
+    "**/app/page.tsx",
+    "**/app/page.js",
+    "**/pages/index.tsx",
+    "**/pages/index.js",
+]
+
+# Dependencias, entornos y cachés: se podan antes de descender.
+# dist/ y build/ NO van acá porque son ubicaciones de landing.
+PRUNE_DIRS = {
+    "node_modules", "bower_components", "vendor", ".git", ".hg", ".svn",
+    ".venv", "venv", "__pycache__", ".next", ".nuxt", ".svelte-kit",
+    ".turbo", ".cache", ".parcel-cache", "coverage", "target",
+}
+
+
+class LandingDetector:
+    """
+    Compila los patrones "**/a/b/archivo" a (archivo, ("a", "b")) y los indexa
+    por nombre de archivo, así cada archivo del árbol cuesta un lookup en dict.
+    """
+
+    def __init__(self, patterns: Sequence[str] = LANDING_PATTERNS,
+                 prune_dirs: Sequence[str] = PRUNE_DIRS):
+        self.patterns = list(patterns)
+        self.prune_dirs = set(prune_dirs)
+        self._by_filename: Dict[str, List[tuple]] = {}
+        for order, pattern in enumerate(self.patterns):
+            parts = pattern.split("/")
+            if parts[0] == "**":
+                parts = parts[1:]
+            self._by_filename.setdefault(parts[-1], []).append((order, tuple(parts[:-1])))
+
+    def find(self, project_path: Path) -> List[Path]:
+        """
+        Devuelve las landings agrupadas por patrón (en el orden de
+        self.patterns) y sin duplicados: un archivo que coincide con varios
+        patrones aparece sólo en el primero.
+        """
+        buckets: List[List[Path]] = [[] for _ in self.patterns]
+        root = str(project_path)
+
+        stack = [(root, ())]
+        while stack:
+            dir_path, rel_dirs = stack.pop()
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue
+
+            subdirs = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+
+                if is_dir:
+                    if entry.name not in self.prune_dirs:
+                        subdirs.append((entry.path, rel_dirs + (entry.name,)))
+                    continue
+
+                candidates = self._by_filename.get(entry.name)
+                if not candidates:
+                    continue
+                for order, required_dirs in candidates:
+                    if not required_dirs or rel_dirs[-len(required_dirs):] == required_dirs:
+                        buckets[order].append(Path(entry.path))
+                        break
+
+            # Orden de recorrido estable (alfabético, en profundidad)
+            stack.extend(reversed(subdirs))
+
+        return [path for bucket in buckets for path in bucket]
+
+
+def glob_landing_files(project_path: Path, patterns: Sequence[str] = LANDING_PATTERNS) -> List[Path]:
+    """Implementación anterior (un glob recursivo por patrón), para el benchmark"""
+    landing_files = []
+    for pattern in patterns:
+        try:
+            found = list(project_path.glob(pattern))
+            found = [f for f in found if 'node_modules' not in str(f)]
+            landing_files.extend(found)
+        except Exception:
+            continue
+    return landing_files
+
+
+def build_synthetic_tree(root: Path, total_files: int, seed: int = 42) -> int:
+    """
+    Arma un monorepo JS sintético: la mayoría de los archivos en
+    node_modules (como en los proyectos reales) y algunas landings reales
+    en apps/, packages/ y en dependencias que deben ignorarse.
+    """
+    rng = random.Random(seed)
+    created = 0
+
+    def touch(path: Path, content: str = ""):
+        nonlocal created
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        created += 1
+
+    landing_layouts = [
+        "index.html", "landing.html", "landing/index.html", "public/index.html",
+        "dist/index.html", "build/index.html", "app/page.tsx", "pages/index.js",
+    ]
+    for i in range(20):
+        app = root / ("apps" if i % 2 else "packages") / f"app-{i}"
+        touch(app / landing_layouts[i % len(landing_layouts)], "<title>App</title>")
+        for j in range(30):
+            touch(app / "src" / f"module_{j // 10}" / f"file_{j}.ts")
+
+    source_files = created
+    vendored = int((total_files - source_files) * 0.9)
+    while created < total_files:
+        in_node_modules = created - source_files < vendored
+        base = root / "node_modules" if in_node_modules else root / "src"
+        pkg = f"pkg-{rng.randrange(2000)}"
+        sub = "/".join(f"d{rng.randrange(5)}" for _ in range(rng.randrange(1, 4)))
+        name = "index.html" if rng.random() < 0.02 else f"f{created}.js"
+        touch(base / pkg / sub / name)
+
+    return created
+
+
+def run_benchmark(total_files: int, repeat: int = 3):
+    """Compara glob por patrón vs. LandingDetector sobre un árbol sintético"""
+    tmp_dir = Path(tempfile.mkdtemp(prefix="landing-bench-"))
+    try:
+        print(f"🏗️  Generando árbol sintético con {total_files} archivos en {tmp_dir}...")
+        created = build_synthetic_tree(tmp_dir, total_files)
+        print(f"✅ {created} archivos creados")
+
+        detector = LandingDetector()
+        timings = {"glob": [], "detector": []}
+        results = {}
+        for _ in range(repeat):
+            for name, fn in (("glob", glob_landing_files), ("detector", detector.find)):
+                start = time.perf_counter()
+                results[name] = fn(tmp_dir)
+                timings[name].append(time.perf_counter() - start)
+
+        glob_set, detector_set = set(results["glob"]), set(results["detector"])
+        print(f"\n📊 Resultados (mejor de {repeat}):")
+        for name in ("glob", "detector"):
+            print(f"  - {name:<9} {min(timings[name]):8.3f}s  ({len(results[name])} resultados)")
+        speedup = min(timings["glob"]) / max(min(timings["detector"]), 1e-9)
+        print(f"  ⚡ Speedup: {speedup:.1f}x")
+
+        if glob_set == detector_set:
+            print("  ✅ Mismo conjunto de landings")
+        else:
+            print(f"  ⚠️  Diferencias: sólo glob={len(glob_set - detector_set)}, "
+                  f"sólo detector={len(detector_set - glob_set)}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detector de landings en una pasada')
+    parser.add_argument('project', nargs='?', help='Carpeta del proyecto')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Comparar contra el glob por patrón en un árbol sintético')
+    parser.add_argument('--files', type=int, default=50000,
+                        help='Archivos del árbol sintético (default: 50000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones del benchmark')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.files, args.repeat)
+        return 0
+
+    if not args.project:
+        parser.print_usage()
+        return 1
+
+    for path in LandingDetector().find(Path(args.project)):
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Índice de sitios Nginx
+Parsea cada archivo de /etc/nginx/sites-enabled una sola vez y lo guarda en
+cache (se re-parsea sólo si cambió su mtime o tamaño). Permite buscar por
+proyecto, dominio o puerto de upstream desde Python o desde scripts de shell.
+
+Uso:
+  python3 nginx_index.py project <nombre>   # archivo, server_name, root o proxy_pass contiene <nombre>
+  python3 nginx_index.py domain <dominio>   # server_name exacto o wildcard
+  python3 nginx_index.py port <puerto>      # proxy_pass hacia ese puerto
+  python3 nginx_index.py list
+
+Salida: una línea por server block, separada por tabs:
+  archivo  server_names  listen  puertos_upstream  root
+Exit code 1 si no hay resultados (útil en `if ...; then`).
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+NGINX_SITES = Path("/etc/nginx/sites-enabled")
+CACHE_DIR = Path.home() / ".cache" / "ops-scripts"
+NGINX_INDEX_CACHE = CACHE_DIR / "nginx-index.json"
+
+CACHE_VERSION = 2
+
+TOKEN_RE = re.compile(r'''"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|[{};]|[^\s{};"']+''')
+PORT_RE = re.compile(r':(\d+)$')
+
+
+def _strip_comments(content: str) -> str:
+    """Elimina comentarios # (fuera de strings)"""
+    lines = []
+    for line in content.splitlines():
+        if '#' in line:
+            quote = None
+            for i, ch in enumerate(line):
+                if ch in '"\'' and quote in (None, ch):
+                    quote = None if quote else ch
+                elif ch == '#' and quote is None:
+                    line = line[:i]
+                    break
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _unquote(token: str) -> str:
+    if len(token) >= 2 and token[0] == token[-1] and token[0] in '"\'':
+        return token[1:-1]
+    return token
+
+
+def _port_from_address(address: str) -> Optional[int]:
+    """'127.0.0.1:3005', '[::]:80', '8080' -> puerto"""
+    address = address.split("/", 1)[0]
+    if address.isdigit():
+        return int(address)
+    match = PORT_RE.search(address)
+    return int(match.group(1)) if match else None
+
+
+def _proxy_host(target: str) -> str:
+    """'http://app_backend/api' -> 'app_backend'"""
+    return re.sub(r'^[a-z]+://', '', target).split("/", 1)[0]
+
+
+def _upstream_port(target: str, upstreams: Dict[str, List[str]]) -> List[int]:
+    """Puertos de un proxy_pass: http://host:puerto/... o un upstream {} del archivo"""
+    host = _proxy_host(target)
+    addresses = upstreams.get(host, [host])
+    ports = [_port_from_address(address) for address in addresses]
+    return [port for port in ports if port]
+
+
+def parse_site(content: str) -> List[Dict]:
+    """
+    Extrae los server blocks de un archivo de sitio.
+    Devuelve una lista de dicts con server_names, listen, listen_ports,
+    upstream_ports, proxy_targets (destinos de proxy_pass más los servers
+    del upstream al que apuntan) y root.
+    """
+    tokens = TOKEN_RE.findall(_strip_comments(content))
+
+    # Primera pasada: directivas como (ruta de bloques, nombre, argumentos, abre bloque)
+    directives = []
+    stack: List[str] = []
+    current: List[str] = []
+    for token in tokens:
+        if token == '{':
+            stack.append(current[0] if current else '')
+            directives.append((tuple(stack[:-1]), current[0] if current else '',
+                               [_unquote(t) for t in current[1:]], True))
+            current = []
+        elif token == '}':
+            if stack:
+                stack.pop()
+            current = []
+        elif token == ';':
+            if current:
+                directives.append((tuple(stack), current[0],
+                                   [_unquote(t) for t in current[1:]], False))
+            current = []
+        else:
+            current.append(token)
+
+    # Upstreams definidos en el mismo archivo: nombre -> direcciones de sus servers
+    upstreams: Dict[str, List[str]] = {}
+    upstream_name = None
+    for path, name, args, opens in directives:
+        if opens and name == 'upstream' and args:
+            upstream_name = args[0]
+            upstreams[upstream_name] = []
+        elif path and path[-1] == 'upstream' and name == 'server' and upstream_name and args:
+            upstreams[upstream_name].append(args[0])
+
+    servers = []
+    server = None
+    for path, name, args, opens in directives:
+        if opens and name == 'server' and 'server' not in path and 'upstream' not in path:
+            server = {"server_names": [], "listen": [], "listen_ports": [],
+                      "upstream_ports": [], "proxy_targets": [], "root": None}
+            servers.append(server)
+            continue
+        if server is None or 'server' not in path:
+            continue
+
+        if name == 'server_name':
+            server["server_names"].extend(args)
+        elif name == 'listen' and args:
+            server["listen"].append(" ".join(args))
+            port = _port_from_address(args[0])
+            if port and port not in server["listen_ports"]:
+                server["listen_ports"].append(port)
+        elif name == 'proxy_pass' and args:
+            for port in _upstream_port(args[0], upstreams):
+                if port not in server["upstream_ports"]:
+                    server["upstream_ports"].append(port)
+            for target in [args[0]] + upstreams.get(_proxy_host(args[0]), []):
+                if target not in server["proxy_targets"]:
+                    server["proxy_targets"].append(target)
+        elif name == 'root' and args:
+            # El root del server tiene prioridad sobre el de un location
+            if server["root"] is None or path == ('server',):
+                server["root"] = args[0]
+
+    return servers
+
+
+class NginxIndex:
+    """Índice de sites-enabled con cache por archivo (mtime + tamaño)"""
+
+    def __init__(self, sites_dir: Path = NGINX_SITES, cache_path: Optional[Path] = NGINX_INDEX_CACHE):
+        self.sites_dir = Path(sites_dir)
+        self.cache_path = cache_path
+        self.sites: List[Dict] = []
+        self.by_domain: Dict[str, List[tuple]] = {}
+        self.by_port: Dict[int, List[tuple]] = {}
+        self.parsed_files = 0
+
+    def refresh(self) -> "NginxIndex":
+        """Re-parsea sólo los archivos nuevos o modificados"""
+        cached = self._load_cache()
+        sites = []
+        try:
+            paths = sorted(self.sites_dir.iterdir())
+        except OSError:
+            paths = []
+
+        for path in paths:
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if not path.is_file():
+                continue
+
+            previous = cached.get(str(path))
+            if previous and previous["mtime_ns"] == st.st_mtime_ns and previous["size"] == st.st_size:
+                sites.append(previous)
+                continue
+
+            try:
+                content = path.read_text(encoding='utf-8', errors='ignore')
+            except OSError:
+                continue
+            self.parsed_files += 1
+            sites.append({
+                "file": str(path),
+                "name": path.name,
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+                "servers": parse_site(content),
+            })
+
+        if self.parsed_files or len(sites) != len(cached):
+            self._save_cache(sites)
+
+        self._build(sites)
+        return self
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        if self.cache_path is None:
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != CACHE_VERSION or data.get("sites_dir") != str(self.sites_dir):
+            return {}
+        return {site["file"]: site for site in data["sites"]}
+
+    def _save_cache(self, sites: List[Dict]):
+        if self.cache_path is None:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(self.cache_path.suffix + ".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump({"version": CACHE_VERSION, "sites_dir": str(self.sites_dir),
+                           "sites": sites}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
+
+    def _build(self, sites: List[Dict]):
+        self.sites = sites
+        self.by_domain = {}
+        self.by_port = {}
+        for site in sites:
+            for server in site["servers"]:
+                for domain in server["server_names"]:
+                    self.by_domain.setdefault(domain.lower(), []).append((site, server))
+                for port in server["upstream_ports"]:
+                    self.by_port.setdefault(port, []).append((site, server))
+
+    # ------------------------------------------------------------------
+    # Búsquedas (devuelven pares (site, server))
+
+    def find_by_domain(self, domain: str) -> List[tuple]:
+        """server_name exacto; si no hay, wildcards tipo *.ejemplo.com"""
+        domain = domain.lower()
+        if domain in self.by_domain:
+            return list(self.by_domain[domain])
+
+        parts = domain.split(".")
+        for i in range(1, len(parts)):
+            wildcard = "*." + ".".join(parts[i:])
+            if wildcard in self.by_domain:
+                return list(self.by_domain[wildcard])
+        return []
+
+    def find_by_port(self, port: int) -> List[tuple]:
+        """Server blocks que hacen proxy_pass a ese puerto"""
+        return list(self.by_port.get(int(port), []))
+
+    def find_by_project(self, name: str) -> List[tuple]:
+        """
+        Primero los archivos cuyo nombre contiene el proyecto, después los
+        server blocks con algún server_name que lo contenga y por último los
+        que lo tienen en el root o en un proxy_pass (destino o upstream), que
+        es lo que encontraba el `nginx -T | grep` de los scripts de shell
+        """
+        name = name.lower()
+        results = []
+        seen = set()
+
+        def add(site, server):
+            if id(server) not in seen:
+                results.append((site, server))
+                seen.add(id(server))
+
+        for site in self.sites:
+            if name in site["name"].lower():
+                for server in site["servers"]:
+                    add(site, server)
+        for site in self.sites:
+            for server in site["servers"]:
+                if any(name in d.lower() for d in server["server_names"]):
+                    add(site, server)
+        for site in self.sites:
+            for server in site["servers"]:
+                values = server["proxy_targets"] + [server["root"] or ""]
+                if any(name in value.lower() for value in values):
+                    add(site, server)
+        return results
+
+    def server_name_for(self, project: str) -> Optional[str]:
+        """
+        server_name del primer sitio cuyo archivo contiene el nombre del
+        proyecto (lo que usa ProjectAuditor.check_nginx_config)
+        """
+        project = project.lower()
+        for site in self.sites:
+            if project in site["name"].lower():
+                for server in site["servers"]:
+                    if server["server_names"]:
+                        return " ".join(server["server_names"])
+        return None
+
+
+def format_row(site: Dict, server: Dict) -> str:
+    return "\t".join([
+        site["file"],
+        " ".join(server["server_names"]) or "-",
+        ",".join(str(p) for p in server["listen_ports"]) or "-",
+        ",".join(str(p) for p in server["upstream_ports"]) or "-",
+        server["root"] or "-",
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Índice de sitios Nginx')
+    parser.add_argument('command', choices=['project', 'domain', 'port', 'list'])
+    parser.add_argument('query', nargs='?')
+    parser.add_argument('--sites-dir', default=str(NGINX_SITES),
+                        help=f'Directorio de sitios (default: {NGINX_SITES})')
+    parser.add_argument('--no-cache', action='store_true', help='No leer ni escribir el cache')
+    parser.add_argument('--json', action='store_true', help='Salida JSON')
+    args = parser.parse_args()
+
+    if args.command != 'list' and not args.query:
+        parser.error(f"'{args.command}' requiere un argumento")
+
+    index = NginxIndex(Path(args.sites_dir), None if args.no_cache else NGINX_INDEX_CACHE).refresh()
+
+    if args.command == 'project':
+        rows = index.find_by_project(args.query)
+    elif args.command == 'domain':
+        rows = index.find_by_domain(args.query)
+    elif args.command == 'port':
+        if not args.query.isdigit():
+            parser.error("el puerto debe ser numérico")
+        rows = index.find_by_port(int(args.query))
+    else:
+        rows = [(site, server) for site in index.sites for server in site["servers"]]
+
+    if args.json:
+        print(json.dumps([{"file": site["file"], **server} for site, server in rows], indent=2))
+    else:
+        for site, server in rows:
+            print(format_row(site, server))
+
+    return 0 if rows else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
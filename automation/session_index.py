@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Índice de sesiones de Claude Code
+Mapea session_id -> archivo .jsonl en ~/.claude/projects, con mtime y
+cantidad de mensajes. Se guarda en cache y se actualiza de forma
+incremental: sólo se vuelven a listar los directorios de proyecto cuyo
+mtime cambió (crear o borrar una sesión cambia el mtime del directorio).
+Acepta prefijos de session_id (ej. los primeros 8 caracteres).
+
+Uso:
+  python3 session_index.py <session_id o prefijo>
+  python3 session_index.py --list
+  python3 session_index.py --rebuild
+"""
+
+import argparse
+import bisect
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# orjson (si está instalado) parsea las líneas de los .jsonl bastante más rápido
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+CLAUDE_PROJECTS = Path.home() / ".claude" / "projects"
+CACHE_DIR = Path.home() / ".cache" / "ops-scripts"
+SESSION_INDEX_CACHE = CACHE_DIR / "claude-sessions-index.json"
+
+CACHE_VERSION = 1
+
+MESSAGE_TYPES = ("user", "assistant")
+
+
+def count_messages(path: Path) -> int:
+    """Mensajes de usuario/asistente, con el mismo criterio que extract_messages"""
+    count = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            # Descarte barato antes de parsear la línea
+            if b'"message"' not in line:
+                continue
+            try:
+                entry = json_loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get('type') in MESSAGE_TYPES and 'message' in entry:
+                count += 1
+    return count
+
+
+class SessionIndex:
+    """
+    Índice persistente de sesiones.
+
+    dirs[directorio] = {"mtime_ns": ..., "sessions": {session_id: entrada}}
+    con entrada = {"path", "mtime_ns", "size", "messages"}. La cantidad de
+    mensajes se calcula la primera vez que se pide (y de nuevo si el archivo
+    cambió), así construir el índice sólo lista directorios.
+    """
+
+    def __init__(self, projects_dir: Path = CLAUDE_PROJECTS,
+                 cache_path: Optional[Path] = SESSION_INDEX_CACHE):
+        self.projects_dir = Path(projects_dir)
+        self.cache_path = cache_path
+        self.dirs: Dict[str, Dict] = {}
+        self._sorted_ids: List[str] = []
+        self._by_id: Dict[str, Dict] = {}
+        self.scanned_dirs = 0
+        self.dirty = False
+
+    # ------------------------------------------------------------------
+    # Construcción
+
+    @classmethod
+    def open(cls, projects_dir: Path = CLAUDE_PROJECTS,
+             cache_path: Optional[Path] = SESSION_INDEX_CACHE) -> "SessionIndex":
+        """Carga el cache si existe (sin tocar el disco más allá de leerlo)"""
+        index = cls(projects_dir, cache_path)
+        index._load_cache()
+        index._build_lookup()
+        return index
+
+    def refresh(self) -> "SessionIndex":
+        """Vuelve a listar sólo los directorios nuevos o con mtime distinto"""
+        dirs = {}
+        try:
+            with os.scandir(self.projects_dir) as it:
+                project_dirs = sorted((e for e in it if e.is_dir()), key=lambda e: e.name)
+        except OSError:
+            project_dirs = []
+
+        for entry in project_dirs:
+            try:
+                mtime_ns = entry.stat().st_mtime_ns
+            except OSError:
+                continue
+
+            previous = self.dirs.get(entry.path)
+            if previous and previous["mtime_ns"] == mtime_ns:
+                dirs[entry.path] = previous
+                continue
+
+            dirs[entry.path] = {
+                "mtime_ns": mtime_ns,
+                "sessions": self._scan_dir(entry.path, previous["sessions"] if previous else {}),
+            }
+            self.scanned_dirs += 1
+
+        if self.scanned_dirs or len(dirs) != len(self.dirs):
+            self.dirty = True
+        self.dirs = dirs
+        self._build_lookup()
+        return self
+
+    def rebuild(self) -> "SessionIndex":
+        self.dirs = {}
+        return self.refresh()
+
+    @staticmethod
+    def _scan_dir(dir_path: str, previous: Dict[str, Dict]) -> Dict[str, Dict]:
+        sessions = {}
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    if not entry.name.endswith(".jsonl") or not entry.is_file():
+                        continue
+                    session_id = entry.name[:-len(".jsonl")]
+                    st = entry.stat()
+                    old = previous.get(session_id)
+                    if old and old["mtime_ns"] == st.st_mtime_ns and old["size"] == st.st_size:
+                        sessions[session_id] = old
+                    else:
+                        sessions[session_id] = {"path": entry.path, "mtime_ns": st.st_mtime_ns,
+                                                "size": st.st_size, "messages": None}
+        except OSError:
+            pass
+        return sessions
+
+    def _build_lookup(self):
+        self._by_id = {}
+        for info in self.dirs.values():
+            for session_id, session in info["sessions"].items():
+                # Si un session_id aparece en dos proyectos gana el primero (como antes)
+                self._by_id.setdefault(session_id, session)
+        self._sorted_ids = sorted(self._by_id)
+
+    # ------------------------------------------------------------------
+    # Cache en disco
+
+    def _load_cache(self):
+        if self.cache_path is None:
+            return
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == CACHE_VERSION and data.get("projects_dir") == str(self.projects_dir):
+            self.dirs = data["dirs"]
+
+    def save(self):
+        """Guarda el índice si hubo cambios"""
+        if self.cache_path is None or not self.dirty:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(self.cache_path.suffix + ".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump({"version": CACHE_VERSION, "projects_dir": str(self.projects_dir),
+                           "dirs": self.dirs}, f)
+            os.replace(tmp_path, self.cache_path)
+            self.dirty = False
+        except OSError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Búsquedas
+
+    def find_prefix(self, prefix: str) -> List[str]:
+        """session_ids que empiezan con prefix (búsqueda binaria)"""
+        matches = []
+        pos = bisect.bisect_left(self._sorted_ids, prefix)
+        while pos < len(self._sorted_ids) and self._sorted_ids[pos].startswith(prefix):
+            matches.append(self._sorted_ids[pos])
+            pos += 1
+        return matches
+
+    def resolve(self, session_id: str) -> List[str]:
+        """
+        session_ids que corresponden a un id completo o prefijo. Un id
+        completo que está en el cache (y cuyo archivo existe) no toca el
+        disco; un prefijo siempre refresca antes (un stat por directorio de
+        proyecto) para ver sesiones nuevas que lo compartan.
+        """
+        if session_id in self._by_id and os.path.exists(self._by_id[session_id]["path"]):
+            return [session_id]
+
+        self.refresh()
+        return [session_id] if session_id in self._by_id else self.find_prefix(session_id)
+
+    def find(self, session_id: str) -> Optional[Path]:
+        """Archivo de la sesión si el id o prefijo es único"""
+        matches = self.resolve(session_id)
+        self.save()
+        return Path(self._by_id[matches[0]]["path"]) if len(matches) == 1 else None
+
+    def entry(self, session_id: str) -> Optional[Dict]:
+        """
+        Entrada de la sesión con la cantidad de mensajes al día
+        (se cuenta de nuevo sólo si el archivo cambió)
+        """
+        session = self._by_id.get(session_id)
+        if session is None:
+            return None
+        try:
+            st = os.stat(session["path"])
+        except OSError:
+            return None
+        if session["messages"] is None or st.st_mtime_ns != session["mtime_ns"] or st.st_size != session["size"]:
+            session.update(mtime_ns=st.st_mtime_ns, size=st.st_size,
+                           messages=count_messages(Path(session["path"])))
+            self.dirty = True
+        return dict(session, session_id=session_id)
+
+    def cached_entry(self, session_id: str) -> Optional[Dict]:
+        """
+        Como entry() pero sin contar: messages queda en None si el archivo
+        cambió desde la última cuenta (ver set_messages)
+        """
+        session = self._by_id.get(session_id)
+        if session is None:
+            return None
+        try:
+            st = os.stat(session["path"])
+        except OSError:
+            return None
+        messages = session["messages"]
+        if st.st_mtime_ns != session["mtime_ns"] or st.st_size != session["size"]:
+            messages = None
+        return dict(session, session_id=session_id, mtime_ns=st.st_mtime_ns,
+                    size=st.st_size, messages=messages)
+
+    def set_messages(self, session_id: str, messages: int, mtime_ns: int, size: int):
+        """Guarda una cuenta de mensajes hecha afuera (ej. en otro proceso)"""
+        session = self._by_id.get(session_id)
+        if session is not None:
+            session.update(messages=messages, mtime_ns=mtime_ns, size=size)
+            self.dirty = True
+
+    def session_ids(self) -> List[str]:
+        return list(self._sorted_ids)
+
+    def __len__(self):
+        return len(self._by_id)
+
+
+def format_entry(entry: Dict) -> str:
+    from datetime import datetime
+    modified = datetime.fromtimestamp(entry["mtime_ns"] / 1e9).isoformat(timespec='seconds')
+    return "\t".join([entry["session_id"], modified, str(entry["messages"]), entry["path"]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Índice de sesiones de Claude Code')
+    parser.add_argument('session_id', nargs='?', help='session_id completo o prefijo')
+    parser.add_argument('--list', action='store_true', help='Listar todas las sesiones')
+    parser.add_argument('--rebuild', action='store_true', help='Reconstruir el índice completo')
+    parser.add_argument('--projects-dir', default=str(CLAUDE_PROJECTS),
+                        help=f'Directorio de proyectos (default: {CLAUDE_PROJECTS})')
+    args = parser.parse_args()
+
+    index = SessionIndex.open(Path(args.projects_dir))
+    if args.rebuild:
+        index.rebuild()
+        print(f"✅ Índice reconstruido: {len(index)} sesiones en {len(index.dirs)} proyectos")
+    elif args.list:
+        index.refresh()
+
+    # entry() da None si el archivo se borró después del refresh
+    if args.list:
+        for session_id in index.session_ids():
+            entry = index.entry(session_id)
+            if entry is not None:
+                print(format_entry(entry))
+    elif args.session_id:
+        matches = index.resolve(args.session_id)
+        for session_id in matches:
+            entry = index.entry(session_id)
+            if entry is not None:
+                print(format_entry(entry))
+        if not matches:
+            print(f"❌ No se encontró sesión: {args.session_id}", file=sys.stderr)
+    elif not args.rebuild:
+        parser.print_usage()
+        return 1
+
+    index.save()
+    return 0 if args.rebuild or args.list or matches else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
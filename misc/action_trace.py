@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Traces de acciones grabados para los agentes web
+Cuando una tarea termina bien se guarda la secuencia de acciones, con la
+clave (tarea, url, fingerprint del DOM inicial). En la próxima corrida de la
+misma tarea el agente reproduce el trace sin llamar a los modelos; antes de
+cada paso se verifica que la página coincida con lo grabado (el elemento
+sobre el que se actúa existe con el mismo rol y nombre en la misma url, o el
+DOM es el mismo). Si un paso no verifica, el agente vuelve a razonar desde ahí.
+
+Los traces incluyen lo que se escribió (type), por eso se guardan con
+permisos 600.
+
+Uso (desde los agentes):
+  traces = TraceCache()
+  trace = traces.load(task, url, snapshot)
+  verified = await wait_for_step(page, trace["steps"][0])
+  ...
+  traces.save(task, url, snapshot, [record_step(decision, snapshot), ...])
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dom_snapshot import DomSnapshot
+
+CACHE_DIR = Path.home() / ".cache" / "ops-scripts"
+TRACE_DIR = CACHE_DIR / "agent-traces"
+
+CACHE_VERSION = 1
+
+# Campos de la decisión que se guardan (el razonamiento no hace falta)
+TRACE_FIELDS = ("action", "value", "key", "direction", "amount", "seconds",
+                "target", "coordinates", "confidence")
+# Tiempo máximo esperando que la página coincida con el paso grabado
+REPLAY_VERIFY_TIMEOUT = 10.0
+REPLAY_POLL_INTERVAL = 0.25
+
+
+def record_step(decision: Dict, snapshot: Optional[DomSnapshot]) -> Dict:
+    """Paso del trace: la decisión, el elemento sobre el que actuó y la pantalla"""
+    step = {"decision": {k: decision[k] for k in TRACE_FIELDS if k in decision},
+            "element": None, "url": None, "fingerprint": None}
+    if snapshot is not None:
+        step["url"] = snapshot.url
+        step["fingerprint"] = snapshot.fingerprint()
+        element = snapshot.element(decision.get("element"))
+        if element is not None:
+            step["element"] = {k: element[k] for k in ("role", "name", "selector")}
+    return step
+
+
+def verify_step(step: Dict, snapshot: Optional[DomSnapshot]) -> Optional[Dict]:
+    """
+    Decisión a ejecutar si la pantalla actual coincide con el paso grabado
+    (con el índice del elemento en el snapshot actual), None si no coincide
+    """
+    if snapshot is None:
+        return None
+    # Un elemento con el mismo rol y nombre en otra página no es el mismo paso
+    if step["url"] is not None and snapshot.url != step["url"]:
+        return None
+    decision = dict(step["decision"], reasoning="reproducido del trace")
+    element = step["element"]
+    if element is not None:
+        index = snapshot.find(element["role"], element["name"], element["selector"])
+        if index is None:
+            return None
+        decision["element"] = index
+        return decision
+    # 'done' sólo necesita la misma url; el resto, la misma pantalla
+    if decision["action"] != "done" and snapshot.fingerprint() != step["fingerprint"]:
+        return None
+    return decision
+
+
+async def wait_for_step(page, step: Dict, timeout: float = REPLAY_VERIFY_TIMEOUT) -> Optional[tuple]:
+    """
+    Espera (tomando snapshots) hasta que la página coincida con el paso.
+    Devuelve (snapshot, decisión) o None si no coincidió antes del timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        snapshot = await DomSnapshot.capture(page)
+        decision = verify_step(step, snapshot)
+        if decision is not None:
+            return snapshot, decision
+        if time.monotonic() >= deadline:
+            return None
+        await asyncio.sleep(REPLAY_POLL_INTERVAL)
+
+
+class TraceCache:
+    """
+    Un archivo JSON por (tarea, url) con los traces por fingerprint del DOM
+    inicial: {"task", "url", "traces": {fingerprint: trace}}
+    """
+
+    def __init__(self, directory: Path = TRACE_DIR):
+        self.directory = Path(directory)
+
+    def path(self, task: str, url: str) -> Path:
+        key = hashlib.sha1(f"{task}\n{url}".encode()).hexdigest()[:16]
+        return self.directory / f"{key}.json"
+
+    def _load_file(self, task: str, url: str) -> Dict:
+        try:
+            with open(self.path(task, url)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != CACHE_VERSION or data.get("task") != task or data.get("url") != url:
+            return {}
+        return data
+
+    def load(self, task: str, url: str, snapshot: Optional[DomSnapshot]) -> Optional[Dict]:
+        """
+        Trace grabado para la pantalla inicial: el del mismo fingerprint o,
+        si no hay, el primero cuyo primer paso verifica en la pantalla actual
+        """
+        if snapshot is None:
+            return None
+        traces = self._load_file(task, url).get("traces", {})
+        trace = traces.get(snapshot.fingerprint())
+        if trace is not None:
+            return trace
+        for trace in traces.values():
+            if trace["steps"] and verify_step(trace["steps"][0], snapshot) is not None:
+                return trace
+        return None
+
+    def save(self, task: str, url: str, snapshot: DomSnapshot, steps: List[Dict]) -> Path:
+        """Guarda (o reemplaza) el trace de la pantalla inicial del snapshot"""
+        data = self._load_file(task, url) or {"version": CACHE_VERSION, "task": task,
+                                              "url": url, "traces": {}}
+        fingerprint = snapshot.fingerprint()
+        previous = data["traces"].get(fingerprint, {})
+        data["traces"][fingerprint] = {
+            "recorded": datetime.now().isoformat(timespec='seconds'),
+            "runs": previous.get("runs", 0) + 1,
+            "steps": steps,
+        }
+
+        path = self.path(task, url)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".json.tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
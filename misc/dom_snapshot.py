@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Snapshot del DOM para los agentes web
+En una sola llamada a page.evaluate se extraen los elementos interactivos
+visibles (rol, nombre accesible, bounding box y un selector CSS único). El
+snapshot se le pasa al modelo como texto y el modelo elige un elemento por
+índice: no hace falta el modelo de visión para encontrar un botón ni
+adivinar coordenadas.
+
+El snapshot se considera ambiguo (y entonces sí se usa visión) si no hay
+elementos, si la mayoría no tiene nombre o si buena parte de la pantalla es
+contenido opaco al DOM (canvas, iframes, video).
+
+Uso (desde los agentes):
+  snapshot = await DomSnapshot.capture(page)
+  if snapshot and not snapshot.ambiguity():
+      description = snapshot.format()
+  ...
+  await click_element(page, snapshot.element(decision["element"]))
+"""
+
+import hashlib
+from typing import Dict, List, Optional
+
+# Elementos que se incluyen en el snapshot (los más cercanos al tope primero)
+DOM_MAX_ELEMENTS = 60
+# Fracción del viewport cubierta por canvas/iframe/video a partir de la cual hace falta visión
+OPAQUE_COVERAGE = 0.3
+# Fracción de elementos sin nombre accesible a partir de la cual hace falta visión
+MAX_UNNAMED_RATIO = 0.5
+NAME_LENGTH = 80
+
+SNAPSHOT_JS = r"""
+(maxElements) => {
+  const INTERACTIVE = 'a[href], button, input:not([type=hidden]), select, textarea, summary, ' +
+    '[role=button], [role=link], [role=checkbox], [role=radio], [role=tab], [role=menuitem], ' +
+    '[role=option], [role=switch], [role=textbox], [role=combobox], [onclick], ' +
+    '[contenteditable=""], [contenteditable=true], [tabindex]:not([tabindex="-1"])';
+  const vw = window.innerWidth, vh = window.innerHeight;
+  const clean = (text) => (text || '').replace(/\s+/g, ' ').trim().slice(0, %d);
+
+  const visible = (el, rect) => {
+    if (rect.width < 2 || rect.height < 2) return false;
+    if (rect.bottom <= 0 || rect.right <= 0 || rect.top >= vh || rect.left >= vw) return false;
+    const style = getComputedStyle(el);
+    return style.visibility !== 'hidden' && style.display !== 'none' && style.opacity !== '0';
+  };
+
+  const role = (el) => {
+    const explicit = el.getAttribute('role');
+    if (explicit) return explicit;
+    const tag = el.tagName.toLowerCase();
+    if (tag === 'a') return 'link';
+    if (tag === 'select') return 'combobox';
+    if (tag === 'textarea') return 'textbox';
+    if (tag === 'input') {
+      const type = (el.getAttribute('type') || 'text').toLowerCase();
+      if (['button', 'submit', 'reset', 'image'].includes(type)) return 'button';
+      if (['checkbox', 'radio'].includes(type)) return type;
+      return 'textbox';
+    }
+    if (tag === 'button' || tag === 'summary') return 'button';
+    return el.isContentEditable ? 'textbox' : 'generic';
+  };
+
+  const name = (el) => {
+    const labelledby = el.getAttribute('aria-labelledby');
+    const candidates = [
+      el.getAttribute('aria-label'),
+      labelledby && labelledby.split(/\s+/).map(id => {
+        const ref = document.getElementById(id);
+        return ref ? ref.innerText : '';
+      }).join(' '),
+      el.labels && el.labels.length ? el.labels[0].innerText : '',
+      el.tagName === 'INPUT' || el.tagName === 'TEXTAREA' || el.tagName === 'SELECT' ? '' : el.innerText,
+      ['button', 'submit', 'reset'].includes(el.type) ? el.value : '',
+      el.getAttribute('placeholder'),
+      el.getAttribute('title'),
+      (el.querySelector('img[alt]') || {}).alt,
+    ];
+    for (const text of candidates) {
+      const value = clean(text);
+      if (value) return value;
+    }
+    return '';
+  };
+
+  const unique = (selector) => {
+    try { return document.querySelectorAll(selector).length === 1; } catch (e) { return false; }
+  };
+
+  const selector = (el) => {
+    const tag = el.tagName.toLowerCase();
+    if (el.id && unique('#' + CSS.escape(el.id))) return '#' + CSS.escape(el.id);
+    for (const attr of ['data-testid', 'data-test', 'name', 'aria-label']) {
+      const value = el.getAttribute(attr);
+      if (value) {
+        const sel = `${tag}[${attr}="${CSS.escape(value)}"]`;
+        if (unique(sel)) return sel;
+      }
+    }
+    const parts = [];
+    let node = el;
+    while (node && node.nodeType === 1 && node !== document.body) {
+      if (node.id && unique('#' + CSS.escape(node.id))) {
+        parts.unshift('#' + CSS.escape(node.id));
+        return parts.join(' > ');
+      }
+      let part = node.tagName.toLowerCase();
+      const parent = node.parentElement;
+      if (parent) {
+        const same = Array.from(parent.children).filter(c => c.tagName === node.tagName);
+        if (same.length > 1) part += `:nth-of-type(${same.indexOf(node) + 1})`;
+      }
+      parts.unshift(part);
+      node = parent;
+    }
+    return 'body > ' + parts.join(' > ');
+  };
+
+  const seen = new Set();
+  const elements = [];
+  for (const el of document.querySelectorAll(INTERACTIVE)) {
+    // Un link dentro de un botón (o al revés) cuenta una sola vez
+    if (seen.has(el) || (el.parentElement && el.parentElement.closest(INTERACTIVE) &&
+        seen.has(el.parentElement.closest(INTERACTIVE)))) continue;
+    const rect = el.getBoundingClientRect();
+    if (!visible(el, rect)) continue;
+    seen.add(el);
+    elements.push({
+      tag: el.tagName.toLowerCase(),
+      role: role(el),
+      name: name(el),
+      type: el.tagName === 'INPUT' ? (el.getAttribute('type') || 'text') : null,
+      x: Math.round(rect.left + rect.width / 2),
+      y: Math.round(rect.top + rect.height / 2),
+      w: Math.round(rect.width),
+      h: Math.round(rect.height),
+      disabled: !!el.disabled || el.getAttribute('aria-disabled') === 'true',
+      selector: selector(el),
+    });
+  }
+  elements.sort((a, b) => (a.y - b.y) || (a.x - b.x));
+
+  let opaque = 0;
+  for (const el of document.querySelectorAll('canvas, iframe, embed, object, video')) {
+    const rect = el.getBoundingClientRect();
+    if (!visible(el, rect)) continue;
+    const w = Math.min(rect.right, vw) - Math.max(rect.left, 0);
+    const h = Math.min(rect.bottom, vh) - Math.max(rect.top, 0);
+    if (w > 0 && h > 0) opaque += w * h;
+  }
+
+  return {
+    url: location.href,
+    title: document.title,
+    total: elements.length,
+    elements: elements.slice(0, maxElements),
+    opaque: Math.min(opaque / (vw * vh), 1),
+  };
+}
+""" % NAME_LENGTH
+
+
+class DomSnapshot:
+    """Elementos interactivos visibles de la página en un momento dado"""
+
+    def __init__(self, data: Dict):
+        self.url: str = data.get("url", "")
+        self.title: str = data.get("title", "")
+        self.elements: List[Dict] = data.get("elements", [])
+        self.total: int = data.get("total", len(self.elements))
+        self.opaque: float = data.get("opaque", 0.0)
+
+    @classmethod
+    async def capture(cls, page, max_elements: int = DOM_MAX_ELEMENTS) -> Optional["DomSnapshot"]:
+        """Snapshot de la página (None si evaluate falla, ej. durante una navegación)"""
+        try:
+            return cls(await page.evaluate(SNAPSHOT_JS, max_elements))
+        except Exception:
+            return None
+
+    def ambiguity(self) -> Optional[str]:
+        """Motivo por el que el snapshot no alcanza para decidir (None si alcanza)"""
+        if not self.elements:
+            return "sin elementos interactivos"
+        if self.opaque >= OPAQUE_COVERAGE:
+            return f"{self.opaque:.0%} de la pantalla es canvas/iframe/video"
+        unnamed = sum(1 for el in self.elements if not el["name"])
+        if unnamed / len(self.elements) > MAX_UNNAMED_RATIO:
+            return f"{unnamed}/{len(self.elements)} elementos sin nombre"
+        return None
+
+    def fingerprint(self) -> str:
+        """
+        Hash de los elementos (rol + nombre, sin posiciones ni orden): sirve
+        para reconocer la misma pantalla aunque el layout se mueva un poco
+        """
+        lines = sorted(f"{el['role']}|{el['name']}" for el in self.elements)
+        return hashlib.sha1("\n".join(lines).encode()).hexdigest()[:16]
+
+    def find(self, role: str, name: str, selector: Optional[str] = None) -> Optional[int]:
+        """
+        Índice del elemento con ese rol y nombre (si hay varios, el del mismo
+        selector). None si no está o es ambiguo.
+        """
+        matches = [i for i, el in enumerate(self.elements) if el["role"] == role and el["name"] == name]
+        if len(matches) > 1 and selector:
+            matches = [i for i in matches if self.elements[i]["selector"] == selector] or matches
+        return matches[0] if len(matches) == 1 else None
+
+    def element(self, index) -> Optional[Dict]:
+        """Elemento por índice (acepta '3' o 3)"""
+        try:
+            index = int(index)
+        except (TypeError, ValueError):
+            return None
+        return self.elements[index] if 0 <= index < len(self.elements) else None
+
+    def format(self) -> str:
+        """Texto compacto para el prompt: una línea por elemento"""
+        lines = [f"Página: {self.title or '(sin título)'} - {self.url}",
+                 f"Elementos interactivos visibles ({len(self.elements)}"
+                 + (f" de {self.total}" if self.total > len(self.elements) else "") + "):"]
+        for i, el in enumerate(self.elements):
+            line = f"[{i}] {el['role']}"
+            if el["name"]:
+                line += f' "{el["name"]}"'
+            if el.get("type") and el["role"] == "textbox":
+                line += f" type={el['type']}"
+            line += f" @ ({el['x']}, {el['y']})"
+            if el.get("disabled"):
+                line += " deshabilitado"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+async def click_element(page, element: Dict, timeout: int = 3000) -> str:
+    """
+    Click en un elemento del snapshot: primero por selector, si falla por el
+    centro de su bounding box. Devuelve el método usado.
+    """
+    try:
+        await page.click(element["selector"], timeout=timeout)
+        return "selector"
+    except Exception:
+        await page.mouse.click(element["x"], element["y"])
+        return "coordenadas"
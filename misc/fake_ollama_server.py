@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Servidor Ollama falso para probar los agentes y ollama_client.py sin GPU
+Implementa /api/tags, /api/ps, /api/pull y /api/generate (con y sin
+stream) y simula carga de modelos, keep_alive y desalojo cuando hay más
+modelos cargados que --max-loaded.
+
+Las respuestas salen de --responses (JSON {modelo: texto o [textos]}, se
+rotan en cada llamada); si no, los requests con format=json reciben una
+decisión JSON de click y los que traen imágenes una descripción de página.
+
+Uso:
+  python3 fake_ollama_server.py [--port 11435] [--load-time 2] [--token-delay 0.02]
+  python3 ollama-web-agent-reasoning.py --ollama-url http://localhost:11435 --task "..."
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODELS = ["deepseek-r1:8b", "llava:7b", "qwen2-vl:7b"]
+
+VISION_RESPONSE = ("La página muestra un header con el logo y un botón 'Sign in' arriba a la "
+                   "derecha (x=1150, y=40). En el centro hay un botón 'Continue with Google' "
+                   "(x=640, y=420). La página está cargada.")
+
+DECISION_RESPONSE = json.dumps({
+    "action": "click",
+    "target": "button:has-text('Continue with Google')",
+    "target_description": "Botón de Google OAuth",
+    "coordinates": {"x": 640, "y": 420},
+    "confidence": 0.9,
+    "fallback": "Usar coordenadas",
+    "reasoning": "Veo el botón de Google OAuth en el centro de la pantalla, hago click ahí."
+}, ensure_ascii=False)
+
+
+def parse_keep_alive(value) -> float:
+    """'30m', '10s', '1h', 300, -1 -> segundos (inf = fijo)"""
+    if value is None:
+        return 300.0
+    if isinstance(value, (int, float)):
+        return float('inf') if value < 0 else float(value)
+    value = str(value).strip()
+    units = {"s": 1, "m": 60, "h": 3600}
+    if value[-1:] in units:
+        return float(value[:-1]) * units[value[-1]]
+    number = float(value)
+    return float('inf') if number < 0 else number
+
+
+class FakeOllama:
+    """Estado compartido: modelos descargados, cargados y respuestas"""
+
+    def __init__(self, models, responses, load_time, token_delay, max_loaded):
+        self.models = list(models)
+        self.responses = {m: itertools.cycle(r if isinstance(r, list) else [r])
+                          for m, r in responses.items()}
+        self.load_time = load_time
+        self.token_delay = token_delay
+        self.max_loaded = max_loaded
+        self.loaded = {}  # modelo -> expira (time.monotonic)
+        self.loads = 0
+        self.lock = threading.Lock()
+
+    def response_for(self, model: str, data: dict) -> str:
+        with self.lock:
+            if model in self.responses:
+                return next(self.responses[model])
+        if data.get("images") and data.get("format") != "json":
+            return VISION_RESPONSE
+        return DECISION_RESPONSE
+
+    def ensure_loaded(self, model: str, keep_alive) -> float:
+        """Carga el modelo si hace falta; devuelve el tiempo de carga simulado"""
+        now = time.monotonic()
+        ttl = parse_keep_alive(keep_alive)
+        with self.lock:
+            for name, expires in list(self.loaded.items()):
+                if expires <= now:
+                    del self.loaded[name]
+            load = 0.0
+            if model not in self.loaded:
+                # Desaloja el que vence antes si no entra
+                while len(self.loaded) >= self.max_loaded:
+                    del self.loaded[min(self.loaded, key=self.loaded.get)]
+                load = self.load_time
+                self.loads += 1
+            if ttl == 0:
+                self.loaded.pop(model, None)
+            else:
+                self.loaded[model] = now + load + ttl
+        if load:
+            time.sleep(load)
+        return load
+
+
+def make_handler(state: FakeOllama):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, data, status=200):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._json({"models": [{"name": m} for m in state.models]})
+            elif self.path == "/api/ps":
+                now = time.monotonic()
+                with state.lock:
+                    loaded = [(m, e) for m, e in state.loaded.items() if e > now]
+                self._json({"models": [{
+                    "name": m, "size_vram": 5_000_000_000,
+                    "expires_at": ("never" if e == float('inf') else
+                                   (datetime.now(timezone.utc) + timedelta(seconds=e - now)).isoformat()),
+                } for m, e in loaded]})
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            data = self._body()
+            if self.path == "/api/pull":
+                name = data.get("name") or data.get("model")
+                if name not in state.models:
+                    state.models.append(name)
+                self._json({"status": "success"})
+            elif self.path == "/api/generate":
+                self._generate(data)
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def _generate(self, data):
+            model = data.get("model")
+            if model not in state.models:
+                self._json({"error": f"model '{model}' not found"}, 404)
+                return
+
+            start = time.perf_counter()
+            load = state.ensure_loaded(model, data.get("keep_alive"))
+            final = {"model": model, "done": True, "load_duration": int(load * 1e9)}
+
+            # Request sin prompt: sólo carga/descarga el modelo
+            if not data.get("prompt"):
+                final.update(response="", total_duration=int((time.perf_counter() - start) * 1e9))
+                self._json(final)
+                return
+
+            text = state.response_for(model, data)
+            tokens = [text[i:i + 4] for i in range(0, len(text), 4)]
+            final.update(prompt_eval_count=len(data["prompt"]) // 4, eval_count=len(tokens),
+                         eval_duration=int(len(tokens) * state.token_delay * 1e9))
+
+            if data.get("stream", True) is False:
+                time.sleep(len(tokens) * state.token_delay)
+                final.update(response=text, total_duration=int((time.perf_counter() - start) * 1e9))
+                self._json(final)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for token in tokens:
+                    time.sleep(state.token_delay)
+                    self._chunk({"model": model, "response": token, "done": False})
+                final.update(response="", total_duration=int((time.perf_counter() - start) * 1e9))
+                self._chunk(final)
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # El cliente cortó el stream (parseo temprano)
+                self.close_connection = True
+
+        def _chunk(self, data):
+            line = (json.dumps(data) + "\n").encode()
+            self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor Ollama falso para pruebas')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--models', default=",".join(DEFAULT_MODELS),
+                        help='Modelos "descargados" separados por coma')
+    parser.add_argument('--responses', help='JSON {modelo: texto o [textos]}')
+    parser.add_argument('--load-time', type=float, default=2.0,
+                        help='Segundos que tarda en cargar un modelo (default: 2)')
+    parser.add_argument('--token-delay', type=float, default=0.02,
+                        help='Segundos por token generado (default: 0.02)')
+    parser.add_argument('--max-loaded', type=int, default=2,
+                        help='Modelos cargados a la vez antes de desalojar (default: 2)')
+    args = parser.parse_args()
+
+    responses = {}
+    if args.responses:
+        with open(args.responses) as f:
+            responses = json.load(f)
+
+    state = FakeOllama(args.models.split(","), responses, args.load_time,
+                       args.token_delay, args.max_loaded)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+    print(f"🧪 Ollama falso en http://127.0.0.1:{args.port} (modelos: {args.models})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"\n📊 Cargas de modelos: {state.loads}")
+
+
+if __name__ == "__main__":
+    main()
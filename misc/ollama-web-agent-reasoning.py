@@ -18,12 +18,82 @@ import json
 import sys
 import argparse
 import base64
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from playwright.async_api import async_playwright
-import httpx
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from action_trace import TraceCache, record_step, wait_for_step
+from dom_snapshot import DomSnapshot, click_element
+from ollama_client import DEFAULT_KEEP_ALIVE, IncrementalJSONObject, ModelPolicy, OllamaClient
+from page_settle import DOM_QUIET_MS, NAVIGATION_SETTLE_TIMEOUT, SETTLE_TIMEOUT, PageSettler
+from screen_change import SCREEN_DIFF_THRESHOLD, ScreenChangeDetector
+
+# Acciones tras las cuales la pantalla casi no cambia: el próximo paso razona
+# con la descripción anterior en vez de volver a llamar al modelo de visión
+CHEAP_ACTIONS = ('type',)
+
+# Campos que tienen que estar completos (además de action y confidence) para
+# ejecutar la decisión sin esperar a que el modelo termine de generar
+DECISION_FIELDS = {
+    "click": ("target", "coordinates"),
+    "type": ("value",),
+    "press": ("key",),
+    "scroll": ("direction", "amount"),
+    "wait": ("seconds",),
+    "done": (),
+}
+
+# Límites superiores (segundos) de los buckets de los histogramas de latencia
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 40, 80)
+
+class LatencyHistogram:
+    """Latencias por etapa del step engine (screenshot, vision, reason, ...)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.samples: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def count(self, name: str):
+        self.counters[name] = self.counters.get(name, 0) + 1
+
+    @contextmanager
+    def timed(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    @staticmethod
+    def percentile(values: List[float], pct: float) -> float:
+        ordered = sorted(values)
+        return ordered[min(int(len(ordered) * pct), len(ordered) - 1)]
+
+    def report(self) -> List[str]:
+        """Una línea de resumen por etapa más sus buckets no vacíos"""
+        lines = []
+        for stage, values in self.samples.items():
+            lines.append(f"{stage:<12} n={len(values):<3} p50={self.percentile(values, 0.5):6.2f}s "
+                         f"p90={self.percentile(values, 0.9):6.2f}s max={max(values):6.2f}s "
+                         f"total={sum(values):7.2f}s")
+            counts = [0] * (len(self.buckets) + 1)
+            for value in values:
+                counts[next((i for i, b in enumerate(self.buckets) if value <= b), len(self.buckets))] += 1
+            for i, n in enumerate(counts):
+                if n:
+                    label = f"≤{self.buckets[i]}s" if i < len(self.buckets) else f">{self.buckets[-1]}s"
+                    lines.append(f"    {label:>7} {'█' * n} {n}")
+        if self.counters:
+            lines.append("  ".join(f"{name}={n}" for name, n in self.counters.items()))
+        return lines
+
 class ReasoningWebAgent:
     def __init__(
         self,
@@ -31,16 +101,52 @@ class ReasoningWebAgent:
         reasoning_model: str = "deepseek-r1:8b",
         vision_model: str = "llava:7b",
         headless: bool = False,
-        verbose: bool = True
+        verbose: bool = True,
+        settle_time: float = SETTLE_TIMEOUT,
+        settle_quiet_ms: int = DOM_QUIET_MS,
+        pipeline: bool = True,
+        screen_threshold: float = SCREEN_DIFF_THRESHOLD,
+        keep_alive=DEFAULT_KEEP_ALIVE,
+        reasoning_tail: bool = False,
+        dom_first: bool = True,
+        use_traces: bool = True
     ):
         self.ollama_url = ollama_url
         self.reasoning_model = reasoning_model
         self.vision_model = vision_model
         self.headless = headless
         self.verbose = verbose
-        self.client = httpx.AsyncClient(timeout=180.0)
+        # Los dos modelos quedan residentes (keep_alive) y se precargan juntos
+        self.ollama = OllamaClient(ollama_url, timeout=180.0,
+                                   default_policy=ModelPolicy(keep_alive))
         self.action_history = []
         self.reasoning_log = []
+        # Después de la salida temprana se corta la generación ahí mismo; con
+        # reasoning_tail el resto de la respuesta (el razonamiento) se sigue
+        # leyendo en background hasta el próximo paso (el modelo sigue
+        # generando mientras se ejecuta la acción)
+        self.reasoning_tail = reasoning_tail
+        self._reasoning_task: Optional[asyncio.Task] = None
+        self._reasoning_stream = None
+
+        # Step engine: después de cada acción se espera (como mucho
+        # settle_time) a que la página se estabilice y la visión del próximo
+        # paso arranca con el screenshot estable
+        self.pipeline = pipeline
+        self.latency = LatencyHistogram()
+        self.screens = ScreenChangeDetector(screen_threshold)
+        self.settler = PageSettler(settle_time, settle_quiet_ms, self.screens)
+
+        # DOM primero: los elementos interactivos salen de un snapshot del DOM
+        # y la visión se usa sólo si el snapshot es ambiguo
+        self.dom_first = dom_first
+        self.snapshot: Optional[DomSnapshot] = None
+
+        # Traces grabados: una tarea que ya terminó bien se reproduce sin
+        # llamar a los modelos (necesita el snapshot del DOM para verificar)
+        self.traces = TraceCache() if use_traces and dom_first else None
+        self.trace_steps: List[Dict] = []
+        self.replayed_steps = 0
 
     def log(self, message: str, level: str = "INFO"):
         """Log con timestamp"""
@@ -51,9 +157,7 @@ class ReasoningWebAgent:
     async def check_models(self):
         """Verifica que los modelos estén disponibles"""
         try:
-            response = await self.client.get(f"{self.ollama_url}/api/tags")
-            models = response.json()
-            available = [m['name'] for m in models['models']]
+            available = await self.ollama.tags()
 
             self.log(f"📦 Modelos disponibles: {', '.join(available)}")
 
@@ -67,7 +171,8 @@ class ReasoningWebAgent:
                 self.log(f"⬇️  Descargando {self.vision_model}...", "WARN")
                 await self.pull_model(self.vision_model)
 
-            self.log("✅ Modelos listos")
+            await self.ollama.ensure_resident([self.reasoning_model, self.vision_model])
+            self.log(f"✅ Modelos listos y cargados (keep_alive={self.ollama.default_policy.keep_alive})")
 
         except Exception as e:
             self.log(f"❌ Error: {e}", "ERROR")
@@ -76,21 +181,17 @@ class ReasoningWebAgent:
     async def pull_model(self, model_name: str):
         """Descarga un modelo"""
         self.log(f"📥 Descargando {model_name}... (puede tardar)")
-        async with self.client.stream(
-            'POST',
-            f"{self.ollama_url}/api/pull",
-            json={"name": model_name}
-        ) as response:
-            async for line in response.aiter_lines():
-                if line:
-                    data = json.loads(line)
-                    if 'status' in data:
-                        status = data['status']
-                        if 'total' in data and 'completed' in data:
-                            pct = (data['completed'] / data['total']) * 100
-                            print(f"   {status} {pct:.1f}%", end='\r')
-                        else:
-                            print(f"   {status}", end='\r')
+
+        def show(data: Dict):
+            if 'status' in data:
+                status = data['status']
+                if 'total' in data and 'completed' in data:
+                    pct = (data['completed'] / data['total']) * 100
+                    print(f"   {status} {pct:.1f}%", end='\r')
+                else:
+                    print(f"   {status}", end='\r')
+
+        await self.ollama.pull(model_name, show)
         print()
         self.log(f"✅ {model_name} descargado")
 
@@ -108,19 +209,12 @@ class ReasoningWebAgent:
 Sé específico y técnico."""
 
         try:
-            response = await self.client.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": self.vision_model,
-                    "prompt": prompt,
-                    "images": [screenshot_base64],
-                    "stream": False
-                }
+            description = await self.ollama.generate(
+                self.vision_model,
+                prompt,
+                images=[screenshot_base64]
             )
 
-            result = response.json()
-            description = result['response']
-
             self.log(f"📸 Descripción: {description[:200]}...")
             return description
 
@@ -128,6 +222,106 @@ Sé específico y técnico."""
             self.log(f"❌ Error en visión: {e}", "ERROR")
             return "Error analizando imagen"
 
+    async def _vision_task(self, screenshot: bytes) -> str:
+        """Visión cronometrada (también cuando corre en background)"""
+        start = time.perf_counter()
+        try:
+            description = await self.analyze_screenshot_with_vision(base64.b64encode(screenshot).decode())
+        except asyncio.CancelledError:
+            self.latency.count("vision_cancelled")
+            raise
+        self.latency.add("vision", time.perf_counter() - start)
+        return description
+
+    async def describe_screen(self, screenshot: bytes, previous: Optional[Dict],
+                              prefetch: Optional[tuple]) -> tuple:
+        """
+        Descripción de la pantalla para el paso actual. Si el snapshot del DOM
+        alcanza se usa sólo eso; si no, la descripción de visión más los
+        elementos del DOM que haya. Devuelve (descripción, texto de visión o None).
+        """
+        snapshot = self.snapshot
+        if self.dom_first:
+            reason = snapshot.ambiguity() if snapshot is not None else "snapshot no disponible"
+            if reason is None:
+                if prefetch is not None:
+                    prefetch[1].cancel()
+                self.latency.count("dom_only")
+                self.log(f"🌳 DOM: {len(snapshot.elements)} elementos interactivos, sin modelo de visión")
+                return snapshot.format(), None
+            self.log(f"🌳 DOM ambiguo ({reason}), usando visión")
+
+        vision = await self.vision_description(screenshot, previous, prefetch)
+        if snapshot is not None and snapshot.elements:
+            return f"{vision}\n\nELEMENTOS DEL DOM:\n{snapshot.format()}", vision
+        return vision, vision
+
+    async def vision_description(self, screenshot: bytes, previous: Optional[Dict],
+                                 prefetch: Optional[tuple]) -> str:
+        """
+        Descripción de visión, en orden de costo:
+        1. Pantalla prácticamente igual a la última analizada
+           (ScreenChangeDetector): se reutiliza la descripción
+        2. La última acción fue barata (CHEAP_ACTIONS): descripción anterior
+           (el contexto de pasos ya le dice al modelo qué se hizo)
+        3. El prefetch se lanzó sobre la misma pantalla: se espera ese resultado
+        4. Si no, se llama al modelo de visión (cancelando un prefetch obsoleto)
+        Un prefetch que no se usa siempre se cancela (si no sigue ocupando la GPU).
+        """
+        cached = self.screens.lookup(screenshot)
+        if cached is not None:
+            if prefetch is not None:
+                prefetch[1].cancel()
+            self.latency.count("vision_reused")
+            self.log("👁️  Pantalla sin cambios, reutilizando descripción")
+            return cached
+
+        if previous and previous["action"] in CHEAP_ACTIONS and previous["vision"]:
+            if prefetch is not None:
+                prefetch[1].cancel()
+            self.latency.count("vision_skipped")
+            self.log(f"👁️  Acción barata ({previous['action']}), sin modelo de visión")
+            return previous["vision"]
+
+        if prefetch is not None:
+            prefetch_shot, task = prefetch
+            if self.screens.same_screen(prefetch_shot, screenshot):
+                self.latency.count("prefetch_hit")
+                with self.latency.timed("vision_wait"):
+                    description = await task
+                self.screens.store(screenshot, description)
+                return description
+            self.latency.count("prefetch_miss")
+            task.cancel()
+
+        with self.latency.timed("vision_wait"):
+            description = await self._vision_task(screenshot)
+        self.screens.store(screenshot, description)
+        return description
+
+    async def settle(self, page, decision: Dict) -> Optional[tuple]:
+        """
+        Espera a que la página se estabilice (PageSettler: load state, DOM
+        quieto y screenshots iguales). Si el pipeline está activo arranca la
+        visión del próximo paso con el screenshot estable, en paralelo con
+        el snapshot del DOM y el screenshot del paso.
+        Devuelve (screenshot, task) del prefetch o None.
+        """
+        with self.latency.timed("settle"):
+            result = await self.settler.settle(page, label=decision.get('action', ''))
+        if result["reason"] != "estable":
+            self.latency.count("settle_timeout")
+        self.log(f"⏳ Página estable en {result['seconds']:.2f}s ({result['reason']})")
+
+        # Si la página se pudo leer del DOM se asume que la próxima también;
+        # si la pantalla ya tiene descripción (no cambió) no hay nada que adelantar
+        dom_readable = self.dom_first and self.snapshot is not None and self.snapshot.ambiguity() is None
+        screenshot = result["screenshot"]
+        if (self.pipeline and decision.get('action') not in CHEAP_ACTIONS and not dom_readable
+                and not self.screens.would_reuse(screenshot)):
+            return screenshot, asyncio.create_task(self._vision_task(screenshot))
+        return None
+
     async def reason_next_action(
         self,
         task: str,
@@ -137,8 +331,14 @@ Sé específico y técnico."""
         """
         Usa modelo de razonamiento para decidir la próxima acción
         DeepSeek R1 tiene capacidades de chain-of-thought automático
+
+        La respuesta se parsea mientras llega: apenas están completos action,
+        confidence y los campos que necesita esa acción (DECISION_FIELDS) se
+        devuelve la decisión y se corta la generación (con reasoning_tail el
+        razonamiento se sigue leyendo en background y se loguea al terminar).
         """
         self.log("🧠 Razonando próxima acción...")
+        await self.finish_reasoning_log()
 
         system_prompt = f"""Sos un agente web experto. Tu tarea: {task}
 
@@ -149,7 +349,7 @@ DESCRIPCIÓN DE LA PANTALLA:
 {screen_description}
 
 ACCIONES DISPONIBLES:
-- click: Hacer click en elemento (requiere selector CSS o coordenadas)
+- click: Hacer click en elemento (número de elemento, selector CSS o coordenadas)
 - type: Escribir texto
 - press: Presionar tecla (Enter, Tab, etc)
 - scroll: Hacer scroll
@@ -161,48 +361,70 @@ IMPORTANTE:
 2. Si ves un botón de "Sign in with Google", hacer click ahí
 3. Si ves un formulario, primero identificar los campos
 4. Ser específico con selectores CSS cuando sea posible
+5. Escribí primero los campos de la acción y al final "reasoning"
+6. Según la acción incluí "value" (type), "key" (press), "direction" y "amount" (scroll) o "seconds" (wait)
+7. Si la pantalla lista elementos numerados [n], indicá "element": n (para click, o para type
+   si hay que escribir en ese campo); es más confiable que selectores o coordenadas
 
 Respondé en JSON con este formato:
 {{
-  "reasoning": "Mi razonamiento detallado...",
   "action": "click",
+  "element": 3,
   "target": "button.sign-in-google",
   "target_description": "Botón de Google OAuth en el centro superior",
   "coordinates": {{"x": 640, "y": 200}},
+  "confidence": 0.9,
   "fallback": "Si no funciona el selector, usar coordenadas",
-  "confidence": 0.9
+  "reasoning": "Mi razonamiento detallado..."
 }}
 
 RAZONA Y DECIDE:"""
 
+        stream = None
         try:
-            response = await self.client.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": self.reasoning_model,
-                    "prompt": system_prompt,
-                    "stream": False,
-                    "format": "json",
-                    "options": {
-                        "temperature": 0.3,  # Más determinístico
-                        "top_p": 0.9
-                    }
+            stream = self.ollama.stream_generate(
+                self.reasoning_model,
+                system_prompt,
+                format="json",
+                options={
+                    "temperature": 0.3,  # Más determinístico
+                    "top_p": 0.9
                 }
             )
 
-            result = response.json()
-            decision = json.loads(result['response'])
+            parser = IncrementalJSONObject()
+            decision = None
+            async for text in stream:
+                fields = parser.feed(text)
+                if self.decision_ready(fields):
+                    decision = dict(fields)
+                    break
+
+            early = decision is not None
+            if not early:
+                decision = json.loads(parser.buffer)
 
             # Guardar razonamiento
-            self.reasoning_log.append({
+            entry = {
                 "step": len(self.action_history) + 1,
                 "reasoning": decision.get('reasoning', ''),
                 "decision": decision.get('action', ''),
-                "confidence": decision.get('confidence', 0.5)
-            })
+                "confidence": decision.get('confidence', 0.5),
+                "reasoning_complete": not early
+            }
+            self.reasoning_log.append(entry)
 
-            self.log(f"💭 Razonamiento: {decision.get('reasoning', '')[:150]}...")
             self.log(f"🎯 Acción: {decision.get('action')} - Confianza: {decision.get('confidence', 0):.0%}")
+            if early:
+                self.latency.count("reason_early_exit")
+                if self.reasoning_tail:
+                    self._reasoning_stream = stream
+                    self._reasoning_task = asyncio.create_task(
+                        self._log_reasoning_tail(stream, parser, entry))
+                else:
+                    await self._log_reasoning_tail(stream, parser, entry)
+            else:
+                self.log(f"💭 Razonamiento: {entry['reasoning'][:150]}...")
 
             return decision
 
@@ -213,16 +435,77 @@ RAZONA Y DECIDE:"""
                 "reasoning": f"Error: {e}",
                 "confidence": 0
             }
+        finally:
+            # Error de parseo o cancelación incluidos: se libera la conexión
+            # (salvo que el stream haya quedado en manos de _log_reasoning_tail)
+            if stream is not None and stream is not self._reasoning_stream:
+                await stream.aclose()
+
+    @staticmethod
+    def decision_ready(fields: Dict) -> bool:
+        """True si la decisión parcial ya alcanza para ejecutar la acción"""
+        action = fields.get('action')
+        if action not in DECISION_FIELDS or 'confidence' not in fields:
+            return False
+        if action == 'click' and 'element' in fields:
+            return True
+        return all(name in fields for name in DECISION_FIELDS[action])
+
+    async def _log_reasoning_tail(self, stream, parser: IncrementalJSONObject, entry: Dict):
+        """Lee el resto de la respuesta en background y loguea el razonamiento"""
+        complete = False
+        try:
+            if self.reasoning_tail:
+                async for text in stream:
+                    parser.feed(text)
+                complete = True
+        finally:
+            await stream.aclose()  # Si no terminó, corta la generación en Ollama
+            reasoning = parser.fields.get('reasoning')
+            if reasoning is None:
+                # Razonamiento a medio generar: lo que haya llegado del string
+                _, _, partial = parser.buffer.partition('"reasoning"')
+                reasoning = partial.lstrip(' :"')
+            entry["reasoning"] = reasoning
+            entry["reasoning_complete"] = complete
+            if reasoning:
+                suffix = "" if complete else " (cortado)"
+                self.log(f"💭 Razonamiento paso {entry['step']}{suffix}: {reasoning[:150]}...")
+
+    async def finish_reasoning_log(self):
+        """Corta la lectura del razonamiento del paso anterior si sigue en curso"""
+        task, self._reasoning_task = self._reasoning_task, None
+        stream, self._reasoning_stream = self._reasoning_stream, None
+        if task is None:
+            return
+        if not task.done():
+            task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # Si la tarea se canceló antes de arrancar el stream sigue abierto
+        await stream.aclose()
 
     async def execute_action(self, page, decision: Dict):
         """Ejecuta la acción decidida"""
         action = decision.get('action', 'wait')
         target = decision.get('target', '')
         coords = decision.get('coordinates', {})
+        element = None
+        if self.snapshot is not None and decision.get('element') is not None:
+            element = self.snapshot.element(decision['element'])
 
         try:
             if action == 'click':
-                # Intentar selector CSS primero
+                # Elemento del snapshot del DOM (selector determinístico)
+                if element:
+                    self.log(f"🖱️  Click en [{decision['element']}] {element['role']} \"{element['name'] or element['selector']}\"")
+                    method = await click_element(page, element)
+                    self.log(f"✅ Click por {method}")
+                    return True
+
+                # Intentar selector CSS
                 if target and not coords:
                     self.log(f"🖱️  Click en selector: {target}")
                     try:
@@ -254,6 +537,8 @@ RAZONA Y DECIDE:"""
 
             elif action == 'type':
                 value = decision.get('value', '')
+                if element:
+                    await click_element(page, element)
                 self.log(f"⌨️  Escribiendo: {value}")
                 await page.keyboard.type(value, delay=100)
                 return True
@@ -292,6 +577,50 @@ RAZONA Y DECIDE:"""
             self.log(f"❌ Error ejecutando: {e}", "ERROR")
             return False
 
+    async def replay_trace(self, page, trace: Dict) -> bool:
+        """
+        Reproduce un trace grabado. Antes de cada paso se espera a que la
+        página coincida con lo grabado; si un paso no verifica o falla se
+        devuelve False y el loop sigue razonando con los modelos desde ahí.
+        True si el trace llegó a 'done'.
+        """
+        steps = trace["steps"]
+        self.log(f"🎞️  Reproduciendo trace grabado ({len(steps)} pasos, {trace['recorded']})")
+        for i, recorded in enumerate(steps, 1):
+            # Las esperas grabadas las reemplaza la verificación del paso siguiente
+            if recorded["decision"]["action"] == 'wait':
+                continue
+
+            with self.latency.timed("replay_verify"):
+                verified = await wait_for_step(page, recorded)
+            if verified is None:
+                self.latency.count("replay_fallback")
+                self.log(f"⚠️  Paso {i}/{len(steps)} del trace no coincide con la página, vuelvo a razonar", "WARN")
+                return False
+            self.snapshot, decision = verified
+
+            self.log(f"🎞️  Paso {i}/{len(steps)} del trace: {decision['action']}")
+            with self.latency.timed("execute"):
+                success = await self.execute_action(page, decision)
+            self.action_history.append({**decision, "success": success,
+                                        "step": len(self.action_history) + 1, "replayed": True})
+            if not success:
+                self.latency.count("replay_fallback")
+                self.log(f"⚠️  Paso {i}/{len(steps)} del trace falló, vuelvo a razonar", "WARN")
+                return False
+
+            self.trace_steps.append(record_step(decision, self.snapshot))
+            self.replayed_steps += 1
+            if decision['action'] == 'done':
+                return True
+
+            # Como en el loop normal: el paso siguiente se verifica sobre la página estable
+            with self.latency.timed("settle"):
+                result = await self.settler.settle(page, label=decision['action'])
+            if result["reason"] != "estable":
+                self.latency.count("settle_timeout")
+        return False
+
     async def run_task(
         self,
         task: str,
@@ -327,58 +656,98 @@ RAZONA Y DECIDE:"""
             page = await context.new_page()
 
             self.log(f"🔗 Navegando a {url}...")
-            await page.goto(url, wait_until='networkidle')
-            await asyncio.sleep(3)
-
-            for step in range(max_steps):
+            await page.goto(url, wait_until='domcontentloaded')
+            result = await self.settler.settle(page, NAVIGATION_SETTLE_TIMEOUT, label="navegación")
+            self.log(f"⏳ Página estable en {result['seconds']:.2f}s ({result['reason']})")
+
+            # Trace grabado para esta tarea y esta pantalla inicial
+            completed = False
+            initial_snapshot = None
+            if self.traces is not None:
+                initial_snapshot = await DomSnapshot.capture(page)
+                trace = self.traces.load(task, url, initial_snapshot)
+                if trace is not None:
+                    completed = await self.replay_trace(page, trace)
+
+            previous = None  # descripción y acción del paso anterior
+            prefetch = None
+            # Si el trace llegó a 'done' no queda nada por razonar
+            first_step = max_steps if completed else len(self.action_history)
+            for step in range(first_step, max_steps):
+                step_start = time.perf_counter()
                 self.log(f"\n{'='*60}")
                 self.log(f"PASO {step + 1}/{max_steps}")
                 self.log(f"{'='*60}")
 
                 # 1. Screenshot
-                screenshot = await page.screenshot(full_page=False)
-                screenshot_base64 = base64.b64encode(screenshot).decode()
+                with self.latency.timed("screenshot"):
+                    screenshot = await page.screenshot(full_page=False)
 
-                # 2. Analizar con visión
-                screen_description = await self.analyze_screenshot_with_vision(
-                    screenshot_base64
-                )
+                # 2. Snapshot del DOM (una sola llamada a evaluate)
+                if self.dom_first:
+                    with self.latency.timed("dom"):
+                        self.snapshot = await DomSnapshot.capture(page)
 
-                # 3. Razonar próxima acción
+                # 3. Describir la pantalla (DOM, visión, prefetch o reutilizada)
+                screen_description, vision = await self.describe_screen(screenshot, previous, prefetch)
+                prefetch = None
+
+                # 4. Razonar próxima acción
                 context_str = "\n".join([
                     f"Paso {i+1}: {a['action']} ({a.get('reasoning', '')[:50]}...)"
                     for i, a in enumerate(self.action_history[-3:])
                 ])
 
-                decision = await self.reason_next_action(
-                    task,
-                    screen_description,
-                    context_str or "Primer paso"
-                )
+                with self.latency.timed("reason"):
+                    decision = await self.reason_next_action(
+                        task,
+                        screen_description,
+                        context_str or "Primer paso"
+                    )
 
-                # 4. Ejecutar acción
-                success = await self.execute_action(page, decision)
+                # 5. Ejecutar acción
+                with self.latency.timed("execute"):
+                    success = await self.execute_action(page, decision)
 
-                # 5. Guardar en historial
+                # 6. Guardar en historial
                 self.action_history.append({
                     **decision,
                     "success": success,
                     "step": step + 1
                 })
-
-                # 6. Esperar estabilización
-                await asyncio.sleep(2)
+                previous = {"vision": vision,
+                            "action": decision.get('action') if success else None}
+                if success and self.traces is not None:
+                    self.trace_steps.append(record_step(decision, self.snapshot))
 
                 # 7. Check si terminó
                 if decision.get('action') == 'done':
+                    self.latency.add("step", time.perf_counter() - step_start)
                     self.log("\n✅ TAREA COMPLETADA")
+                    completed = True
                     break
 
                 # 8. Check si confianza muy baja
                 if decision.get('confidence', 1) < 0.3:
+                    self.latency.add("step", time.perf_counter() - step_start)
                     self.log("⚠️  Confianza muy baja, deteniendo", "WARN")
                     break
 
+                # 9. Esperar que la página se estabilice (y lanzar la visión del próximo paso)
+                if step + 1 < max_steps:
+                    prefetch = await self.settle(page, decision)
+                self.latency.add("step", time.perf_counter() - step_start)
+
+            if prefetch is not None:
+                prefetch[1].cancel()
+
+            if completed and initial_snapshot is not None:
+                try:
+                    trace_path = self.traces.save(task, url, initial_snapshot, self.trace_steps)
+                    self.log(f"🎞️  Trace guardado: {trace_path}")
+                except OSError as e:
+                    self.log(f"⚠️  No se pudo guardar el trace: {e}", "WARN")
+
             # Guardar cookies si se solicitó
             if save_cookies:
                 cookies = await context.cookies()
@@ -392,6 +761,8 @@ RAZONA Y DECIDE:"""
 
             await browser.close()
 
+        await self.finish_reasoning_log()
+
         # Resumen final
         self.log("\n" + "="*60)
         self.log("📊 RESUMEN DE EJECUCIÓN")
@@ -404,6 +775,23 @@ RAZONA Y DECIDE:"""
         self.log(f"\n💭 Total razonamientos: {len(self.reasoning_log)}")
         self.log(f"✅ Acciones exitosas: {sum(1 for a in self.action_history if a.get('success'))}/{len(self.action_history)}")
 
+        self.log(f"🖼️  {self.screens.summary()}")
+        if self.replayed_steps:
+            self.log(f"🎞️  Pasos reproducidos del trace: {self.replayed_steps}/{len(self.action_history)}")
+
+        self.log("\n⏳ Estabilización de página por paso:")
+        for line in self.settler.summary():
+            self.log(f"  {line}")
+
+        self.log("\n⏱️  Latencias por etapa:")
+        for line in self.latency.report():
+            self.log(f"  {line}")
+
+        self.log("\n🦙 Ollama:")
+        for line in self.ollama.metrics_summary():
+            self.log(f"  {line}")
+        await self.ollama.close()
+
 async def main():
     parser = argparse.ArgumentParser(
         description='Agente Web con Razonamiento (DeepSeek R1 / Kimi)'
@@ -420,6 +808,25 @@ async def main():
     parser.add_argument('--ollama-url', default='http://localhost:11434',
                        help='URL de Ollama')
     parser.add_argument('--quiet', action='store_true', help='Menos verbose')
+    parser.add_argument('--no-dom', action='store_true',
+                       help='No usar el snapshot del DOM (siempre modelo de visión)')
+    parser.add_argument('--no-trace', action='store_true',
+                       help='No reproducir ni grabar traces de la tarea')
+    parser.add_argument('--reasoning-tail', action='store_true',
+                       help='Después de la decisión seguir leyendo el razonamiento en background '
+                            'para loguearlo (el modelo sigue generando durante la acción)')
+    parser.add_argument('--keep-alive', default=DEFAULT_KEEP_ALIVE,
+                       help=f'keep_alive de los modelos en Ollama (default: {DEFAULT_KEEP_ALIVE}, -1 = fijos)')
+    parser.add_argument('--settle', type=float, default=SETTLE_TIMEOUT,
+                       help='Máximo de segundos esperando que la página se estabilice '
+                            f'después de cada acción (default: {SETTLE_TIMEOUT})')
+    parser.add_argument('--settle-quiet', type=int, default=DOM_QUIET_MS,
+                       help=f'Milisegundos sin cambios en el DOM para considerarlo estable (default: {DOM_QUIET_MS})')
+    parser.add_argument('--no-pipeline', action='store_true',
+                       help='No lanzar la visión del próximo paso apenas la página queda estable')
+    parser.add_argument('--screen-threshold', type=float, default=SCREEN_DIFF_THRESHOLD,
+                       help='Fracción de píxeles distintos para considerar que la pantalla '
+                            f'cambió (default: {SCREEN_DIFF_THRESHOLD})')
 
     args = parser.parse_args()
 
@@ -428,7 +835,15 @@ async def main():
         reasoning_model=args.reasoning_model,
         vision_model=args.vision_model,
         headless=args.headless,
-        verbose=not args.quiet
+        verbose=not args.quiet,
+        settle_time=args.settle,
+        settle_quiet_ms=args.settle_quiet,
+        pipeline=not args.no_pipeline,
+        screen_threshold=args.screen_threshold,
+        keep_alive=args.keep_alive,
+        reasoning_tail=args.reasoning_tail,
+        dom_first=not args.no_dom,
+        use_traces=not args.no_trace
     )
 
     await agent.run_task(
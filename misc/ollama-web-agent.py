@@ -15,29 +15,48 @@ import argparse
 import base64
 from pathlib import Path
 from playwright.async_api import async_playwright
-import httpx
 from typing import Dict, List, Optional
 
+from dom_snapshot import DomSnapshot, click_element
+from ollama_client import DEFAULT_KEEP_ALIVE, ModelPolicy, OllamaClient
+from page_settle import DOM_QUIET_MS, NAVIGATION_SETTLE_TIMEOUT, SETTLE_TIMEOUT, PageSettler
+from screen_change import SCREEN_DIFF_THRESHOLD, ScreenChangeDetector
+
 class OllamaWebAgent:
     def __init__(
         self,
         ollama_url: str = "http://localhost:11434",
         model: str = "qwen2-vl:7b",
-        headless: bool = False
+        headless: bool = False,
+        screen_threshold: float = SCREEN_DIFF_THRESHOLD,
+        keep_alive=DEFAULT_KEEP_ALIVE,
+        dom_first: bool = True,
+        settle_time: float = SETTLE_TIMEOUT,
+        settle_quiet_ms: int = DOM_QUIET_MS
     ):
         self.ollama_url = ollama_url
         self.model = model
         self.headless = headless
-        self.client = httpx.AsyncClient(timeout=120.0)
+        self.ollama = OllamaClient(ollama_url, timeout=120.0,
+                                   default_policy=ModelPolicy(keep_alive))
         self.action_history = []
+        # El modelo ve la imagen y decide en la misma llamada, así que no se
+        # reutilizan análisis: sólo se detecta si la pantalla no cambió
+        # después de un 'wait' (para decírselo al modelo)
+        self.screens = ScreenChangeDetector(screen_threshold)
+        # Después de cada acción se espera (como mucho settle_time) a que la
+        # página se estabilice en vez de dormir un tiempo fijo
+        self.settler = PageSettler(settle_time, settle_quiet_ms, self.screens)
+        # DOM primero: si el snapshot del DOM alcanza, el modelo decide sólo
+        # con texto (sin imagen); si es ambiguo se manda también el screenshot
+        self.dom_first = dom_first
+        self.snapshot: Optional[DomSnapshot] = None
+        self.text_only_steps = 0
 
     async def check_ollama(self):
         """Verifica que Ollama esté corriendo y el modelo disponible"""
         try:
-            response = await self.client.get(f"{self.ollama_url}/api/tags")
-            models = response.json()
-
-            available_models = [m['name'] for m in models['models']]
+            available_models = await self.ollama.tags()
             print(f"📦 Modelos disponibles: {available_models}")
 
             if not any(self.model in m for m in available_models):
@@ -47,6 +66,8 @@ class OllamaWebAgent:
             else:
                 print(f"✅ Modelo {self.model} listo")
 
+            await self.ollama.ensure_resident([self.model])
+
         except Exception as e:
             print(f"❌ Error conectando a Ollama: {e}")
             print(f"💡 ¿Está corriendo Ollama en {self.ollama_url}?")
@@ -56,30 +77,29 @@ class OllamaWebAgent:
     async def pull_model(self):
         """Descarga el modelo si no está disponible"""
         print(f"⬇️  Descargando {self.model}...")
-        async with self.client.stream(
-            'POST',
-            f"{self.ollama_url}/api/pull",
-            json={"name": self.model}
-        ) as response:
-            async for line in response.aiter_lines():
-                if line:
-                    data = json.loads(line)
-                    if 'status' in data:
-                        print(f"   {data['status']}", end='\r')
+
+        def show(data: Dict):
+            if 'status' in data:
+                print(f"   {data['status']}", end='\r')
+
+        await self.ollama.pull(self.model, show)
         print("\n✅ Modelo descargado")
 
     async def analyze_screenshot(
         self,
-        screenshot_base64: str,
+        screenshot_base64: Optional[str],
         task: str,
-        context: Optional[str] = None
+        context: Optional[str] = None,
+        page_elements: Optional[str] = None
     ) -> Dict:
         """
-        Analiza un screenshot y decide qué acción tomar
+        Analiza un screenshot y/o los elementos del DOM y decide qué acción tomar
+        (sin screenshot la llamada es sólo texto)
 
         Returns:
             {
                 "action": "click" | "type" | "scroll" | "wait" | "done",
+                "element": índice del elemento del DOM (opcional),
                 "target": "selector CSS o descripción",
                 "value": "valor a escribir (si action=type)",
                 "coordinates": {"x": 100, "y": 200},
@@ -87,6 +107,18 @@ class OllamaWebAgent:
             }
         """
 
+        if screenshot_base64:
+            source = "Analizá la imagen de la página web"
+        else:
+            source = "Analizá la lista de elementos interactivos de la página"
+        elements_section = ""
+        if page_elements:
+            elements_section = f"""
+ELEMENTOS INTERACTIVOS (del DOM):
+{page_elements}
+- Para click o type sobre uno de estos elementos indicá "element": n
+"""
+
         system_prompt = f"""Sos un agente web autónomo. Tu tarea es: {task}
 
 ACCIONES DISPONIBLES:
@@ -97,18 +129,20 @@ ACCIONES DISPONIBLES:
 5. done - Tarea completada
 
 REGLAS:
-- Analizá la imagen de la página web
+- {source}
 - Decidí UNA acción específica
 - Si ves un botón de Google OAuth, usá click
 - Si ves un formulario, usá type
 - Respondé en formato JSON estricto
 
+{elements_section}
 CONTEXTO PREVIO:
 {context or "Primera acción"}
 
 FORMATO DE RESPUESTA:
 {{
   "action": "click",
+  "element": 3,
   "target": "button con texto 'Sign in with Google'",
   "coordinates": {{"x": 500, "y": 300}},
   "reasoning": "Necesito hacer login con Google OAuth"
@@ -116,19 +150,14 @@ FORMATO DE RESPUESTA:
 """
 
         try:
-            response = await self.client.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": system_prompt,
-                    "images": [screenshot_base64],
-                    "stream": False,
-                    "format": "json"
-                }
+            response = await self.ollama.generate(
+                self.model,
+                system_prompt,
+                images=[screenshot_base64] if screenshot_base64 else None,
+                format="json"
             )
 
-            result = response.json()
-            decision = json.loads(result['response'])
+            decision = json.loads(response)
 
             print(f"🤖 Decisión: {decision['action']}")
             print(f"💭 Razonamiento: {decision.get('reasoning', 'N/A')}")
@@ -145,10 +174,18 @@ FORMATO DE RESPUESTA:
         target = decision.get('target', '')
         value = decision.get('value', '')
         coords = decision.get('coordinates', {})
+        element = None
+        if self.snapshot is not None and decision.get('element') is not None:
+            element = self.snapshot.element(decision['element'])
 
         try:
             if action == 'click':
-                if coords and 'x' in coords and 'y' in coords:
+                if element:
+                    # Elemento del snapshot del DOM (selector determinístico)
+                    print(f"🖱️  Click en [{decision['element']}] {element['role']} \"{element['name'] or element['selector']}\"")
+                    method = await click_element(page, element)
+                    print(f"✅ Click por {method}")
+                elif coords and 'x' in coords and 'y' in coords:
                     # Click por coordenadas
                     print(f"🖱️  Click en ({coords['x']}, {coords['y']})")
                     await page.mouse.click(coords['x'], coords['y'])
@@ -191,6 +228,8 @@ FORMATO DE RESPUESTA:
                     print(f"⚠️  No se pudo encontrar: {target}")
 
             elif action == 'type':
+                if element:
+                    await click_element(page, element)
                 print(f"⌨️  Escribiendo: {value}")
                 await page.keyboard.type(value)
 
@@ -246,7 +285,9 @@ FORMATO DE RESPUESTA:
             page = await context.new_page()
 
             print(f"🔗 Navegando a {url}...")
-            await page.goto(url, wait_until='networkidle')
+            await page.goto(url, wait_until='domcontentloaded')
+            result = await self.settler.settle(page, NAVIGATION_SETTLE_TIMEOUT, label="navegación")
+            print(f"⏳ Página estable en {result['seconds']:.2f}s ({result['reason']})")
 
             for step in range(max_steps):
                 print(f"\n--- Paso {step + 1}/{max_steps} ---")
@@ -261,11 +302,36 @@ FORMATO DE RESPUESTA:
                     for i, a in enumerate(self.action_history[-3:])
                 ])
 
+                # Snapshot del DOM: si alcanza, la decisión se toma sin imagen
+                page_elements = None
+                use_image = True
+                if self.dom_first:
+                    self.snapshot = await DomSnapshot.capture(page)
+                    reason = self.snapshot.ambiguity() if self.snapshot else "snapshot no disponible"
+                    if self.snapshot is not None and self.snapshot.elements:
+                        page_elements = self.snapshot.format()
+                    if reason is None:
+                        use_image = False
+                        print(f"🌳 DOM: {len(self.snapshot.elements)} elementos interactivos, sin imagen")
+                    else:
+                        print(f"🌳 DOM ambiguo ({reason}), usando visión")
+
+                # Después de un wait con la pantalla igual no se reutiliza la
+                # decisión anterior (sería otro wait): se le avisa al modelo
+                if self.action_history and self.action_history[-1].get('action') == 'wait':
+                    if self.screens.lookup(screenshot) is not None:
+                        print("🖼️  Pantalla sin cambios después de esperar")
+                        context_str += "\nLa pantalla no cambió después del último wait."
+
+                if not use_image:
+                    self.text_only_steps += 1
                 decision = await self.analyze_screenshot(
-                    screenshot_base64,
+                    screenshot_base64 if use_image else None,
                     task,
-                    context_str
+                    context_str,
+                    page_elements
                 )
+                self.screens.store(screenshot, decision)
 
                 # Guardar en historial
                 self.action_history.append(decision)
@@ -273,14 +339,15 @@ FORMATO DE RESPUESTA:
                 # Ejecutar acción
                 await self.execute_action(page, decision)
 
-                # Esperar a que la página se estabilice
-                await asyncio.sleep(2)
-
                 # Si terminó, salir
                 if decision.get('action') == 'done':
                     print("\n✅ Tarea completada!")
                     break
 
+                # Esperar a que la página se estabilice
+                result = await self.settler.settle(page, label=decision.get('action', ''))
+                print(f"⏳ Página estable en {result['seconds']:.2f}s ({result['reason']})")
+
             # Guardar cookies si se solicitó
             if save_cookies:
                 cookies = await context.cookies()
@@ -298,6 +365,15 @@ FORMATO DE RESPUESTA:
         print("\n📊 Resumen de acciones:")
         for i, action in enumerate(self.action_history, 1):
             print(f"{i}. {action['action']} - {action.get('reasoning', 'N/A')}")
+        print(f"🖼️  Pantallas sin cambios después de un wait: {self.screens.hits}/"
+              f"{self.screens.hits + self.screens.misses}")
+        if self.dom_first:
+            print(f"🌳 Pasos decididos sólo con el DOM (sin imagen): {self.text_only_steps}")
+        for line in self.settler.summary():
+            print(f"⏳ {line}")
+        for line in self.ollama.metrics_summary():
+            print(f"🦙 {line}")
+        await self.ollama.close()
 
 async def main():
     parser = argparse.ArgumentParser(
@@ -338,13 +414,46 @@ async def main():
         default='http://localhost:11434',
         help='URL de Ollama'
     )
+    parser.add_argument(
+        '--settle',
+        type=float,
+        default=SETTLE_TIMEOUT,
+        help=f'Máximo de segundos esperando que la página se estabilice después de cada acción (default: {SETTLE_TIMEOUT})'
+    )
+    parser.add_argument(
+        '--settle-quiet',
+        type=int,
+        default=DOM_QUIET_MS,
+        help=f'Milisegundos sin cambios en el DOM para considerarlo estable (default: {DOM_QUIET_MS})'
+    )
+    parser.add_argument(
+        '--no-dom',
+        action='store_true',
+        help='No usar el snapshot del DOM (siempre manda el screenshot)'
+    )
+    parser.add_argument(
+        '--keep-alive',
+        default=DEFAULT_KEEP_ALIVE,
+        help=f'keep_alive del modelo en Ollama (default: {DEFAULT_KEEP_ALIVE}, -1 = fijo)'
+    )
+    parser.add_argument(
+        '--screen-threshold',
+        type=float,
+        default=SCREEN_DIFF_THRESHOLD,
+        help=f'Fracción de píxeles distintos para considerar que la pantalla cambió (default: {SCREEN_DIFF_THRESHOLD})'
+    )
 
     args = parser.parse_args()
 
     agent = OllamaWebAgent(
         ollama_url=args.ollama_url,
         model=args.model,
-        headless=args.headless
+        headless=args.headless,
+        screen_threshold=args.screen_threshold,
+        keep_alive=args.keep_alive,
+        dom_first=not args.no_dom,
+        settle_time=args.settle,
+        settle_quiet_ms=args.settle_quiet
     )
 
     await agent.run_task(
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Cliente Ollama compartido por los agentes web
+- Un httpx.AsyncClient por cliente con pool de conexiones keep-alive
+- keep_alive y política de residencia explícitos por modelo, para que el
+  modelo de razonamiento y el de visión no se desalojen entre sí
+- Streaming de tokens (las decisiones JSON se pueden parsear antes de que
+  termine la generación)
+- Métricas por llamada: latencia, tiempo al primer token, carga del modelo
+  y tokens/s
+
+Uso:
+  python3 ollama_client.py [--ollama-url URL] ps
+  python3 ollama_client.py [--ollama-url URL] generate <modelo> <prompt>
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+
+# keep_alive por defecto: "30m" mantiene el modelo cargado entre pasos;
+# -1 lo fija en memoria, 0 lo descarga apenas responde
+DEFAULT_KEEP_ALIVE = "30m"
+
+# Conexiones por cliente (visión en paralelo con razonamiento + pull/ps)
+MAX_CONNECTIONS = 8
+
+
+class ModelPolicy:
+    """
+    Residencia de un modelo en la GPU:
+    - keep_alive: se manda en cada request ("30m", -1, 0, ...)
+    - preload: cargarlo al inicio (request vacío) para no pagar la carga en el primer paso
+    - options: opciones por defecto del modelo (num_ctx, temperature, ...)
+    """
+
+    def __init__(self, keep_alive=DEFAULT_KEEP_ALIVE, preload: bool = True,
+                 options: Optional[Dict] = None):
+        # Ollama interpreta números como segundos; "-1" de la CLI tiene que ir como número
+        if isinstance(keep_alive, str) and keep_alive.lstrip("-").isdigit():
+            keep_alive = int(keep_alive)
+        self.keep_alive = keep_alive
+        self.preload = preload
+        self.options = options or {}
+
+
+class IncrementalJSONObject:
+    """
+    Parser incremental de un objeto JSON que llega en fragmentos.
+
+    fields tiene cada clave de primer nivel cuyo valor ya está completo
+    (string cerrado, objeto/array balanceado, número seguido de , o }),
+    así se puede actuar antes de que el modelo termine de generar.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields: Dict = {}
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        self._value_start: Optional[int] = None
+        self._expect_key = True
+
+    def feed(self, text: str) -> Dict:
+        self.buffer += text
+        buf = self.buffer
+        while self._pos < len(buf):
+            i = self._pos
+            ch = buf[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key_start is not None:
+                        self._key = self._loads(buf[self._key_start:i + 1])
+                        self._key_start = None
+                    elif self._depth == 1 and self._value_start is not None:
+                        self._complete(buf[self._value_start:i + 1])
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._key_start = i
+                    self._expect_key = False
+                elif self._depth == 1 and self._key is not None and self._value_start is None:
+                    self._value_start = i
+            elif ch in '{[':
+                if self._depth == 1 and self._key is not None and self._value_start is None:
+                    self._value_start = i
+                self._depth += 1
+            elif ch in '}]':
+                if self._depth == 1 and self._value_start is not None:
+                    self._complete(buf[self._value_start:i])  # número/literal antes de }
+                self._depth -= 1
+                if self._depth == 1 and self._value_start is not None:
+                    self._complete(buf[self._value_start:i + 1])
+            elif self._depth == 1:
+                if ch == ',':
+                    if self._value_start is not None:
+                        self._complete(buf[self._value_start:i])
+                    self._expect_key = True
+                elif ch not in ' \t\r\n:' and self._key is not None and self._value_start is None:
+                    self._value_start = i  # número, true, false o null
+        return self.fields
+
+    def _complete(self, raw: str):
+        value = self._loads(raw.strip())
+        if value is not _INVALID and self._key is not None:
+            self.fields[self._key] = value
+        self._key = None
+        self._value_start = None
+
+    @staticmethod
+    def _loads(raw: str):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return _INVALID
+
+    def has(self, *keys: str) -> bool:
+        return all(key in self.fields for key in keys)
+
+
+_INVALID = object()
+
+
+class OllamaClient:
+    def __init__(self, base_url: str = DEFAULT_OLLAMA_URL, timeout: float = 180.0,
+                 policies: Optional[Dict[str, ModelPolicy]] = None,
+                 default_policy: Optional[ModelPolicy] = None,
+                 max_connections: int = MAX_CONNECTIONS):
+        self.base_url = base_url.rstrip("/")
+        self.policies = dict(policies or {})
+        self.default_policy = default_policy or ModelPolicy()
+        self.http = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+        )
+        self.calls: List[Dict] = []
+
+    def policy(self, model: str) -> ModelPolicy:
+        return self.policies.get(model, self.default_policy)
+
+    def set_policy(self, model: str, policy: ModelPolicy):
+        self.policies[model] = policy
+
+    async def close(self):
+        await self.http.aclose()
+
+    # ------------------------------------------------------------------
+    # Modelos
+
+    async def tags(self) -> List[str]:
+        """Modelos descargados"""
+        response = await self.http.get("/api/tags")
+        response.raise_for_status()
+        return [m['name'] for m in response.json().get('models', [])]
+
+    async def loaded(self) -> List[Dict]:
+        """Modelos cargados en memoria (/api/ps)"""
+        response = await self.http.get("/api/ps")
+        response.raise_for_status()
+        return response.json().get('models', [])
+
+    async def pull(self, model: str, on_status: Optional[Callable[[Dict], None]] = None):
+        """Descarga un modelo (on_status recibe cada línea de progreso)"""
+        async with self.http.stream('POST', "/api/pull", json={"name": model},
+                                    timeout=None) as response:
+            async for line in response.aiter_lines():
+                if line and on_status:
+                    on_status(json.loads(line))
+
+    async def preload(self, model: str):
+        """Carga el modelo con su keep_alive sin generar nada"""
+        start = time.perf_counter()
+        response = await self.http.post("/api/generate", json={
+            "model": model, "keep_alive": self.policy(model).keep_alive})
+        response.raise_for_status()
+        data = response.json()
+        self._record(model, start, None, data, preload=True)
+
+    async def unload(self, model: str):
+        """Descarga el modelo de la GPU (keep_alive 0)"""
+        response = await self.http.post("/api/generate", json={"model": model, "keep_alive": 0})
+        response.raise_for_status()
+
+    async def ensure_resident(self, models: List[str]):
+        """Precarga en paralelo los modelos cuya política lo pide"""
+        await asyncio.gather(*(self.preload(m) for m in models if self.policy(m).preload))
+
+    # ------------------------------------------------------------------
+    # Generación
+
+    def _payload(self, model: str, prompt: str, images: Optional[List[str]],
+                 format: Optional[str], options: Optional[Dict], stream: bool) -> Dict:
+        policy = self.policy(model)
+        payload = {"model": model, "prompt": prompt, "stream": stream,
+                   "keep_alive": policy.keep_alive}
+        if images:
+            payload["images"] = images
+        if format:
+            payload["format"] = format
+        merged = {**policy.options, **(options or {})}
+        if merged:
+            payload["options"] = merged
+        return payload
+
+    async def stream_generate(self, model: str, prompt: str, images: Optional[List[str]] = None,
+                              format: Optional[str] = None,
+                              options: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        Genera con stream: true y va entregando los fragmentos de texto.
+        Para cortar antes de tiempo usar `async with aclosing(...)`: al cerrar
+        el generador se cierra la conexión (Ollama deja de generar) y la
+        llamada queda registrada como 'aborted'.
+        """
+        start = time.perf_counter()
+        first_token = None
+        final: Dict = {}
+        payload = self._payload(model, prompt, images, format, options, stream=True)
+        try:
+            async with self.http.stream('POST', "/api/generate", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise RuntimeError(chunk['error'])
+                    text = chunk.get('response', '')
+                    if text:
+                        if first_token is None:
+                            first_token = time.perf_counter()
+                        yield text
+                    if chunk.get('done'):
+                        final = chunk
+        finally:
+            self._record(model, start, first_token, final, aborted=not final)
+
+    async def generate(self, model: str, prompt: str, images: Optional[List[str]] = None,
+                       format: Optional[str] = None, options: Optional[Dict] = None,
+                       until: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Texto de la respuesta (generado en streaming). Si until(texto) da
+        True se deja de generar y se devuelve lo que haya hasta ahí.
+        """
+        parts = []
+        async with aclosing(self.stream_generate(model, prompt, images, format, options)) as stream:
+            async for text in stream:
+                parts.append(text)
+                if until is not None and until(text):
+                    break
+        return "".join(parts)
+
+    # ------------------------------------------------------------------
+    # Métricas
+
+    def _record(self, model: str, start: float, first_token: Optional[float], final: Dict,
+                aborted: bool = False, preload: bool = False):
+        eval_count = final.get('eval_count', 0)
+        eval_seconds = final.get('eval_duration', 0) / 1e9
+        self.calls.append({
+            "model": model,
+            "latency": time.perf_counter() - start,
+            "ttft": (first_token - start) if first_token else None,
+            "load": final.get('load_duration', 0) / 1e9,
+            "prompt_tokens": final.get('prompt_eval_count', 0),
+            "tokens": eval_count,
+            "tokens_per_second": eval_count / eval_seconds if eval_seconds else None,
+            "aborted": aborted,
+            "preload": preload,
+        })
+
+    def metrics_summary(self) -> List[str]:
+        """Una línea por modelo: llamadas, latencia, TTFT, carga y tokens/s"""
+        lines = []
+        by_model: Dict[str, List[Dict]] = {}
+        for call in self.calls:
+            by_model.setdefault(call["model"], []).append(call)
+
+        for model, calls in by_model.items():
+            generated = [c for c in calls if not c["preload"]]
+            if not generated:
+                lines.append(f"{model}: precargado ({sum(c['load'] for c in calls):.2f}s de carga)")
+                continue
+            ttfts = [c["ttft"] for c in generated if c["ttft"] is not None]
+            rates = [c["tokens_per_second"] for c in generated if c["tokens_per_second"]]
+            lines.append(
+                f"{model}: {len(generated)} llamadas, "
+                f"latencia media {sum(c['latency'] for c in generated) / len(generated):.2f}s, "
+                f"TTFT medio {(sum(ttfts) / len(ttfts)) if ttfts else 0:.2f}s, "
+                f"carga total {sum(c['load'] for c in calls):.2f}s, "
+                f"{(sum(rates) / len(rates)) if rates else 0:.1f} tok/s, "
+                f"{sum(1 for c in generated if c['aborted'])} cortadas antes de terminar"
+            )
+        return lines
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description='Cliente Ollama compartido')
+    parser.add_argument('--ollama-url', default=DEFAULT_OLLAMA_URL)
+    parser.add_argument('--keep-alive', default=DEFAULT_KEEP_ALIVE)
+    parser.add_argument('command', choices=['ps', 'tags', 'generate'])
+    parser.add_argument('model', nargs='?')
+    parser.add_argument('prompt', nargs='?')
+    args = parser.parse_args()
+
+    client = OllamaClient(args.ollama_url, default_policy=ModelPolicy(args.keep_alive))
+    try:
+        if args.command == 'tags':
+            for name in await client.tags():
+                print(name)
+        elif args.command == 'ps':
+            for model in await client.loaded():
+                print(f"{model['name']}\t{model.get('size_vram', 0) / 1e9:.1f}GB\t{model.get('expires_at', '-')}")
+        else:
+            if not args.model or not args.prompt:
+                parser.error("generate requiere <modelo> <prompt>")
+            async for text in client.stream_generate(args.model, args.prompt):
+                print(text, end='', flush=True)
+            print()
+            for line in client.metrics_summary():
+                print(f"📊 {line}", file=sys.stderr)
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Espera de estabilización de página para los agentes web
+En vez de dormir un tiempo fijo después de cada acción se espera, con un
+máximo configurable, a que:
+1. el documento llegue al load state 'load' (si la acción navegó)
+2. el DOM no tenga mutaciones durante quiet_ms (MutationObserver)
+3. dos screenshots seguidos sean la misma pantalla (ScreenChangeDetector)
+
+Cada espera queda registrada (segundos, motivo) para el resumen de la corrida.
+
+Uso (desde los agentes):
+  settler = PageSettler(max_wait=5.0)
+  result = await settler.settle(page)   # {"seconds", "reason", "screenshot", ...}
+  for line in settler.summary(): print(line)
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from screen_change import ScreenChangeDetector
+
+# Máximo de segundos esperando después de una acción y después de navegar
+SETTLE_TIMEOUT = 5.0
+NAVIGATION_SETTLE_TIMEOUT = 15.0
+# Milisegundos sin mutaciones del DOM para considerarlo quieto
+DOM_QUIET_MS = 300
+# Intervalo entre los screenshots que se comparan
+SCREEN_INTERVAL = 0.2
+DOM_POLL_INTERVAL = 0.1
+
+# Milisegundos desde la última mutación del DOM. El observer se instala la
+# primera vez en cada documento; con reset=true se cuenta desde ahora (así una
+# página que estaba quieta antes de la acción no cuenta como quieta)
+QUIET_JS = """
+(reset) => {
+  let state = window.__opsSettle;
+  if (!state) {
+    state = window.__opsSettle = {last: performance.now()};
+    new MutationObserver(() => { state.last = performance.now(); })
+      .observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+  }
+  if (reset) state.last = performance.now();
+  return performance.now() - state.last;
+}
+"""
+
+
+class PageSettler:
+    """Detector de página estable con historial de esperas"""
+
+    def __init__(self, max_wait: float = SETTLE_TIMEOUT, quiet_ms: int = DOM_QUIET_MS,
+                 screens: Optional[ScreenChangeDetector] = None):
+        self.max_wait = max_wait
+        self.quiet_ms = quiet_ms
+        self.screens = screens or ScreenChangeDetector()
+        self.history: List[Dict] = []
+
+    async def settle(self, page, max_wait: Optional[float] = None, label: str = "acción") -> Dict:
+        """
+        Espera a que la página se estabilice (como mucho max_wait segundos).
+        Devuelve {"seconds", "reason", "load", "dom", "screen", "screenshot"}
+        con el último screenshot tomado y los segundos de cada etapa.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        start = time.perf_counter()
+        deadline = start + max_wait
+
+        def remaining() -> float:
+            return max(deadline - time.perf_counter(), 0.0)
+
+        # 1. Load state: vuelve enseguida si no hubo navegación
+        try:
+            # timeout=0 en Playwright es "sin límite": como mínimo 1 ms
+            await page.wait_for_load_state('load', timeout=max(remaining() * 1000, 1))
+        except Exception:
+            pass  # Timeout o navegación en curso: siguen las otras señales
+        load_done = time.perf_counter()
+
+        # 2. DOM sin mutaciones durante quiet_ms
+        dom_quiet = False
+        reset = True
+        while remaining() > 0:
+            try:
+                quiet = await page.evaluate(QUIET_JS, reset)
+                reset = False
+            except Exception:
+                quiet = 0.0  # Contexto destruido por una navegación
+            if quiet >= self.quiet_ms:
+                dom_quiet = True
+                break
+            await asyncio.sleep(min(max((self.quiet_ms - quiet) / 1000, DOM_POLL_INTERVAL), remaining()))
+        dom_done = time.perf_counter()
+
+        # 3. Dos screenshots seguidos iguales
+        screen_stable = False
+        previous = None
+        while True:
+            screenshot = await page.screenshot(full_page=False)
+            if previous is not None and self.screens.same_screen(previous, screenshot):
+                screen_stable = True
+                break
+            if remaining() <= 0:
+                break
+            previous = screenshot
+            await asyncio.sleep(min(SCREEN_INTERVAL, remaining()))
+        end = time.perf_counter()
+
+        if dom_quiet and screen_stable:
+            reason = "estable"
+        else:
+            reason = "timeout (" + ", ".join(name for name, ok in (("DOM", dom_quiet), ("pantalla", screen_stable))
+                                             if not ok) + ")"
+        result = {
+            "label": label,
+            "seconds": end - start,
+            "reason": reason,
+            "load": load_done - start,
+            "dom": dom_done - load_done,
+            "screen": end - dom_done,
+        }
+        self.history.append(result)
+        return dict(result, screenshot=screenshot)
+
+    def summary(self) -> List[str]:
+        """Tiempo de estabilización por paso más totales"""
+        if not self.history:
+            return []
+        lines = []
+        for i, entry in enumerate(self.history, 1):
+            lines.append(f"{i:>3}. {entry['label']:<10} {entry['seconds']:5.2f}s "
+                         f"(load {entry['load']:.2f}s, DOM {entry['dom']:.2f}s, "
+                         f"pantalla {entry['screen']:.2f}s) {entry['reason']}")
+        total = sum(entry["seconds"] for entry in self.history)
+        timeouts = sum(1 for entry in self.history if entry["reason"] != "estable")
+        lines.append(f"Total {total:.2f}s en {len(self.history)} esperas, "
+                     f"media {total / len(self.history):.2f}s, {timeouts} llegaron al máximo")
+        return lines
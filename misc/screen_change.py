@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Detección de cambios de pantalla para los agentes web
+Compara screenshots con una miniatura en escala de grises (diff por
+downsampling): si el frame nuevo es prácticamente igual al último analizado
+se reutiliza la descripción cacheada en vez de llamar al modelo de visión.
+
+Sin Pillow instalado cae a comparar el hash exacto del PNG.
+
+Uso (desde los agentes):
+  screens = ScreenChangeDetector(threshold=0.002)
+  description = screens.lookup(screenshot)
+  if description is None:
+      description = await vision(screenshot)
+      screens.store(screenshot, description)
+"""
+
+import hashlib
+import io
+from typing import Any, Optional
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Fracción de píxeles de la miniatura que pueden cambiar y seguir siendo "la misma pantalla"
+SCREEN_DIFF_THRESHOLD = 0.002
+# Diferencia de gris (0-255) por debajo de la cual un píxel se considera igual
+PIXEL_TOLERANCE = 12
+THUMBNAIL_SIZE = (64, 40)
+# Reutilizaciones seguidas antes de forzar un análisis nuevo
+MAX_REUSE = 3
+
+
+class ScreenChangeDetector:
+    """Cache de la última pantalla analizada con contador de hits"""
+
+    def __init__(self, threshold: float = SCREEN_DIFF_THRESHOLD, max_reuse: int = MAX_REUSE):
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self.last_fingerprint = None
+        self.last_result: Any = None
+        self.hits = 0
+        self.misses = 0
+        self.consecutive_hits = 0
+        self._memo = (None, None)  # (screenshot, fingerprint) del último cálculo
+
+    def fingerprint(self, screenshot: bytes):
+        """Miniatura en grises (o sha1 del PNG si no hay Pillow)"""
+        if self._memo[0] is screenshot:
+            return self._memo[1]
+        fp = None
+        if Image is not None:
+            try:
+                with Image.open(io.BytesIO(screenshot)) as img:
+                    fp = img.convert("L").resize(THUMBNAIL_SIZE, Image.BILINEAR).tobytes()
+            except (OSError, ValueError):
+                pass  # Imagen no decodificable: se compara por hash
+        if fp is None:
+            fp = hashlib.sha1(screenshot).digest()
+        self._memo = (screenshot, fp)
+        return fp
+
+    @staticmethod
+    def difference(fp_a, fp_b) -> float:
+        """Fracción de píxeles distintos entre dos fingerprints (0 = iguales)"""
+        if fp_a is None or fp_b is None:
+            return 1.0
+        if Image is None or len(fp_a) != len(fp_b):
+            return 0.0 if fp_a == fp_b else 1.0
+        changed = sum(1 for a, b in zip(fp_a, fp_b) if abs(a - b) > PIXEL_TOLERANCE)
+        return changed / len(fp_a)
+
+    def same_screen(self, screenshot_a: bytes, screenshot_b: bytes) -> bool:
+        """True si dos screenshots son prácticamente iguales"""
+        if screenshot_a == screenshot_b:
+            return True
+        return self.difference(self.fingerprint(screenshot_a),
+                               self.fingerprint(screenshot_b)) <= self.threshold
+
+    def would_reuse(self, screenshot: bytes) -> bool:
+        """True si lookup() devolvería el resultado cacheado (sin contarlo como hit)"""
+        return (self.last_fingerprint is not None and self.consecutive_hits < self.max_reuse and
+                self.difference(self.fingerprint(screenshot), self.last_fingerprint) <= self.threshold)
+
+    def lookup(self, screenshot: bytes) -> Optional[Any]:
+        """Resultado cacheado si la pantalla no cambió desde el último análisis"""
+        if self.would_reuse(screenshot):
+            self.hits += 1
+            self.consecutive_hits += 1
+            return self.last_result
+        self.misses += 1
+        return None
+
+    def store(self, screenshot: bytes, result: Any):
+        """Registra el análisis de un frame como el último"""
+        self.last_fingerprint = self.fingerprint(screenshot)
+        self.last_result = result
+        self.consecutive_hits = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        mode = "miniatura" if Image is not None else "hash exacto"
+        return (f"Pantallas reutilizadas: {self.hits}/{self.hits + self.misses} "
+                f"({self.hit_rate:.0%}, {mode}, umbral {self.threshold})")
@@ -6,6 +6,7 @@ set -e
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 DEPLOY_DATA="$SCRIPT_DIR/deployment-categorization.json"
+NGINX_INDEX="$SCRIPT_DIR/automation/nginx_index.py"
 
 # Check for jq
 if ! command -v jq &> /dev/null; then
@@ -82,8 +83,8 @@ jq -r '.deployment_plan | to_entries[] | "\(.key)|\(.value.original_name)|\(.val
 
     echo -n "[$total_projects] $project_name ($category)... "
 
-    # Check Nginx config
-    if sudo nginx -T 2>/dev/null | grep -q "$project_name"; then
+    # Check Nginx config (cached sites index instead of `nginx -T` per project)
+    if python3 "$NGINX_INDEX" project "$project_name" > /dev/null; then
         echo "  Nginx: OK" >> "$RESULTS_FILE"
         nginx_ok=$((nginx_ok + 1))
     else